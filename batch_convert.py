@@ -0,0 +1,253 @@
+"""命令行批量转换工具
+
+不依赖图形界面，按文件、目录或通配符批量转换Excel文件，例如：
+
+    python batch_convert.py 门店导出/*.xlsx -o 转换结果 -j 4
+
+每个文件的输出保存在输出目录下以文件名命名的子目录中，并在输出目录生成summary.json汇总。
+"""
+import argparse
+import codecs
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from data_processor import DataProcessor
+from dedup import DEDUP_POLICIES
+from input_engines import EXCEL_EXTENSIONS, INPUT_ENGINES, TEXT_EXTENSIONS
+from mapping_memory import DEFAULT_MEMORY_PATH, MappingMemory, RememberingResolver
+from mapping_resolver import RuleBasedResolver
+from parse_cache import DEFAULT_CACHE_BYTES
+from sheet_reader import DEFAULT_BATCH_SIZE
+from sheet_writer import DEFAULT_CSV_ENCODING, OUTPUT_FORMATS, WRITER_BACKENDS
+
+# 目录中会被转换的文件类型
+INPUT_PATTERNS = tuple('*' + ext for ext in EXCEL_EXTENSIONS + TEXT_EXTENSIONS)
+
+
+def collect_input_files(inputs: List[str], recursive: bool = False) -> List[str]:
+    """把命令行中的文件、目录和通配符展开为去重后的文件列表"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in INPUT_PATTERNS:
+                pattern = os.path.join(item, '**', pattern) if recursive else os.path.join(item, pattern)
+                files.extend(sorted(glob.glob(pattern, recursive=recursive)))
+        elif glob.has_magic(item):
+            files.extend(sorted(glob.glob(item, recursive=recursive)))
+        else:
+            files.append(item)
+
+    result = []
+    seen = set()
+    for path in files:
+        name = os.path.basename(path)
+        # 跳过Excel打开文件时产生的临时文件
+        if name.startswith('~$'):
+            continue
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in seen:
+            seen.add(key)
+            result.append(path)
+    return result
+
+
+def assign_output_dirs(files: List[str], output_root: str) -> Dict[str, str]:
+    """为每个文件分配独立的输出子目录，同名文件追加序号"""
+    output_dirs = {}
+    used = set()
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name = stem
+        index = 1
+        while name in used:
+            index += 1
+            name = f"{stem}_{index}"
+        used.add(name)
+        output_dirs[path] = os.path.join(output_root, name)
+    return output_dirs
+
+
+def convert_workbook(file_path: str, output_dir: str, options: dict,
+                     mapping_rules: Optional[str] = None, mapping_memory: Optional[str] = None) -> dict:
+    """转换单个文件，返回可写入汇总的结果记录
+
+    mapping_rules为必填字段匹配规则的JSON文件，无法匹配的工作表记为失败，不会弹窗。
+    mapping_memory为记住的匹配记录文件（见mapping_memory.py），表头相同的工作表优先使用其中的匹配。
+    """
+    started = time.time()
+    record = {
+        'file': os.path.abspath(file_path),
+        'output_dir': os.path.abspath(output_dir),
+        'status': 'failed',
+        'sheets': {},
+        'error': None,
+    }
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        resolver = RuleBasedResolver.from_file(mapping_rules) if mapping_rules else RuleBasedResolver()
+        if mapping_memory:
+            resolver = RememberingResolver(resolver, MappingMemory(mapping_memory), remember=False)
+        processor = DataProcessor(mapping_resolver=resolver, **options)
+        processor.set_input_file_path(file_path)
+        processor.set_output_dir(output_dir)
+        results = processor.process_all_data(file_path)
+
+        for sheet_name, message in results.items():
+            record['sheets'][sheet_name] = {
+                'status': 'ok' if sheet_name in processor.row_counts else 'failed',
+                'rows': processor.row_counts.get(sheet_name),
+                'message': message,
+                'metrics': processor.metrics.get(sheet_name),
+                'orphans': processor.orphan_counts.get(sheet_name),
+                'invalid': processor.invalid_counts.get(sheet_name),
+            }
+        if not results:
+            record['error'] = "未找到商品、供应商、库存或会员工作表"
+        elif all(sheet['status'] == 'ok' for sheet in record['sheets'].values()):
+            record['status'] = 'ok'
+    except Exception as e:
+        record['error'] = str(e)
+    record['seconds'] = round(time.time() - started, 3)
+    return record
+
+
+def run_batch(files: List[str], output_root: str, options: dict, workers: int = 1,
+              mapping_rules: Optional[str] = None, mapping_memory: Optional[str] = None) -> List[dict]:
+    """批量转换文件，workers大于1时使用进程池并行转换"""
+    output_dirs = assign_output_dirs(files, output_root)
+    if workers <= 1 or len(files) <= 1:
+        records = []
+        for path in files:
+            record = convert_workbook(path, output_dirs[path], options, mapping_rules, mapping_memory)
+            print_record(record)
+            records.append(record)
+        return records
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_workbook, path, output_dirs[path], options, mapping_rules, mapping_memory)
+                   for path in files]
+        records = []
+        for future in futures:
+            record = future.result()
+            print_record(record)
+            records.append(record)
+    return records
+
+
+def print_record(record: dict):
+    """在控制台输出单个文件的转换结果"""
+    status = '成功' if record['status'] == 'ok' else '失败'
+    print(f"[{status}] {record['file']} ({record['seconds']}秒)")
+    for sheet_name, sheet in record['sheets'].items():
+        print(f"    {sheet_name}: {sheet['message'].splitlines()[0]}")
+    if record['error']:
+        print(f"    错误: {record['error']}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="批量转换商品、供应商、库存和会员Excel数据")
+    parser.add_argument('inputs', nargs='+', help="Excel文件、目录或通配符")
+    parser.add_argument('-o', '--output-dir', default='output', help="输出目录（默认: output）")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="同时转换的文件数（默认: 1）")
+    parser.add_argument('-r', '--recursive', action='store_true', help="递归查找子目录中的文件")
+    parser.add_argument('--summary', help="汇总文件路径（默认: 输出目录/summary.json）")
+    add_conversion_arguments(parser)
+    return parser
+
+
+def add_conversion_arguments(parser: argparse.ArgumentParser):
+    """添加批量转换和监视目录共用的转换选项"""
+    parser.add_argument('--mapping-rules', help="必填字段匹配规则（JSON文件）")
+    parser.add_argument('--mapping-memory', default=DEFAULT_MEMORY_PATH,
+                        help="图形界面中记住的匹配记录，表头相同的工作表直接使用（默认: %(default)s）")
+    parser.add_argument('--no-mapping-memory', action='store_true', help="不使用记住的匹配")
+    parser.add_argument('--streaming', action='store_true', help="按批次流式读取工作表")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="流式读取每批行数")
+    parser.add_argument('--projection', action='store_true',
+                        help="先读取表头，只读取映射到目标列的列，编码、条码等列按文本读取")
+    parser.add_argument('--factorize', action='store_true', help="每列只清理不重复的取值（重复取值多时更快）")
+    parser.add_argument('--dedup', choices=list(DEDUP_POLICIES),
+                        help="按主键（商品编码、供应商编码、手机号）去重并保留first/last/most_complete（非空字段最多）的一行，"
+                             "被删除的行另外输出（默认按整行去重）")
+    parser.add_argument('--validate', action='store_true',
+                        help="校验身份证号、手机号和条码，输出中增加校验结果和校验原因列")
+    parser.add_argument('--check-references', action='store_true',
+                        help="转换后检查库存引用的商品编码、供应商是否存在，缺失引用的行另外输出")
+    parser.add_argument('--incremental', action='store_true',
+                        help="与上次转换的结果比对，另外输出只含新增、修改、删除记录的增量文件")
+    parser.add_argument('--cache-dir', help="读取缓存目录，同一文件再次转换时不再解析Excel（默认不缓存）")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help="读取缓存容量上限，单位MB")
+    parser.add_argument('--metrics-log', help="把各工作表每个处理阶段的耗时写入JSON Lines日志")
+    parser.add_argument('--trace-memory', action='store_true', help="同时记录各处理阶段的内存峰值（会拖慢转换）")
+    parser.add_argument('--engine', choices=['auto'] + list(INPUT_ENGINES), default='auto',
+                        help="读取方式（默认按扩展名选择，安装了python-calamine时优先使用calamine）")
+    parser.add_argument('--writer', choices=sorted(WRITER_BACKENDS), default='pandas', help="Excel输出方式")
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default='xlsx',
+                        help="输出格式（默认: xlsx；parquet需要安装pyarrow）")
+    parser.add_argument('--csv-encoding', default=DEFAULT_CSV_ENCODING,
+                        help=f"CSV输出的编码，例如gbk（默认: {DEFAULT_CSV_ENCODING}）")
+
+
+def conversion_options(parser: argparse.ArgumentParser, args: argparse.Namespace) -> dict:
+    """把add_conversion_arguments添加的选项转换为DataProcessor的参数"""
+    try:
+        codecs.lookup(args.csv_encoding)
+    except LookupError:
+        parser.error(f"未知的编码: {args.csv_encoding}")
+    return {
+        'streaming': args.streaming,
+        'batch_size': args.batch_size,
+        'writer_backend': args.writer,
+        'input_engine': args.engine,
+        'output_format': args.format,
+        'csv_encoding': args.csv_encoding,
+        'factorize': args.factorize,
+        'projection': args.projection,
+        'cache_dir': args.cache_dir,
+        'incremental': args.incremental,
+        'dedup_policy': args.dedup,
+        'check_references': args.check_references,
+        'validate_fields': args.validate,
+        'trace_memory': args.trace_memory,
+        'metrics_log': args.metrics_log,
+        'cache_max_bytes': args.cache_size * 1024 * 1024,
+    }
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    options = conversion_options(parser, args)
+    files = collect_input_files(args.inputs, args.recursive)
+    if not files:
+        print("没有找到需要转换的文件", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    started = time.time()
+    mapping_memory = None if args.no_mapping_memory else args.mapping_memory
+    records = run_batch(files, args.output_dir, options, args.workers, args.mapping_rules, mapping_memory)
+
+    summary = {
+        'total': len(records),
+        'succeeded': sum(1 for record in records if record['status'] == 'ok'),
+        'failed': sum(1 for record in records if record['status'] != 'ok'),
+        'seconds': round(time.time() - started, 3),
+        'files': records,
+    }
+    summary_path = args.summary or os.path.join(args.output_dir, 'summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"共{summary['total']}个文件，成功{summary['succeeded']}个，失败{summary['failed']}个，汇总已保存到: {summary_path}")
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""生成用于性能测试的模拟导出文件
+
+同一随机种子和行数总是生成相同的文件。数据模拟门店系统的真实导出：中文文本、带空格和字母的条码、
+YYYYMM和YYYYMMDD等多种日期写法、各种处方药标记、重复行，表头随机使用config.py中的别名。
+
+    python benchmarks/generate_workbook.py 模拟数据.xlsx --rows 100000
+"""
+import argparse
+import os
+import sys
+from typing import Dict, List
+
+import numpy as np
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SHEET_CONFIGS  # noqa: E402
+
+# 重复行占比
+DUPLICATE_RATIO = 0.03
+
+DRUG_NAMES = ['阿莫西林胶囊', '布洛芬缓释胶囊', '感冒灵颗粒', '连花清瘟胶囊', '板蓝根颗粒', '维生素C片',
+              '复方甘草片', '头孢克肟分散片', '蒙脱石散', '藿香正气水', '六味地黄丸', '氯雷他定片']
+SPECS = ['0.25g*24粒', '10ml*6支', '0.3g*20片', '10g*10袋', '100ml', '6g*9袋', None]
+PACKAGES = ['盒', '瓶', '袋', None]
+UNITS = ['盒', '瓶', ' 支 ', '袋', '板', None]
+FORMS = ['胶囊剂', '片剂', '颗粒剂', '口服液', '丸剂', None]
+MAKERS = ['华北制药股份有限公司', '广州白云山制药', '华润三九医药', '以岭药业', '同仁堂', '云南白药集团', None]
+ORIGINS = ['河北', '广东', '北京', '云南', None]
+OTC_LABELS = ['OTC', 'otc', 'rx', 'RX', '甲类OTC', '乙类OTC', '处方药', '非处方药', '其他', '', None]
+YES_NO_LABELS = ['是', '否', 'Y', 'n', 'yes', 'TRUE', '1', '0', None]
+STORAGE = ['常温', '阴凉', '冷藏', None]
+SUPPLIER_NAMES = ['国药控股', '九州通医药', '华润医药商业', '上海医药', '重庆医药', '南京医药']
+SURNAMES = list('王李张刘陈杨黄赵吴周徐孙马朱胡郭')
+GIVEN_NAMES = ['伟', '芳', '娜', '敏', '静', '丽', '强', '磊', '洋', '艳', '勇', '军']
+GENDERS = ['男', '女', 'M', 'F', 'male', '女 ', None]
+CITIES = ['北京市朝阳区', '上海市浦东新区', '广州市天河区', '成都市武侯区', None]
+
+
+class _Generator:
+    def __init__(self, rows: int, seed: int):
+        self.rows = rows
+        self.rng = np.random.RandomState(seed)
+
+    def pick(self, values: List) -> List:
+        return [values[i] for i in self.rng.randint(0, len(values), self.rows)]
+
+    def codes(self, prefix: str, universe: int, messy: bool = True) -> List:
+        numbers = self.rng.randint(0, max(universe, 1), self.rows)
+        pad = self.rng.randint(0, 4, self.rows) if messy else np.zeros(self.rows, dtype=int)
+        return [f"{' ' if p == 1 else ''}{prefix}{n:06d}{' ' if p == 2 else ''}"
+                for n, p in zip(numbers.tolist(), pad.tolist())]
+
+    def digits(self, length: int) -> np.ndarray:
+        return self.rng.randint(10 ** (length - 1), 10 ** length, self.rows, dtype=np.int64)
+
+    def barcodes(self) -> List:
+        values = self.digits(13)
+        kinds = self.rng.randint(0, 5, self.rows)
+        result = []
+        for value, kind in zip(values.tolist(), kinds):
+            if kind == 0:
+                result.append(value)
+            elif kind == 1:
+                result.append(f" {value} ")
+            elif kind == 2:
+                result.append(f"BC-{value}")
+            elif kind == 3:
+                result.append(str(value))
+            else:
+                result.append(None)
+        return result
+
+    def prices(self) -> List:
+        values = np.round(self.rng.uniform(0.5, 300, self.rows), 2)
+        kinds = self.rng.randint(0, 10, self.rows)
+        return [None if k == 0 else '价格待定' if k == 1 else str(v) if k == 2 else float(v)
+                for v, k in zip(values.tolist(), kinds)]
+
+    def dates(self, start_year: int, end_year: int) -> List:
+        years = self.rng.randint(start_year, end_year, self.rows)
+        months = self.rng.randint(1, 13, self.rows)
+        days = self.rng.randint(1, 29, self.rows)
+        kinds = self.rng.randint(0, 7, self.rows)
+        result = []
+        for y, m, d, kind in zip(years, months, days, kinds):
+            if kind == 0:
+                result.append(f"{y}-{m:02d}-{d:02d}")
+            elif kind == 1:
+                result.append(int(f"{y}{m:02d}"))
+            elif kind == 2:
+                result.append(f"{y}{m:02d}{d:02d}")
+            elif kind == 3:
+                result.append(f"{y}.{m}.{d}")
+            elif kind == 4:
+                result.append(f"{y}年{m}月{d}日")
+            elif kind == 5:
+                result.append(f"{y}/{m}/{d}")
+            else:
+                result.append(None)
+        return result
+
+    def person_names(self) -> List:
+        surnames = self.pick(SURNAMES)
+        given = self.pick(GIVEN_NAMES)
+        missing = self.rng.randint(0, 20, self.rows)
+        return [None if k == 0 else s + g for s, g, k in zip(surnames, given, missing)]
+
+    def mobiles(self) -> List:
+        values = self.digits(10) + 13000000000 - 10 ** 9
+        kinds = self.rng.randint(0, 4, self.rows)
+        return [v if k == 0 else f"{str(v)[:3]}-{str(v)[3:7]}-{str(v)[7:]}" if k == 1 else None if k == 2 else str(v)
+                for v, k in zip(values.tolist(), kinds)]
+
+    def id_numbers(self) -> List:
+        values = self.digits(17)
+        checks = self.pick(list('0123456789Xx'))
+        kinds = self.rng.randint(0, 5, self.rows)
+        return [None if k == 0 else f"{str(v)[:6]} {str(v)[6:]}{c}" if k == 1 else f"{v}{c}"
+                for v, c, k in zip(values.tolist(), checks, kinds)]
+
+    def numbers(self, low, high, bad: str) -> List:
+        values = self.rng.randint(low, high, self.rows)
+        kinds = self.rng.randint(0, 15, self.rows)
+        return [None if k == 0 else bad if k == 1 else int(v) for v, k in zip(values.tolist(), kinds)]
+
+
+def _products(gen: _Generator) -> Dict[str, List]:
+    universe = max(gen.rows // 2, 1)
+    return {
+        '原系统商品编码': gen.codes('P', universe),
+        '商品名称': gen.pick(DRUG_NAMES + [' 感冒灵颗粒 ']),
+        '通用名': gen.pick(DRUG_NAMES + [None]),
+        '商品规格': gen.pick(SPECS),
+        '包装规格': gen.pick(PACKAGES),
+        '单位': gen.pick(UNITS),
+        '剂型': gen.pick(FORMS),
+        '生产厂家': gen.pick(MAKERS),
+        '商品产地': gen.pick(ORIGINS),
+        '条码': gen.barcodes(),
+        '批准文号': gen.pick(['国药准字H20041234', '国药准字Z11020001', None]),
+        '零售价': gen.prices(),
+        '会员价': gen.prices(),
+        '存储条件': gen.pick(STORAGE),
+        '是否处方药': gen.pick(OTC_LABELS),
+        '是否医保药品': gen.pick(YES_NO_LABELS),
+        '是否含麻黄碱': gen.pick(YES_NO_LABELS),
+        '是否中药材': gen.pick(YES_NO_LABELS),
+    }
+
+
+def _suppliers(gen: _Generator) -> Dict[str, List]:
+    return {
+        '原系统供应商编码': gen.codes('S', max(gen.rows // 2, 1)),
+        '单位名称': gen.pick(SUPPLIER_NAMES + [None]),
+        '税务登记/信用代码/营业执照号': [f"91{v}" for v in gen.digits(16).tolist()],
+        '法人代表': gen.person_names(),
+        '联系人': gen.person_names(),
+        '电话': gen.mobiles(),
+        '地址': gen.pick(CITIES),
+        '电子邮箱': gen.pick(['sales@example.com', None]),
+    }
+
+
+def _inventory(gen: _Generator) -> Dict[str, List]:
+    universe = max(gen.rows // 2, 1)
+    return {
+        '原系统商品编码': gen.codes('P', universe),
+        '批号': gen.pick(['B' + str(i) for i in range(1000)] + ['', None]),
+        '生产日期': gen.dates(2019, 2025),
+        '有效期至': gen.dates(2022, 2029),
+        '数量': gen.numbers(0, 500, '若干'),
+        '单价': gen.prices(),
+        '供应商': gen.pick(SUPPLIER_NAMES + ['未知']),
+    }
+
+
+def _members(gen: _Generator) -> Dict[str, List]:
+    return {
+        '会员姓名': gen.person_names(),
+        '手机号': gen.mobiles(),
+        '座机号': gen.pick(['010-62345678', '(021)5555 1234', '0755-8888', None]),
+        '性别': gen.pick(GENDERS),
+        '身份证号': gen.id_numbers(),
+        '出生年月日': gen.dates(1940, 2010),
+        '联系地址': gen.pick(CITIES),
+        '会员卡号': gen.codes('VIP-', gen.rows * 2),
+        '剩余积分': gen.numbers(-10, 50000, '无'),
+        '剩余充值金额': gen.prices(),
+        '剩余赠送金额': gen.prices(),
+    }
+
+
+SHEET_GENERATORS = {'商品': _products, '供应商': _suppliers, '库存': _inventory, '会员': _members}
+
+
+def _alias_headers(rng: np.random.RandomState, sheet_name: str, columns: List[str]) -> List[str]:
+    """每列随机选用一个配置中的别名作为表头，同一张表中不重复"""
+    config = next(c for c in SHEET_CONFIGS if c['sheet_name'] == sheet_name)
+    used = set()
+    headers = []
+    for col in columns:
+        aliases = [a for a in config['columns'][col].get('aliases', [col]) if a not in used] or [col]
+        header = aliases[rng.randint(0, len(aliases))]
+        used.add(header)
+        headers.append(header)
+    return headers
+
+
+def _with_duplicates(rng: np.random.RandomState, data: Dict[str, List], rows: int) -> Dict[str, List]:
+    """把一部分行替换为之前某一行的副本"""
+    targets = np.flatnonzero(rng.random_sample(rows) < DUPLICATE_RATIO)
+    targets = targets[targets > 0]
+    sources = (rng.random_sample(len(targets)) * targets).astype(int)
+    for values in data.values():
+        for target, source in zip(targets, sources):
+            values[target] = values[source]
+    return data
+
+
+def generate_workbook(path: str, rows: int, seed: int = 0):
+    """生成包含商品、供应商、库存、会员四张表的模拟导出文件，每张表rows行"""
+    workbook = Workbook(write_only=True)
+    for index, (sheet_name, generator) in enumerate(SHEET_GENERATORS.items()):
+        rng = np.random.RandomState(seed * 100 + index)
+        data = _with_duplicates(rng, generator(_Generator(rows, seed * 100 + index)), rows)
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(_alias_headers(rng, sheet_name, list(data)))
+        for row in zip(*data.values()):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="生成性能测试用的模拟Excel文件")
+    parser.add_argument('path', help="输出文件路径")
+    parser.add_argument('--rows', type=int, default=10000, help="每张表的行数（默认: 10000）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子（默认: 0）")
+    args = parser.parse_args(argv)
+    generate_workbook(args.path, args.rows, args.seed)
+    print(f"已生成: {args.path}（每张表{args.rows}行）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""性能基准：按阶段计时商品、供应商、库存、会员四条处理流程
+
+    python benchmarks/run_benchmarks.py --rows 1000 10000 100000 -o 基准结果.json
+    python benchmarks/run_benchmarks.py --rows 100000 --baseline 基准结果.json
+
+每个规模先用generate_workbook生成（或复用已生成的）模拟文件，再依次计时读取、表头匹配、列清理、
+跨列规则、去重、收尾和写出。--memory另外用tracemalloc跑一遍，记录每个阶段的内存峰值
+（tracemalloc本身会拖慢运行，所以不和计时放在同一遍）。指定--baseline时与之前保存的结果比较，
+有阶段变慢超过容差时返回1，可以在发布新版本前运行。
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate_workbook import generate_workbook  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+from pipeline import SheetPlan  # noqa: E402
+from sheet_reader import DEFAULT_BATCH_SIZE, iter_sheet_batches  # noqa: E402
+from sheet_writer import WRITER_BACKENDS, open_writer  # noqa: E402
+
+STAGES = ['read', 'headers', 'clean', 'row_rules', 'dedup', 'finish', 'write']
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'excel_convertor_bench')
+# 低于该耗时（秒）的阶段不参与回归判断，避免计时抖动造成误报
+NOISE_FLOOR = 0.05
+
+
+def workbook_path(data_dir: str, rows: int, seed: int) -> str:
+    """返回指定规模的模拟文件，不存在时生成"""
+    path = os.path.join(data_dir, f"rows-{rows}-seed-{seed}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"正在生成{rows}行的模拟文件...", file=sys.stderr)
+        generate_workbook(path, rows, seed)
+    return path
+
+
+class _StageTimer:
+    """依次执行各阶段并记录耗时，trace_memory为True时改为记录各阶段的内存峰值"""
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, float] = {}
+
+    def run(self, stage: str, func: Callable, *args):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            result = func(*args)
+            self.stages[stage] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        else:
+            started = time.perf_counter()
+            result = func(*args)
+            self.stages[stage] = round(time.perf_counter() - started, 4)
+        return result
+
+
+def _read(path: str, sheet_name: str, streaming: bool, batch_size: int) -> pd.DataFrame:
+    if streaming:
+        return pd.concat(iter_sheet_batches(path, sheet_name, batch_size), ignore_index=True)
+    return pd.read_excel(path, sheet_name=sheet_name)
+
+
+def _rename(plan: SheetPlan, df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = df.columns.astype(str)
+    processor = DataProcessor()
+    return df.rename(columns=processor._resolve_columns(plan, df.columns))
+
+
+def _write(df: pd.DataFrame, path: str, backend: str) -> int:
+    writer = open_writer(path, backend)
+    writer.write(df)
+    writer.close()
+    return writer.rows
+
+
+def run_sheet(path: str, plan: SheetPlan, output_dir: str, options: dict, trace_memory: bool = False) -> dict:
+    """处理一张表，返回{阶段: 秒数或内存峰值MB}和输入、输出行数"""
+    timer = _StageTimer(trace_memory)
+    df = timer.run('read', _read, path, plan.sheet_name, options['streaming'], options['batch_size'])
+    input_rows = len(df)
+    df = timer.run('headers', _rename, plan, df)
+    df = timer.run('clean', plan.clean, df, options['factorize'])
+    df = timer.run('row_rules', plan.apply_row_rules, df)
+    if plan.fill_before_dedup:
+        df = df.fillna(plan.defaults)
+    df = timer.run('dedup', pd.DataFrame.drop_duplicates, df)
+    df = timer.run('finish', plan.finish, df)
+    output_rows = timer.run('write', _write, df, os.path.join(output_dir, plan.output_file),
+                            options['writer_backend'])
+    return {'stages': timer.stages, 'input_rows': input_rows, 'output_rows': output_rows}
+
+
+def run_size(path: str, rows: int, options: dict, repeat: int = 1, memory: bool = False) -> dict:
+    """对一个规模的文件运行全部工作表；计时取repeat次中的最小值"""
+    result = {'rows': rows, 'sheets': {}}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for sheet_name, plan in DataProcessor.SHEET_PLANS.items():
+            runs = [run_sheet(path, plan, output_dir, options) for _ in range(max(repeat, 1))]
+            sheet = {
+                'input_rows': runs[0]['input_rows'],
+                'output_rows': runs[0]['output_rows'],
+                'seconds': {stage: min(run['stages'][stage] for run in runs) for stage in STAGES},
+            }
+            sheet['total_seconds'] = round(sum(sheet['seconds'].values()), 4)
+            sheet['rows_per_second'] = int(sheet['input_rows'] / sheet['total_seconds']) if sheet['total_seconds'] else None
+            if memory:
+                tracemalloc.start()
+                try:
+                    sheet['peak_mb'] = run_sheet(path, plan, output_dir, options, trace_memory=True)['stages']
+                finally:
+                    tracemalloc.stop()
+            result['sheets'][sheet_name] = sheet
+    return result
+
+
+def find_regressions(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """与基准结果比较，返回变慢超过tolerance（比例）的阶段说明"""
+    previous = {item['rows']: item for item in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        base = previous.get(result['rows'])
+        if base is None:
+            continue
+        for sheet_name, sheet in result['sheets'].items():
+            base_sheet = base['sheets'].get(sheet_name)
+            if base_sheet is None:
+                continue
+            for stage, seconds in sheet['seconds'].items():
+                before = base_sheet['seconds'].get(stage)
+                if before is None or max(before, seconds) < NOISE_FLOOR:
+                    continue
+                if seconds > before * (1 + tolerance):
+                    regressions.append(
+                        f"{result['rows']}行 {sheet_name} {stage}: {before:.3f}秒 -> {seconds:.3f}秒"
+                    )
+    return regressions
+
+
+def print_result(result: dict):
+    print(f"== 每张表{result['rows']}行 ==")
+    header = ['工作表'] + STAGES + ['合计', '行/秒']
+    print("\t".join(header))
+    for sheet_name, sheet in result['sheets'].items():
+        cells = [sheet_name] + [f"{sheet['seconds'][stage]:.3f}" for stage in STAGES]
+        cells += [f"{sheet['total_seconds']:.3f}", str(sheet['rows_per_second'])]
+        print("\t".join(cells))
+        if 'peak_mb' in sheet:
+            print("\t".join(['  峰值MB'] + [f"{sheet['peak_mb'][stage]:.1f}" for stage in STAGES]))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="按阶段计时四条处理流程")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="每张表的行数，可指定多个规模（默认: 1000 10000 100000）")
+    parser.add_argument('--seed', type=int, default=0, help="模拟数据的随机种子")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="模拟文件的保存目录，已生成的文件会复用")
+    parser.add_argument('--repeat', type=int, default=1, help="每个规模重复次数，取最短耗时")
+    parser.add_argument('--memory', action='store_true', help="另外记录各阶段的内存峰值")
+    parser.add_argument('--streaming', action='store_true', help="按批次流式读取")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="流式读取每批行数")
+    parser.add_argument('--factorize', action='store_true', help="每列只清理不重复的取值")
+    parser.add_argument('--writer', choices=sorted(WRITER_BACKENDS), default='pandas', help="Excel输出方式")
+    parser.add_argument('-o', '--output', help="把结果保存为JSON文件，可作为之后比较的基准")
+    parser.add_argument('--baseline', help="与之前保存的JSON结果比较")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="允许变慢的比例（默认: 0.2）")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    options = {
+        'streaming': args.streaming,
+        'batch_size': args.batch_size,
+        'factorize': args.factorize,
+        'writer_backend': args.writer,
+    }
+
+    results = []
+    for rows in args.rows:
+        path = workbook_path(args.data_dir, rows, args.seed)
+        result = run_size(path, rows, options, args.repeat, args.memory)
+        print_result(result)
+        results.append(result)
+
+    report = {'options': options, 'seed': args.seed, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print("以下阶段比基准变慢：")
+            for line in regressions:
+                print(f"    {line}")
+            return 1
+        print("没有发现性能退化")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
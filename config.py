@@ -1,112 +1,265 @@
+# 工作表处理配置
+#
+# 每种工作表用一个配置字典描述，由pipeline.compile_sheet编译为处理计划：
+#   sheet_name    Excel中的工作表名
+#   output_file   输出文件名
+#   text_columns  通用文本清理（转字符串、去空白、空值统一为''）的范围：
+#                 'object' 只清理文本类型的列，'all' 清理除数值列外的所有列
+#   fill_stage    默认值填充在去重之前（'before_dedup'）还是之后（'after_dedup'）
+#   columns       目标列（按输出顺序），每列可包含：
+#                 aliases     源表中可能的列名
+#                 required    是否为必填字段
+#                 cleaners    依次执行的清理步骤，见pipeline.CLEANERS
+#                 max_length  截断长度
+#                 default     缺失值的默认值
+#                 category    取值种类少的列，处理后以category类型保存在内存中，写出时还原
+#                 read_as_text  编码、条码、证件号等列，按列读取时以文本读取，不推断为数值
+#                 validate    格式校验：'id_card'身份证号、'mobile'手机号、'ean'条码，见validators.VALIDATORS
+#   row_rules     跨列规则，见pipeline.ROW_RULES
+#   business_key  增量转换时识别同一条记录的业务主键列，依次取第一个非空的列值，见incremental.py
+#   dedup_key     按主键去重时组成主键的列（这些列都相同的行视为重复），见dedup.py
+#   references    引用其他工作表的列：{列名: (被引用的工作表, [被引用的列])}，取值在任一被引用列中出现即可，见integrity.py
+
+# 表示"是"的取值（已转为大写）
+YES_VALUES = ['是', 'YES', 'Y', 'TRUE', '1']
+
+# 处方药类型映射
+OTC_MAPPING = {
+    '非处方药': '非处方药',
+    'OTC': '非处方药',
+    '处方药': '处方药',
+    'RX': '处方药',
+    '甲类非处方药': '甲类非处方药',
+    '甲类OTC': '甲类非处方药',
+    '乙类非处方药': '乙类非处方药',
+    '乙类OTC': '乙类非处方药'
+}
+
+# 性别映射
+GENDER_MAPPING = {
+    '男': '男',
+    'M': '男',
+    'MALE': '男',
+    '女': '女',
+    'F': '女',
+    'FEMALE': '女'
+}
+
 # 商品数据配置
 PRODUCT_CONFIG = {
-    'required_columns': ['商品名称', '包装规格', '零售价'],
-    'header_mapping': {
-        '商品名称': ['商品名称', '名称', '品名', '产品名称'],
-        '包装规格': ['包装规格', '规格', '规格型号', '型号'],
-        '零售价': ['零售价', '价格', '单价', '售价'],
-        '条码': ['条码', '条形码', '商品条码'],
-        '商品类别': ['商品类别', '类别', '分类', '产品类别'],
-        '单位': ['单位', '计量单位'],
-        '产地': ['产地', '生产地', '原产地'],
-        '生产厂家': ['生产厂家', '厂家', '制造商'],
-        '保质期': ['保质期', '有效期'],
-        '储存条件': ['储存条件', '存储条件', '保存条件'],
-        '备注': ['备注', '说明', '注释']
+    'sheet_name': '商品',
+    'output_file': '商品导入.xlsx',
+    'business_key': ['原系统商品编码'],
+    'dedup_key': ['原系统商品编码'],
+    'text_columns': 'object',
+    'fill_stage': 'after_dedup',
+    'columns': {
+        '原系统商品编码': {
+            'aliases': ['商品编码', '药品编码', '药品编号', '商品编号', '商品代码'],
+            'read_as_text': True,
+            'cleaners': ['text'],
+            'max_length': 20,
+        },
+        '商品名称': {
+            'aliases': ['商品名称', '药品名称', '名称', '品名'],
+            'required': True,
+            'cleaners': ['text'],
+            'max_length': 100,
+        },
+        '通用名': {'aliases': ['通用名', '药品通用名', '通用名称'], 'default': ''},
+        '商品规格': {'aliases': ['商品规格', '规格', '规格型号'], 'required': True, 'default': ''},
+        '包装规格': {'aliases': ['包装规格', '包装', '包装型号'], 'default': ''},
+        '单位': {'aliases': ['单位', '计量单位', '销售单位'], 'default': '', 'category': True},
+        '剂型': {'aliases': ['剂型', '药品剂型', '制剂类型'], 'default': '', 'category': True},
+        '生产厂家': {'aliases': ['生产厂家', '生产厂商', '生产商', '生产企业'], 'default': '', 'category': True},
+        '商品产地': {'aliases': ['商品产地', '产地', '原产地'], 'default': ''},
+        '条码': {
+            'aliases': ['条码', '条形码', '商品条码', '助记符'],
+            'read_as_text': True,
+            'cleaners': ['text', 'digits'],
+            'max_length': 50,
+            'validate': 'ean',
+            'default': '',
+        },
+        '药品本位码': {'aliases': ['药品本位码', '本位码'], 'read_as_text': True, 'default': ''},
+        '批准文号': {'aliases': ['批准文号', '药品批准文号', '注册证号'], 'read_as_text': True, 'default': ''},
+        '零售价': {
+            'aliases': ['零售价', '价格', '售价', '销售价', '单价'],
+            'required': True,
+            'cleaners': ['numeric'],
+            'default': 0.01,
+        },
+        '会员价': {'aliases': ['会员价', '会员价格', '会员销售价'], 'cleaners': ['numeric'], 'default': ''},
+        '保质期': {'aliases': ['保质期'], 'default': ''},
+        '存储条件': {'aliases': ['存储条件', '储存条件', '贮藏条件'], 'default': '常温', 'category': True},
+        '是否处方药': {
+            'aliases': ['是否处方药', '处方药', '处方药类型', '处方类型'],
+            'cleaners': ['text', 'upper', ('map', OTC_MAPPING, '其他')],
+            'default': '否',
+            'category': True,
+        },
+        '是否医保药品': {
+            'aliases': ['是否医保药品', '医保药品', '医保类型'],
+            'cleaners': ['text', 'upper', ('yes_no', YES_VALUES)],
+            'default': '否',
+            'category': True,
+        },
+        '是否含麻黄碱': {
+            'aliases': ['是否含麻黄碱', '含麻', '含麻黄碱', '麻黄碱类型'],
+            'cleaners': ['text', 'upper', ('yes_no', YES_VALUES)],
+            'default': '否',
+            'category': True,
+        },
+        '是否中药材': {
+            'aliases': ['是否中药材', '中药材', '中药材类型'],
+            'cleaners': ['text', 'upper', ('yes_no', YES_VALUES)],
+            'category': True,
+        },
     },
-    'default_values': {
-        '商品类别': '未分类',
-        '单位': '个',
-        '产地': '',
-        '生产厂家': '',
-        '保质期': '',
-        '储存条件': '',
-        '备注': ''
-    }
 }
 
 # 供应商数据配置
 SUPPLIER_CONFIG = {
-    'required_columns': ['单位名称', '电话', '地址'],
-    'header_mapping': {
-        '原系统供应商编码': ['原系统供应商编码', '供应商编码', '编码'],
-        '单位名称': ['单位名称', '供应商名称', '公司名称'],
-        '税务登记/信用代码/营业执照号': ['税务登记/信用代码/营业执照号', '税号', '营业执照号'],
-        '法人代表': ['法人代表', '法定代表人'],
-        '联系人': ['联系人', '负责人'],
-        '电话': ['电话', '联系电话', '手机号'],
-        '地址': ['地址', '公司地址', '详细地址'],
-        '网址': ['网址', '网站', '公司网站'],
-        '电子邮箱': ['电子邮箱', '邮箱', 'E-mail'],
-        '销售员': ['销售员', '业务员']
+    'sheet_name': '供应商',
+    'output_file': '供应商导入.xlsx',
+    'dedup_key': ['原系统供应商编码'],
+    'text_columns': 'object',
+    'fill_stage': 'before_dedup',
+    'columns': {
+        '原系统供应商编码': {
+            'aliases': ['供应商编码', '供应商编号', '系统编码', '供应商ID', '编码', '供商代码'],
+            'required': True,
+            'read_as_text': True,
+        },
+        '单位名称': {
+            'aliases': ['单位名称', '供应商名称', '公司名称', '企业名称', '供商名称'],
+            'required': True,
+            'default': '',
+        },
+        '税务登记/信用代码/营业执照号': {
+            'aliases': ['统一社会信用代码', '营业执照号', '税务登记号', '信用代码'],
+            'read_as_text': True,
+            'default': '',
+        },
+        '法人代表': {'aliases': ['法人代表', '法定代表人', '负责人', '法人'], 'default': ''},
+        '联系人': {'aliases': ['联系人', '业务联系人', '经办人'], 'default': ''},
+        '电话': {'aliases': ['电话', '联系电话', '手机号码', '联系电话'], 'read_as_text': True, 'default': ''},
+        '地址': {'aliases': ['地址', '公司地址', '企业地址', '详细地址'], 'default': ''},
+        '网址': {'aliases': ['网址', '网站', '公司网站'], 'default': ''},
+        '电子邮箱': {'aliases': ['电子邮箱', '邮箱', 'E-mail', 'email'], 'default': ''},
+        '销售员': {'aliases': ['销售员', '业务员'], 'default': ''},
     },
-    'default_values': {
-        '原系统供应商编码': '',
-        '单位名称': '',
-        '税务登记/信用代码/营业执照号': '',
-        '法人代表': '',
-        '联系人': '',
-        '电话': '',
-        '地址': '',
-        '网址': '',
-        '电子邮箱': '',
-        '销售员': ''
-    }
 }
 
 # 库存数据配置
 INVENTORY_CONFIG = {
-    'required_columns': ['原系统商品编码', '批号', '生产日期', '数量', '单价'],
-    'header_mapping': {
-        'pro系统编码': ['pro系统编码', '系统编码', '商品编码'],
-        '原系统商品编码': ['原系统商品编码', '商品编码', '编码'],
-        '批号': ['批号', '生产批号'],
-        '生产日期': ['生产日期', '生产时间'],
-        '有效期至': ['有效期至', '有效期', '过期时间'],
-        '数量': ['数量', '库存数量'],
-        '单价': ['单价', '价格', '成本价'],
-        '供应商': ['供应商', '供货商']
+    'sheet_name': '库存',
+    'output_file': '库存导入.xlsx',
+    'text_columns': 'all',
+    'fill_stage': 'after_dedup',
+    'columns': {
+        'pro系统编码': {'aliases': ['pro系统编码', '系统编码', '编码', '商品编码'], 'read_as_text': True},
+        '原系统商品编码': {
+            'aliases': ['原系统商品编码', '商品编码', '药品编码', '商品编号'],
+            'required': True,
+            'read_as_text': True,
+        },
+        '批号': {'aliases': ['批号', '生产批号', '批次号'], 'required': True, 'read_as_text': True},
+        '生产日期': {'aliases': ['生产日期', '生产时间', '制造日期'], 'required': True, 'cleaners': ['date']},
+        '有效期至': {'aliases': ['有效期至', '有效期', '过期日期', '失效日期'], 'cleaners': ['date']},
+        '数量': {
+            'aliases': ['数量', '库存数量', '库存量'],
+            'required': True,
+            'cleaners': ['numeric', ('fillna', 0)],
+        },
+        '单价': {
+            'aliases': ['单价', '价格', '进价', '采购价'],
+            'required': True,
+            'cleaners': ['numeric', ('fillna', 0.0)],
+        },
+        '供应商': {'aliases': ['供应商', '供应商名称', '供货商', '供商名称'], 'category': True},
+    },
+    'row_rules': [
+        # 有效期至早于生产日期时，将生产日期设置为有效期至的前一年
+        ('fix_date_order', '生产日期', '有效期至'),
+        # 批号、生产日期和有效期至同时为空时，批号设为"无"
+        ('fill_when_empty', '批号', '无', ['生产日期', '有效期至']),
+    ],
+    'references': {
+        '原系统商品编码': ('商品', ['原系统商品编码']),
+        '供应商': ('供应商', ['单位名称', '原系统供应商编码']),
     },
-    'default_values': {
-        'pro系统编码': '',
-        '原系统商品编码': '',
-        '批号': '',
-        '生产日期': None,
-        '有效期至': None,
-        '数量': 0,
-        '单价': 0.0,
-        '供应商': ''
-    }
 }
 
 # 会员数据配置
 MEMBER_CONFIG = {
-    'required_columns': ['会员姓名', '手机号', '性别'],
-    'header_mapping': {
-        '会员姓名': ['会员姓名', '姓名', '客户姓名'],
-        '手机号': ['手机号', '手机', '联系电话'],
-        '性别': ['性别', '性别'],
-        '会员卡号': ['会员卡号', '卡号'],
-        '会员等级': ['会员等级', '等级'],
-        '积分': ['积分', '会员积分'],
-        '注册时间': ['注册时间', '开户时间'],
-        '生日': ['生日', '出生日期'],
-        '固定电话': ['固定电话', '座机'],
-        '身份证号': ['身份证号', '身份证'],
-        '电子邮箱': ['电子邮箱', '邮箱', 'E-mail'],
-        '地址': ['地址', '居住地址'],
-        '备注': ['备注', '说明']
+    'sheet_name': '会员',
+    'output_file': '会员导入.xlsx',
+    'business_key': ['会员卡号', '手机号'],
+    'dedup_key': ['手机号'],
+    'text_columns': 'object',
+    'fill_stage': 'after_dedup',
+    'columns': {
+        '会员姓名': {
+            'aliases': ['会员姓名', '姓名', '客户姓名', '顾客姓名', '客户名称', '持卡人'],
+            'required': True,
+            'default': '',
+        },
+        '手机号': {
+            'aliases': ['手机号', '手机号码', '联系电话', '手机'],
+            'read_as_text': True,
+            'cleaners': ['text', 'digits', 'blank_nulls'],
+            'max_length': 20,
+            'validate': 'mobile',
+            'default': '',
+        },
+        '座机号': {
+            'aliases': ['座机号', '固定电话', '电话', '座机', '电话号码'],
+            'read_as_text': True,
+            'cleaners': ['text', ('remove', r'[^\d\-\(\)]'), 'blank_nulls'],
+            'max_length': 20,
+            'default': '',
+        },
+        '性别': {
+            'aliases': ['性别', '性别类型'],
+            'cleaners': ['text', ('map', GENDER_MAPPING)],
+            'default': '男',
+            'category': True,
+        },
+        '身份证号': {
+            'aliases': ['身份证号', '身份证号码', '身份证', 'IDCardCode'],
+            'read_as_text': True,
+            'cleaners': ['text', ('remove', r'[^\dXx]'), 'upper', 'blank_nulls'],
+            'validate': 'id_card',
+            'default': '',
+        },
+        '出生年月日': {'aliases': ['出生年月日', '出生日期', '生日', '出生时间'], 'cleaners': ['date']},
+        '联系地址': {'aliases': ['联系地址', '地址', '居住地址', '详细地址'], 'default': ''},
+        '会员卡号': {
+            'aliases': ['会员卡号', '卡号', '会员编号', '会员ID'],
+            'read_as_text': True,
+            'cleaners': ['text', ('remove', r'[^\dA-Za-z]'), 'blank_nulls'],
+            'max_length': 20,
+            'default': '',
+        },
+        '剩余积分': {
+            'aliases': ['剩余积分', '积分', '当前积分'],
+            'required': True,
+            'cleaners': ['numeric', ('fillna', 0), ('clip_min', 0), 'int'],
+            'default': 0,
+        },
+        '剩余充值金额': {
+            'aliases': ['剩余充值金额', '充值金额', '账户余额', '余额'],
+            'cleaners': ['numeric', ('fillna', 0), ('clip_min', 0)],
+            'default': 0,
+        },
+        '剩余赠送金额': {
+            'aliases': ['剩余赠送金额', '赠送金额', '赠送余额'],
+            'cleaners': ['numeric', ('fillna', 0), ('clip_min', 0)],
+            'default': 0,
+        },
     },
-    'default_values': {
-        '会员卡号': '',
-        '会员等级': '普通会员',
-        '积分': 0,
-        '注册时间': None,
-        '生日': None,
-        '固定电话': '',
-        '身份证号': '',
-        '电子邮箱': '',
-        '地址': '',
-        '备注': ''
-    }
-} 
\ No newline at end of file
+}
+
+# 按处理顺序排列的全部工作表配置
+SHEET_CONFIGS = [PRODUCT_CONFIG, SUPPLIER_CONFIG, INVENTORY_CONFIG, MEMBER_CONFIG]
@@ -1,750 +1,782 @@
+import hashlib
+import itertools
+import threading
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QPushButton, QMessageBox, QApplication
-from PyQt5.QtCore import Qt
 import os
 
-class ColumnMappingDialog(QDialog):
-    def __init__(self, missing_columns, original_columns, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("选择必填字段匹配")
-        self.setModal(True)
-        # 设置窗口标志，使其始终显示在最前面
-        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.WindowCloseButtonHint | Qt.WindowTitleHint)
-        self.mappings = {}
-        
-        layout = QVBoxLayout()
-        
-        # 添加说明标签
-        info_label = QLabel("请为以下必填字段选择对应的列名：")
-        layout.addWidget(info_label)
-        
-        # 为每个缺失的必填字段创建下拉框
-        for col in missing_columns:
-            label = QLabel(f"{col}:")
-            combo = QComboBox()
-            combo.addItem("请选择...")
-            combo.addItems(original_columns)
-            layout.addWidget(label)
-            layout.addWidget(combo)
-            self.mappings[col] = combo
-        
-        # 添加确认按钮
-        confirm_button = QPushButton("确认")
-        confirm_button.clicked.connect(self.accept)
-        layout.addWidget(confirm_button)
-        
-        self.setLayout(layout)
-        
-        # 设置窗口大小和位置
-        self.resize(400, 300)
-        # 将窗口移动到屏幕中央
-        screen = QApplication.primaryScreen().geometry()
-        x = (screen.width() - self.width()) // 2
-        y = (screen.height() - self.height()) // 2
-        self.move(x, y)
+import dedup
+import incremental
+import integrity
+import validators
+from config import SHEET_CONFIGS
+from input_engines import INPUT_ENGINES, PandasExcelEngine, ReadPlan, open_input, resolve_engine
+from instrumentation import StageRecorder, append_json_line, format_summary
+from mapping_resolver import MappingResolver, RuleBasedResolver
+from parse_cache import DEFAULT_CACHE_BYTES, SheetCache, file_hash
+from pipeline import SheetPlan, compile_sheets
+from sheet_reader import DEFAULT_BATCH_SIZE
+from sheet_writer import DEFAULT_CSV_ENCODING, open_writer, output_filename, read_output
+
+
+class ConversionCancelled(Exception):
+    """转换被用户取消"""
 
-    def get_mappings(self):
-        return {col: combo.currentText() for col, combo in self.mappings.items()}
 
 class DataProcessor:
-    def __init__(self):
-        self.products_df: Optional[pd.DataFrame] = None
-        self.suppliers_df: Optional[pd.DataFrame] = None
-        self.inventory_df: Optional[pd.DataFrame] = None
-        self.members_df: Optional[pd.DataFrame] = None
+    # 各工作表的处理计划，由config.py中的配置编译得到（按处理顺序）
+    SHEET_PLANS: Dict[str, SheetPlan] = compile_sheets(SHEET_CONFIGS)
+
+    def __init__(self, streaming: bool = False, batch_size: int = DEFAULT_BATCH_SIZE,
+                 writer_backend: str = 'pandas', parallel: bool = False,
+                 max_workers: Optional[int] = None, mapping_resolver: Optional[MappingResolver] = None,
+                 factorize: bool = False, cache_dir: Optional[str] = None,
+                 cache_max_bytes: int = DEFAULT_CACHE_BYTES, incremental: bool = False,
+                 trace_memory: bool = False, metrics_log: Optional[str] = None,
+                 output_format: str = 'xlsx', csv_encoding: str = DEFAULT_CSV_ENCODING,
+                 input_engine: str = 'auto', projection: bool = False, dedup_policy: Optional[str] = None,
+                 check_references: bool = False, validate_fields: bool = False):
+        self.frames: Dict[str, pd.DataFrame] = {}  # 各工作表处理后的数据
         self.processed_data = None
         self.report = []
+        self.row_counts: Dict[str, int] = {}  # 各工作表成功输出的行数
+        self.header_warnings: Dict[str, List[str]] = {}  # 各工作表表头匹配的歧义提示
+        self.delta_counts: Dict[str, Dict[str, int]] = {}  # 增量模式下各工作表的{变更类型: 行数}
+        self.duplicate_counts: Dict[str, int] = {}  # 按主键去重时各工作表删除的行数
+        self.orphan_counts: Dict[str, Dict[str, int]] = {}  # 引用检查时各工作表的{引用列: 缺失引用的行数}
+        self.invalid_counts: Dict[str, Dict[str, int]] = {}  # 格式校验时各工作表的{列名: 未通过的行数}
+        self.metrics: Dict[str, dict] = {}  # 各工作表每个处理阶段的耗时、行数/秒和内存峰值
         self.input_file_path = None  # 添加输入文件路径属性
+        self.output_dir = None  # 输出目录，未设置时输出到输入文件所在目录
+        # 流式读取模式：按batch_size行分批读取和清理，不一次性载入整张表
+        self.streaming = streaming
+        self.batch_size = batch_size
+        # 读取方式：'auto'按扩展名选择（安装了python-calamine时优先使用），也可指定openpyxl、calamine、pandas或csv
+        self.input_engine = input_engine
+        # 按列读取：先读取表头确定列名映射，只读取映射到目标列的列，编码等列按文本读取
+        self.projection = projection
+        # 输出方式：'pandas'一次性写出，'streaming'边处理边以恒定内存写入磁盘
+        self.writer_backend = writer_backend
+        # 输出格式：xlsx、csv、parquet或jsonl；csv_encoding为CSV的编码（如gbk、utf-8-sig）
+        self.output_format = output_format
+        self.csv_encoding = csv_encoding
+        # 去重清理：每列只清理不重复的取值再还原到各行，适合重复取值多的大表
+        self.factorize = factorize
+        # 读取缓存：按文件内容缓存读取到的原始工作表，同一文件再次转换时不再解析Excel
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.sheet_cache = SheetCache(cache_dir, cache_max_bytes) if cache_dir else None
+        # 增量模式：配置了业务主键的工作表与上次转换的结果比对，只清理有变化的记录并另外输出增量文件
+        self.incremental = incremental
+        # 按主键去重：配置了dedup_key的工作表按主键指纹去重，重复时按策略（first、last、most_complete）保留一行，
+        # 被删除的行另外输出；为None时按整行去重
+        self.dedup_policy = dedup_policy
+        # 格式校验：身份证号、手机号、条码等配置了validate的列按规则校验，输出中增加校验结果和校验原因列
+        self.validate_fields = validate_fields
+        # 引用检查：全部工作表转换完成后，检查库存等工作表引用的商品编码、供应商是否存在，缺失引用的行另外输出
+        self.check_references = check_references
+        # 并行模式：各工作表在独立进程中读取、清理和写出
+        self.parallel = parallel
+        self.max_workers = max_workers
+        # 必填字段无法自动匹配时的处理方式：图形界面传入对话框，默认按规则匹配且不弹窗
+        self.mapping_resolver = mapping_resolver or RuleBasedResolver()
+        # 进度回调：每处理完一批调用progress_callback(工作表名, 已读取行数, 总行数或None)
+        self.progress_callback: Optional[Callable[[str, int, Optional[int]], None]] = None
+        self.sheet_totals: Dict[str, Optional[int]] = {}
+        self._cancel_event = threading.Event()
+        # 阶段统计：trace_memory为True时用tracemalloc记录内存峰值（会拖慢处理）；
+        # metrics_log为JSON Lines日志路径，每处理完一个工作表追加一条记录
+        self.trace_memory = trace_memory
+        self.metrics_log = metrics_log
+        self._recorders: Dict[str, StageRecorder] = {}
+        self._started_tracing = False
+
+    @property
+    def products_df(self) -> Optional[pd.DataFrame]:
+        return self.frames.get('商品')
+
+    @property
+    def suppliers_df(self) -> Optional[pd.DataFrame]:
+        return self.frames.get('供应商')
+
+    @property
+    def inventory_df(self) -> Optional[pd.DataFrame]:
+        return self.frames.get('库存')
+
+    @property
+    def members_df(self) -> Optional[pd.DataFrame]:
+        return self.frames.get('会员')
+
+    def release_frames(self):
+        """释放处理后的数据，转换结果仍保留在输出文件中，需要时用load_frames读回"""
+        self.frames.clear()
+
+    def load_frames(self):
+        """从输出文件读回成功输出的工作表（release_frames之后重新显示结果时使用）"""
+        for sheet_name in self.SHEET_PLANS:
+            if sheet_name in self.row_counts and sheet_name not in self.frames:
+                plan = self.SHEET_PLANS[sheet_name]
+                output_path = self.get_output_path(output_filename(plan.output_file, self.output_format))
+                if os.path.exists(output_path):
+                    self.frames[sheet_name] = read_output(output_path, self.output_format, self.csv_encoding)
 
     def set_input_file_path(self, file_path):
         """设置输入文件路径"""
         self.input_file_path = file_path
 
+    def cancel(self):
+        """请求取消转换，正在处理的工作表会在当前批次结束后停止"""
+        self._cancel_event.set()
+
+    def _check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise ConversionCancelled("转换已取消")
+
+    def _report_progress(self, sheet_name: str, rows_done: int):
+        if self.progress_callback is not None:
+            self.progress_callback(sheet_name, rows_done, self.sheet_totals.get(sheet_name))
+
+    def set_output_dir(self, output_dir):
+        """设置输出目录"""
+        self.output_dir = output_dir
+
     def get_output_path(self, filename):
         """获取输出文件路径"""
+        if self.output_dir:
+            return os.path.join(self.output_dir, filename)
         if self.input_file_path:
             # 获取输入文件所在目录
             output_dir = os.path.dirname(self.input_file_path)
             return os.path.join(output_dir, filename)
         return filename
 
-    def process_products(self, df: pd.DataFrame) -> str:
-        """处理商品数据"""
+    def _resolve_columns(self, plan: SheetPlan, columns) -> Optional[Dict[str, str]]:
+        """根据表头别名索引查找需要重命名的列，用户取消必填字段匹配时返回None"""
+        columns = list(columns)
+        resolution = plan.header_index.resolve(columns)
+        new_columns = dict(resolution.mapping)
+        self.header_warnings[plan.sheet_name] = resolution.ambiguities
+
+        # 检查必填字段是否都找到了
+        missing_required = [col for col in plan.required_columns if col not in resolution.found]
+        if missing_required:
+            # 交给匹配方式（对话框或规则）为缺失的必填字段选择列
+            user_mappings = self.mapping_resolver.resolve(plan.sheet_name, missing_required, columns)
+            if user_mappings is None:
+                return None
+            # 添加用户选择的映射
+            for new_col, old_col in user_mappings.items():
+                new_columns[old_col] = new_col
+
+        return new_columns
+
+    def _drop_seen_duplicates(self, df: pd.DataFrame, seen: set) -> pd.DataFrame:
+        """跨批次删除重复行，seen中保存已出现过的整行哈希值"""
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        keep = ~pd.Series(hashes).duplicated().to_numpy()
+        keep &= ~np.fromiter(map(seen.__contains__, hashes.tolist()), dtype=bool, count=len(hashes))
+        seen.update(hashes[keep].tolist())
+        return df[keep]
+
+    def _key_dedup(self, plan: SheetPlan) -> bool:
+        return self.dedup_policy is not None and bool(plan.dedup_key)
+
+    def _deduplicate(self, plan: SheetPlan, df: pd.DataFrame, duplicates: List[pd.DataFrame]) -> pd.DataFrame:
+        """删除重复行：按主键去重时把被删除的行加入duplicates，否则按整行去重"""
+        if not self._key_dedup(plan):
+            return df.drop_duplicates()
+        df, dropped = dedup.deduplicate(df, plan.dedup_key, self.dedup_policy, plan.target_columns)
+        if len(dropped):
+            duplicates.append(dropped)
+        return df
+
+    def _write_duplicates(self, plan: SheetPlan, duplicates: List[pd.DataFrame], output_path: str,
+                          recorder: StageRecorder):
+        """把按主键去重时删除的行（附带重复原因和重复键）写入重复行报告"""
+        self.duplicate_counts[plan.sheet_name] = sum(len(part) for part in duplicates)
+        if not duplicates:
+            return
+        with recorder.measure('finish', self.duplicate_counts[plan.sheet_name]):
+            dropped = pd.concat(duplicates, ignore_index=True)
+            reasons = dropped[[dedup.REASON_COLUMN, dedup.KEY_COLUMN]]
+            dropped = plan.finish(dropped)
+            dropped.insert(0, dedup.KEY_COLUMN, reasons[dedup.KEY_COLUMN].to_numpy())
+            dropped.insert(0, dedup.REASON_COLUMN, reasons[dedup.REASON_COLUMN].to_numpy())
+        self._write_file(dedup.report_path(output_path), dropped, recorder, plan.column_types)
+
+    def _validate(self, plan: SheetPlan, df: pd.DataFrame, recorder: StageRecorder,
+                  count: bool = True) -> pd.DataFrame:
+        """格式校验，在df末尾加上校验结果和校验原因列；count为True时累计未通过的行数"""
+        if not self.validate_fields or not plan.validations:
+            return df
+        with recorder.measure('validate', len(df)):
+            df, counts = validators.validate(df, plan.validations)
+        if count:
+            totals = self.invalid_counts.setdefault(plan.sheet_name, {})
+            for col, invalid in counts.items():
+                totals[col] = totals.get(col, 0) + invalid
+        return df
+
+    def _recorder(self, sheet_name: str) -> StageRecorder:
+        """当前正在处理的工作表的阶段统计"""
+        if sheet_name not in self._recorders:
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            self._recorders[sheet_name] = StageRecorder(sheet_name, self.trace_memory)
+        return self._recorders[sheet_name]
+
+    def _finish_metrics(self, sheet_name: str):
+        """结束工作表的阶段统计，保存到metrics并写入日志"""
+        recorder = self._recorders.pop(sheet_name, None)
+        if recorder is None:
+            return
+        self.metrics[sheet_name] = recorder.to_dict()
+        self._log_metrics(sheet_name)
+        if self._started_tracing and not self._recorders:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _log_metrics(self, sheet_name: str):
+        if self.metrics_log and sheet_name in self.metrics:
+            append_json_line(self.metrics_log, {
+                'file': self.input_file_path,
+                'sheet': sheet_name,
+                'output_rows': self.row_counts.get(sheet_name),
+                **self.metrics[sheet_name],
+            })
+
+    def _prepare(self, plan: SheetPlan, df: pd.DataFrame, recorder: StageRecorder) -> pd.DataFrame:
+        """分阶段执行SheetPlan.prepare"""
+        with recorder.measure('clean', len(df)):
+            df = plan.clean(df, self.factorize)
+        with recorder.measure('row_rules', len(df)):
+            df = plan.apply_row_rules(df)
+            if plan.fill_before_dedup:
+                df = df.fillna(plan.defaults)
+        return df
+
+    def _write(self, writer, df: pd.DataFrame, recorder: StageRecorder):
+        with recorder.measure('write', len(df)):
+            writer.write(df)
+
+    def _open_writer(self, output_path: str, column_types: Optional[Dict[str, str]] = None):
+        return open_writer(output_path, self.writer_backend, self.output_format, self.csv_encoding, column_types)
+
+    def _write_file(self, output_path: str, df: pd.DataFrame, recorder: StageRecorder,
+                    column_types: Optional[Dict[str, str]] = None):
+        """一次性写出df，出错时删除写了一部分的文件"""
+        writer = self._open_writer(output_path, column_types)
         try:
-            # 定义表头映射关系
-            header_mapping = {
-                '原系统商品编码': ['商品编码', '药品编码', '药品编号', '商品编号','商品代码'],
-                '商品名称': ['商品名称', '药品名称', '名称', '品名'],
-                '通用名': ['通用名', '药品通用名', '通用名称'],
-                '商品规格': ['商品规格', '规格', '规格型号'],
-                '包装规格': ['包装规格', '包装', '包装型号'],
-                '单位': ['单位', '计量单位', '销售单位'],
-                '剂型': ['剂型', '药品剂型', '制剂类型'],
-                '生产厂家': ['生产厂家', '生产厂商', '生产商', '生产企业'],
-                '商品产地': ['商品产地', '产地', '原产地'],
-                '条码': ['条码', '条形码', '商品条码','助记符'],
-                '药品本位码': ['药品本位码', '本位码'], 
-                '批准文号': ['批准文号', '药品批准文号', '注册证号'],
-                '零售价': ['零售价', '价格', '售价', '销售价','单价'],
-                '会员价': ['会员价', '会员价格', '会员销售价'],
-                '保质期': ['保质期'],
-                '存储条件': ['存储条件', '储存条件', '贮藏条件'],
-                '是否处方药': ['是否处方药', '处方药', '处方药类型','处方类型'],
-                '是否医保药品': ['是否医保药品', '医保药品', '医保类型'],
-                '是否含麻黄碱': ['是否含麻黄碱', '含麻', '含麻黄碱', '麻黄碱类型'],
-                '是否中药材': ['是否中药材', '中药材', '中药材类型']
-            }
-
-            # 定义必填字段
-            required_columns = ['商品名称', '商品规格', '零售价']
-
-            # 查找并重命名列
-            new_columns = {}
-            found_columns = set()  # 用于记录找到的列
-            for new_col, possible_names in header_mapping.items():
-                for old_col in df.columns:
-                    if old_col in possible_names:
-                        new_columns[old_col] = new_col
-                        found_columns.add(new_col)
-                        break
-
-            # 检查必填字段是否都找到了
-            missing_required = [col for col in required_columns if col not in found_columns]
-            if missing_required:
-                # 创建弹窗让用户选择匹配
-                dialog = ColumnMappingDialog(missing_required, df.columns.tolist())
-                if dialog.exec_() == QDialog.Accepted:
-                    user_mappings = dialog.get_mappings()
-                    # 添加用户选择的映射
-                    for new_col, old_col in user_mappings.items():
-                        if old_col != "请选择...":
-                            new_columns[old_col] = new_col
-                            found_columns.add(new_col)
-                else:
-                    return "用户取消了必填字段匹配操作"
-
-            # 重命名列
-            df = df.rename(columns=new_columns)
-
-            # 创建缺失的列并设置默认值
-            for col in header_mapping.keys():
-                if col not in df.columns:
-                    df[col] = None
-
-            # 数据清理
-            df = df.copy()
-            
-            # 对字符串类型的列进行清理
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    # 将非字符串值转换为字符串
-                    df[col] = df[col].astype(str)
-                    # 清理字符串
-                    df[col] = df[col].str.strip()
-                    # 将空字符串和'nan'替换为空字符串
-                    df[col] = df[col].replace(['nan', 'None', 'NULL', ''], '')
-            
-            # 类型转换（如果存在这些列）
-            if '零售价' in df.columns:
-                df['零售价'] = pd.to_numeric(df['零售价'], errors='coerce')
-            if '会员价' in df.columns:
-                df['会员价'] = pd.to_numeric(df['会员价'], errors='coerce')
-            
-            # 处理原系统商品编码
-            if '原系统商品编码' in df.columns:
-                # 转换为字符串类型
-                df['原系统商品编码'] = df['原系统商品编码'].astype(str)
-                # 清理空白字符
-                df['原系统商品编码'] = df['原系统商品编码'].str.strip()
-                # 截断超过20位的编码
-                df['原系统商品编码'] = df['原系统商品编码'].str[:20]
-
-            # 处理商品名称
-            if '商品名称' in df.columns:
-                # 转换为字符串类型
-                df['商品名称'] = df['商品名称'].astype(str)
-                # 清理空白字符
-                df['商品名称'] = df['商品名称'].str.strip()
-                # 截断超过100位的商品名称
-                df['商品名称'] = df['商品名称'].str[:100]
-            # 处理条码
-            if '条码' in df.columns:
-                # 转换为字符串类型
-                df['条码'] = df['条码'].astype(str)
-                # 清理空白字符
-                df['条码'] = df['条码'].str.strip()
-                # 只保留数字
-                df['条码'] = df['条码'].str.extract('(\d+)', expand=False)
-                # 截断超过50位的条码
-                df['条码'] = df['条码'].str[:50]
-
-            # 处理"是否处方药"字段
-            if '是否处方药' in df.columns:
-                # 创建映射字典
-                otc_mapping = {
-                    '非处方药': '非处方药',
-                    'OTC': '非处方药',
-                    '处方药': '处方药',
-                    'RX': '处方药',
-                    '甲类非处方药': '甲类非处方药', 
-                    '甲类OTC': '甲类非处方药',
-                    '乙类非处方药': '乙类非处方药',
-                    '乙类OTC': '乙类非处方药'
-                }
-                
-                # 转换为字符串并清理
-                df['是否处方药'] = df['是否处方药'].astype(str).str.strip().str.upper()
-                
-                # 应用映射,未匹配项设为"其他"
-                df['是否处方药'] = df['是否处方药'].map(otc_mapping).fillna('其他')
-
-            # 处理是否中药材字段
-            if '是否中药材' in df.columns:
-                # 转换为字符串并清理
-                df['是否中药材'] = df['是否中药材'].astype(str).str.strip().str.upper()
-                # 将各种"是"的表达映射为"是"
-                df['是否中药材'] = df['是否中药材'].map(lambda x: '是' if x in ['是','YES','Y','TRUE','1'] else '否')
-
-            # 处理是否含麻黄碱字段
-            if '是否含麻黄碱' in df.columns:
-                # 转换为字符串并清理
-                df['是否含麻黄碱'] = df['是否含麻黄碱'].astype(str).str.strip().str.upper()
-                # 将各种"是"的表达映射为"是"
-                df['是否含麻黄碱'] = df['是否含麻黄碱'].map(lambda x: '是' if x in ['是','YES','Y','TRUE','1'] else '否')
-
-            # 处理是否医保药品字段
-            if '是否医保药品' in df.columns:
-                # 转换为字符串并清理
-                df['是否医保药品'] = df['是否医保药品'].astype(str).str.strip().str.upper()
-                # 将各种"是"的表达映射为"是"
-                df['是否医保药品'] = df['是否医保药品'].map(lambda x: '是' if x in ['是','YES','Y','TRUE','1'] else '否')
-
-            
-            # 删除重复行
-            df = df.drop_duplicates()
-            
-            # 处理缺失值
-            fillna_dict = {
-                '零售价': 0.01,
-                '会员价': '',
-                '生产厂家': '',
-                '商品产地': '',
-                '包装规格': '',
-                '单位': '',
-                '剂型': '',
-                '是否处方药': '否',
-                '是否含麻黄碱': '否',
-                '是否医保药品': '否',
-                '保质期': '',
-                '存储条件': '常温',
-                '通用名': '',
-                '商品规格': '',
-                '条码': '',
-                '药品本位码': '',
-                '批准文号': ''
-            }
-            
-            df = df.fillna(fillna_dict)
-            
-            
-            # 只保留目标列
-            target_columns = list(header_mapping.keys())
-            df = df[target_columns]
-            
-            self.products_df = df
-            
-            # 保存处理后的数据
-            output_path = self.get_output_path('商品导入.xlsx')
-            df.to_excel(output_path, index=False)
-            
-            # 生成报告
-            self.report = [
-                f"商品数据处理完成",
-                f"总行数: {len(df)}",
-                f"已保存到: {output_path}"
-            ]
-            
-            return "\n".join(self.report)
-            
-        except Exception as e:
-            return f"处理商品数据时出错: {str(e)}"
-
-    def process_suppliers(self, df: pd.DataFrame) -> str:
-        """处理供应商数据"""
+            self._write(writer, df, recorder)
+            with recorder.measure('write'):
+                writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+
+    def _run_pipeline(self, plan: SheetPlan, data, output_path, column_mapping=None):
+        """执行表头匹配、清理、去重、收尾并写出结果，用户取消匹配时返回None
+
+        data可以是完整的DataFrame，也可以是按批次产出DataFrame的迭代器（流式读取）。
+        column_mapping为事先确定好的列名映射，传入时不再进行表头匹配。
+        返回(处理后的DataFrame, 总行数)；流式读取且流式写出时不在内存中保留整表，DataFrame为None。
+        """
+        sheet_name = plan.sheet_name
+        recorder = self._recorder(sheet_name)
+        if isinstance(data, pd.DataFrame):
+            batches = iter([data])
+        else:
+            batches = recorder.timed_batches(iter(data))
+        first = next(batches)
+        # 确保所有列名都是字符串类型
+        first.columns = first.columns.astype(str)
+
+        new_columns = column_mapping
+        if new_columns is None:
+            with recorder.measure('headers'):
+                new_columns = self._resolve_columns(plan, first.columns)
+        if new_columns is None:
+            return None
+
+        incremental_sheet = self.incremental and bool(plan.business_key)
+        # 增量比对需要整张表；按主键去重时除first外的策略要看到主键的全部行才能决定保留哪一行
+        whole_table = incremental_sheet or (self._key_dedup(plan) and self.dedup_policy != 'first')
+        if whole_table and not isinstance(data, pd.DataFrame):
+            rest = list(batches)
+            for batch in rest:
+                batch.columns = batch.columns.astype(str)
+            data = pd.concat([first] + rest, ignore_index=True)
+            first = data
+        if incremental_sheet:
+            return self._run_incremental(plan, first.rename(columns=new_columns), output_path)
+
+        writer = self._open_writer(output_path, plan.column_types)
         try:
-            # 定义表头映射关系
-            header_mapping = {
-                '原系统供应商编码': ['供应商编码', '供应商编号', '系统编码','供应商ID', '编码','供商代码'],
-                '单位名称': ['单位名称', '供应商名称', '公司名称', '企业名称','供商名称'],
-                '税务登记/信用代码/营业执照号': ['统一社会信用代码', '营业执照号', '税务登记号', '信用代码'],
-                '法人代表': ['法人代表', '法定代表人', '负责人','法人'],
-                '联系人': ['联系人', '业务联系人', '经办人'],
-                '电话': ['电话', '联系电话', '手机号码', '联系电话'],
-                '地址': ['地址', '公司地址', '企业地址', '详细地址'],
-                '网址': ['网址', '网站', '公司网站'],
-                '电子邮箱': ['电子邮箱', '邮箱', 'E-mail', 'email'],
-                '销售员': ['销售员', '业务员']
-            }
-
-            # 定义必填字段
-            required_columns = ['原系统供应商编码', '单位名称']
-
-            # 查找并重命名列
-            new_columns = {}
-            found_columns = set()  # 用于记录找到的列
-            for new_col, possible_names in header_mapping.items():
-                for old_col in df.columns:
-                    if old_col in possible_names:
-                        new_columns[old_col] = new_col
-                        found_columns.add(new_col)
-                        break
-
-            # 检查必填字段是否都找到了
-            missing_required = [col for col in required_columns if col not in found_columns]
-            if missing_required:
-                # 创建弹窗让用户选择匹配
-                dialog = ColumnMappingDialog(missing_required, df.columns.tolist())
-                if dialog.exec_() == QDialog.Accepted:
-                    user_mappings = dialog.get_mappings()
-                    # 添加用户选择的映射
-                    for new_col, old_col in user_mappings.items():
-                        if old_col != "请选择...":
-                            new_columns[old_col] = new_col
-                            found_columns.add(new_col)
-                else:
-                    return "用户取消了必填字段匹配操作"
-
-            # 重命名列
-            df = df.rename(columns=new_columns)
-
-            # 创建缺失的列并设置默认值
-            for col in header_mapping.keys():
-                if col not in df.columns:
-                    df[col] = None
-
-            # 数据清理
-            df = df.copy()
-            
-            # 对字符串类型的列进行清理
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    # 将非字符串值转换为字符串
-                    df[col] = df[col].astype(str)
-                    # 清理字符串
-                    df[col] = df[col].str.strip()
-                    # 将空字符串和'nan'替换为空字符串
-                    df[col] = df[col].replace(['nan', 'None', 'NULL', ''], '')
-            
-            # 处理缺失值
-            fillna_dict = {
-                '单位名称': '',
-                '税务登记/信用代码/营业执照号': '',
-                '法人代表': '',
-                '联系人': '',
-                '电话': '',
-                '地址': '',
-                '网址': '',
-                '电子邮箱': '',
-                '销售员': ''
-            }
-            
-            df = df.fillna(fillna_dict)
-            # 删除重复行
-            df = df.drop_duplicates()
-            
-            
-            # 只保留目标列
-            target_columns = list(header_mapping.keys())
-            df = df[target_columns]
-            
-            self.suppliers_df = df
+            duplicates = []
+            if isinstance(data, pd.DataFrame):
+                self.sheet_totals.setdefault(sheet_name, len(first))
+                with recorder.measure('headers', len(first)):
+                    df = first.rename(columns=new_columns)
+                df = self._prepare(plan, df, recorder)
+                # 删除重复行
+                with recorder.measure('dedup', len(df)):
+                    df = self._deduplicate(plan, df, duplicates)
+                with recorder.measure('finish', len(df)):
+                    df = plan.finish(df)
+                df = self._validate(plan, df, recorder)
+                self._check_cancelled()
+                self._write(writer, df, recorder)
+                with recorder.measure('write'):
+                    writer.close()
+                if self._key_dedup(plan):
+                    self._write_duplicates(plan, duplicates, output_path, recorder)
+                self._report_progress(sheet_name, len(first))
+                return df, writer.rows
+
+            keep_frame = self.writer_backend != 'streaming'
+            key_dedup = self._key_dedup(plan)
+            seen = set()
+            parts = []
+            rows_done = 0
+            for batch in itertools.chain([first], batches):
+                self._check_cancelled()
+                rows_done += len(batch)
+                batch.columns = batch.columns.astype(str)
+                with recorder.measure('headers', len(batch)):
+                    batch = batch.rename(columns=new_columns)
+                batch = self._prepare(plan, batch, recorder)
+                # 删除重复行（包括与之前批次重复的行）
+                with recorder.measure('dedup', len(batch)):
+                    if key_dedup:
+                        batch, dropped = dedup.drop_seen(batch, plan.dedup_key, seen)
+                        if len(dropped):
+                            duplicates.append(dropped)
+                    else:
+                        batch = self._drop_seen_duplicates(batch, seen)
+                with recorder.measure('finish', len(batch)):
+                    batch = plan.finish(batch)
+                batch = self._validate(plan, batch, recorder)
+                self._write(writer, batch, recorder)
+                if keep_frame:
+                    parts.append(batch)
+                self._report_progress(sheet_name, rows_done)
+            self._check_cancelled()
+            with recorder.measure('write'):
+                writer.close()
+            if key_dedup:
+                self._write_duplicates(plan, duplicates, output_path, recorder)
+            df = plan.concat(parts) if keep_frame else None
+            return df, writer.rows
+        except BaseException:
+            # 出错或取消时不留下写了一部分的输出文件
+            writer.abort()
+            raise
+
+    def _run_incremental(self, plan: SheetPlan, df: pd.DataFrame, output_path):
+        """增量模式：写出完整结果和增量文件并保存本次的状态，返回(处理后的DataFrame, 总行数)"""
+        sheet_name = plan.sheet_name
+        recorder = self._recorder(sheet_name)
+        self.sheet_totals.setdefault(sheet_name, len(df))
+        state_file = incremental.state_path(output_path)
+        with recorder.measure('incremental', len(df)):
+            state = incremental.load_state(state_file, plan)
+            full, delta, new_state = incremental.apply_delta(plan, df, state, self.factorize)
+        self._check_cancelled()
+
+        duplicates = []
+        with recorder.measure('dedup', len(full) + len(delta)):
+            full = self._deduplicate(plan, full, duplicates)
+            delta = delta.drop_duplicates()
+        with recorder.measure('finish', len(full) + len(delta)):
+            full = plan.finish(full)
+            changes = delta.pop(incremental.CHANGE_COLUMN)
+            delta = plan.finish(delta)
+            delta.insert(0, incremental.CHANGE_COLUMN, changes.to_numpy())
+        full = self._validate(plan, full, recorder)
+        delta = self._validate(plan, delta, recorder, count=False)
+
+        for frame, path in ((full, output_path), (delta, incremental.delta_path(output_path))):
+            self._write_file(path, frame, recorder, plan.column_types)
+        if self._key_dedup(plan):
+            self._write_duplicates(plan, duplicates, output_path, recorder)
+        incremental.save_state(state_file, new_state)
+
+        self.delta_counts[sheet_name] = {
+            change: int((changes == change).sum())
+            for change in (incremental.INSERTED, incremental.UPDATED, incremental.DELETED)
+        }
+        self._report_progress(sheet_name, len(df))
+        return full, len(full)
+
+    def process_sheet(self, sheet_name: str, data, column_mapping: Optional[Dict[str, str]] = None) -> str:
+        """按配置编译的处理计划处理一个工作表"""
+        plan = self.SHEET_PLANS[sheet_name]
+        try:
+            # 处理并保存数据
+            output_path = self.get_output_path(output_filename(plan.output_file, self.output_format))
+            result = self._run_pipeline(plan, data, output_path, column_mapping)
+            if result is None:
+                return "用户取消了必填字段匹配操作"
             
-            # 保存处理后的数据
-            output_path = self.get_output_path('供应商导入.xlsx')
-            df.to_excel(output_path, index=False)
+            self.frames[sheet_name], row_count = result
+            self.row_counts[sheet_name] = row_count
+            self._finish_metrics(sheet_name)
             
             # 生成报告
             self.report = [
-                f"供应商数据处理完成",
-                f"总行数: {len(df)}",
+                f"{sheet_name}数据处理完成",
+                f"总行数: {row_count}",
                 f"已保存到: {output_path}"
             ]
+            if sheet_name in self.delta_counts:
+                counts = "，".join(f"{change}{count}行" for change, count in self.delta_counts[sheet_name].items())
+                self.report.append(f"增量: {counts}，已保存到: {incremental.delta_path(output_path)}")
+            if self.duplicate_counts.get(sheet_name):
+                self.report.append(f"重复: 按主键删除{self.duplicate_counts[sheet_name]}行，"
+                                   f"已保存到: {dedup.report_path(output_path)}")
+            if sheet_name in self.invalid_counts:
+                counts = "，".join(f"{col}{count}行" for col, count in self.invalid_counts[sheet_name].items() if count)
+                self.report.append(f"校验未通过: {counts}（见{validators.VALID_COLUMN}和{validators.REASON_COLUMN}列）"
+                                   if counts else "校验: 全部通过")
+            self.report.append(format_summary(self.metrics[sheet_name]))
+            self.report.extend(f"表头匹配提示: {warning}" for warning in self.header_warnings.get(sheet_name, []))
             
             return "\n".join(self.report)
             
+        except ConversionCancelled:
+            raise
         except Exception as e:
-            return f"处理供应商数据时出错: {str(e)}"
-
-    def process_inventory(self, df: pd.DataFrame) -> str:
-        """处理库存数据"""
-        try:
-            # 确保所有列名都是字符串类型
-            df.columns = df.columns.astype(str)
-            
-            # 定义表头映射关系
-            header_mapping = {
-                'pro系统编码': ['pro系统编码', '系统编码', '编码', '商品编码'],
-                '原系统商品编码': ['原系统商品编码', '商品编码', '药品编码', '商品编号'],
-                '批号': ['批号', '生产批号', '批次号'],
-                '生产日期': ['生产日期', '生产时间', '制造日期'],
-                '有效期至': ['有效期至', '有效期', '过期日期', '失效日期'],
-                '数量': ['数量', '库存数量', '库存量'],
-                '单价': ['单价', '价格', '进价', '采购价'],
-                '供应商': ['供应商', '供应商名称', '供货商', '供商名称']
-            }
-
-            # 定义必填字段
-            required_columns = ['原系统商品编码', '批号', '生产日期', '数量','单价']
-
-            # 查找并重命名列
-            new_columns = {}
-            found_columns = set()  # 用于记录找到的列
-            for new_col, possible_names in header_mapping.items():
-                for old_col in df.columns:
-                    if str(old_col) in possible_names:
-                        new_columns[old_col] = new_col
-                        found_columns.add(new_col)
-                        break
-
-            # 检查必填字段是否都找到了
-            missing_required = [col for col in required_columns if col not in found_columns]
-            if missing_required:
-                # 创建弹窗让用户选择匹配
-                dialog = ColumnMappingDialog(missing_required, df.columns.tolist())
-                if dialog.exec_() == QDialog.Accepted:
-                    user_mappings = dialog.get_mappings()
-                    # 添加用户选择的映射
-                    for new_col, old_col in user_mappings.items():
-                        if old_col != "请选择...":
-                            new_columns[old_col] = new_col
-                            found_columns.add(new_col)
-                else:
-                    return "用户取消了必填字段匹配操作"
+            return f"处理{sheet_name}数据时出错: {str(e)}"
+        finally:
+            self._finish_metrics(sheet_name)
 
-            # 重命名列
-            df = df.rename(columns=new_columns)
+    def process_products(self, data, column_mapping: Optional[Dict[str, str]] = None) -> str:
+        """处理商品数据"""
+        return self.process_sheet('商品', data, column_mapping)
 
-            # 创建缺失的列并设置默认值
-            for col in header_mapping.keys():
-                if col not in df.columns:
-                    df[col] = None
+    def process_suppliers(self, data, column_mapping: Optional[Dict[str, str]] = None) -> str:
+        """处理供应商数据"""
+        return self.process_sheet('供应商', data, column_mapping)
 
-            # 数据清理
-            df = df.copy()
-            
-            # 对字符串类型的列进行清理
-            for col in df.columns:
-                if col not in ['数量', '单价']:  # 数值类型字段单独处理
-                    df[col] = df[col].astype(str)
-                    df[col] = df[col].str.strip()
-                    df[col] = df[col].replace(['nan', 'None', 'NULL', ''], '')
-            
-            # 处理数值类型字段
-            df['数量'] = pd.to_numeric(df['数量'], errors='coerce')
-            df['单价'] = pd.to_numeric(df['单价'], errors='coerce')
-            df['数量'] = df['数量'].fillna(0)
-            df['单价'] = df['单价'].fillna(0.0)
-            
-            # 处理日期字段
-            if '生产日期' in df.columns:
-                df['生产日期'] = pd.to_datetime(df['生产日期'], errors='coerce')
-                # 处理YYYYMM格式的日期
-                mask = df['生产日期'].isna()
-                if mask.any():
-                    def parse_date(date_str):
-                        try:
-                            if isinstance(date_str, str) and len(date_str) == 6:
-                                year = int(date_str[:4])
-                                month = int(date_str[4:])
-                                return pd.Timestamp(year, month, 1)
-                            return pd.NaT
-                        except:
-                            return pd.NaT
-                    
-                    df.loc[mask, '生产日期'] = df.loc[mask, '生产日期'].astype(str).apply(parse_date)
-            
-            if '有效期至' in df.columns:
-                df['有效期至'] = pd.to_datetime(df['有效期至'], errors='coerce')
-                # 处理YYYYMM格式的日期
-                mask = df['有效期至'].isna()
-                if mask.any():
-                    def parse_date(date_str):
-                        try:
-                            if isinstance(date_str, str) and len(date_str) == 6:
-                                year = int(date_str[:4])
-                                month = int(date_str[4:])
-                                return pd.Timestamp(year, month, 1)
-                            return pd.NaT
-                        except:
-                            return pd.NaT
-                    
-                    df.loc[mask, '有效期至'] = df.loc[mask, '有效期至'].astype(str).apply(parse_date)
-            
-            # 检查生产日期和有效期至的关系
-            if '生产日期' in df.columns and '有效期至' in df.columns:
-                mask = (df['有效期至'].notna()) & (df['生产日期'].notna())
-                invalid_dates = mask & (df['有效期至'] < df['生产日期'])
-                if invalid_dates.any():
-                    # 将生产日期设置为有效期至的前一年
-                    df.loc[invalid_dates, '生产日期'] = df.loc[invalid_dates, '有效期至'].apply(
-                        lambda x: pd.Timestamp(x.year - 1, x.month, 1)
-                    )
-            
-            # 检查批号、生产日期和有效期至是否同时为空
-            if '批号' in df.columns and '生产日期' in df.columns and '有效期至' in df.columns:
-                mask = (
-                    (df['批号'] == '') & 
-                    (df['生产日期'].isna()) & 
-                    (df['有效期至'].isna())
-                )
-                if mask.any():
-                    df.loc[mask, '批号'] = '无'
-            
-            # 删除重复行
-            df = df.drop_duplicates()
-            
-            # 只保留目标列
-            target_columns = list(header_mapping.keys())
-            df = df[target_columns]
-            
-            self.inventory_df = df
-            
-            # 保存处理后的数据
-            output_path = self.get_output_path('库存导入.xlsx')
-            df.to_excel(output_path, index=False)
-            
-            # 生成报告
-            self.report = [
-                f"库存数据处理完成",
-                f"总行数: {len(df)}",
-                f"已保存到: {output_path}"
-            ]
-            
-            return "\n".join(self.report)
-            
-        except Exception as e:
-            return f"处理库存数据时出错: {str(e)}"
+    def process_inventory(self, data, column_mapping: Optional[Dict[str, str]] = None) -> str:
+        """处理库存数据"""
+        return self.process_sheet('库存', data, column_mapping)
 
-    def process_members(self, df: pd.DataFrame) -> str:
+    def process_members(self, data, column_mapping: Optional[Dict[str, str]] = None) -> str:
         """处理会员数据"""
+        return self.process_sheet('会员', data, column_mapping)
+
+    def detect_sheet(self, file_path: str, columns: List[str]) -> Optional[str]:
+        """判断文本文件（只有一张表）对应哪个工作表：文件名中含有工作表名时以文件名为准，
+        否则取必填字段都能匹配、且匹配到的列最多的工作表，都无法匹配时返回None"""
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        for sheet_name in self.SHEET_PLANS:
+            if sheet_name in stem:
+                return sheet_name
+        best, best_found = None, 0
+        for sheet_name, plan in self.SHEET_PLANS.items():
+            found = plan.header_index.resolve([str(col) for col in columns]).found
+            if all(col in found for col in plan.required_columns) and len(found) > best_found:
+                best, best_found = sheet_name, len(found)
+        return best
+
+    def open_input(self, file_path: Optional[str] = None):
+        """按input_engine打开输入文件，返回input_engines中的读取器，用完后需要调用close"""
+        return open_input(file_path or self.input_file_path, self.input_engine, self.detect_sheet)
+
+    def _as_input(self, excel_file):
+        """把文件路径或pd.ExcelFile统一为读取器，返回(读取器, 是否由这里打开)"""
+        if isinstance(excel_file, str):
+            return self.open_input(excel_file), True
+        if isinstance(excel_file, pd.ExcelFile):
+            engine_class = INPUT_ENGINES.get(excel_file.engine, PandasExcelEngine)
+            return engine_class(self.input_file_path, excel_file), False
+        return excel_file, False
+
+    def _parse_sheet(self, engine, sheet_name: str, read_plan: Optional[ReadPlan] = None):
+        """解析工作表：流式模式下返回按批次产出DataFrame的迭代器"""
+        if self.streaming:
+            self.sheet_totals[sheet_name] = engine.row_count(sheet_name)
+            return engine.iter_batches(sheet_name, self.batch_size, read_plan)
+        return engine.read_sheet(sheet_name, read_plan)
+
+    def _cache_variant(self, read_plan: Optional[ReadPlan] = None) -> str:
+        # 不同读取方式得到的原始数据不完全相同，分别缓存
+        variant = f"batches-{self.batch_size}" if self.streaming else 'frame'
+        engine = resolve_engine(self.input_file_path, self.input_engine)
+        variant = variant if engine == 'openpyxl' else f"{engine}-{variant}"
+        if read_plan is not None and read_plan.text_columns:
+            # 文本列在解析时就已转为文本，文本列不同时分别缓存
+            digest = hashlib.sha1('\0'.join(sorted(read_plan.text_columns)).encode('utf-8')).hexdigest()[:12]
+            variant = f"{variant}-text-{digest}"
+        return variant
+
+    def _use_cache(self) -> bool:
+        return self.sheet_cache is not None and bool(self.input_file_path)
+
+    def _read_sheet(self, excel_file, sheet_name: str, read_plan: Optional[ReadPlan] = None):
+        """读取工作表，启用缓存时优先从缓存读取，未缓存时解析后写入缓存
+
+        缓存中保存的是整张表，按列读取时从读到的整表中选出计划中的列；整张表解析时文本列同样直接读为文本。
+        """
+        if not self._use_cache():
+            return self._parse_sheet(excel_file, sheet_name, read_plan)
+
+        file_key = file_hash(self.input_file_path)
+        variant = self._cache_variant(read_plan)
+        cached = self.sheet_cache.get(file_key, sheet_name, variant)
+        if cached is None:
+            data = self._parse_sheet(excel_file, sheet_name, read_plan.whole_sheet() if read_plan is not None else None)
+            if self.streaming:
+                data = self.sheet_cache.put(file_key, sheet_name, variant, data)
+            else:
+                for _ in self.sheet_cache.put(file_key, sheet_name, variant, [data]):
+                    pass
+        elif self.streaming:
+            self.sheet_totals[sheet_name] = self.sheet_cache.get_rows(file_key, sheet_name, variant)
+            data = cached
+        else:
+            data = next(cached)
+
+        if read_plan is None:
+            return data
+        if isinstance(data, pd.DataFrame):
+            return read_plan.apply(data)
+        return (read_plan.apply(batch) for batch in data)
+
+    def _read_plan(self, plan: SheetPlan, header: pd.Index, column_mapping: Dict[str, str]) -> Optional[ReadPlan]:
+        """只读取映射到目标列的列（包括与目标列同名、未被其他列占用的列），没有这样的列时返回None"""
+        header = [str(col) for col in header]
+        mapped_targets = set(column_mapping.values())
+        usecols = [
+            i for i, col in enumerate(header)
+            if col in column_mapping or (col in plan.target_columns and col not in mapped_targets)
+        ]
+        if not usecols:
+            return None
+        text_columns = [
+            col for col in header
+            if column_mapping.get(col, col) in plan.read_as_text
+        ]
+        return ReadPlan(header, usecols, text_columns)
+
+    def _read_and_process(self, excel_file, sheet_name: str, column_mapping: Optional[Dict[str, str]]) -> str:
+        """读取并处理一个工作表，读取时间计入阶段统计
+
+        excel_file可以是读取器、pd.ExcelFile或文件路径；传入路径时未缓存的工作表在这里打开并关闭文件。
+        """
+        engine, opened = self._as_input(excel_file)
         try:
-            # 定义表头映射关系
-            header_mapping = {
-                '会员姓名': ['会员姓名', '姓名', '客户姓名', '顾客姓名','客户名称','持卡人'],
-                '手机号': ['手机号', '手机号码', '联系电话', '手机'],
-                '座机号': ['座机号', '固定电话', '电话', '座机','电话号码'],
-                '性别': ['性别', '性别类型'],
-                '身份证号': ['身份证号', '身份证号码', '身份证','IDCardCode'],
-                '出生年月日': ['出生年月日', '出生日期', '生日', '出生时间'],
-                '联系地址': ['联系地址', '地址', '居住地址', '详细地址'],
-                '会员卡号': ['会员卡号', '卡号', '会员编号', '会员ID'],
-                '剩余积分': ['剩余积分', '积分', '当前积分'],
-                '剩余充值金额': ['剩余充值金额', '充值金额', '账户余额', '余额'],
-                '剩余赠送金额': ['剩余赠送金额', '赠送金额', '赠送余额']
-            }
-
-            # 定义必填字段
-            required_columns = ['会员姓名', '剩余积分']
-
-            # 查找并重命名列
-            new_columns = {}
-            found_columns = set()  # 用于记录找到的列
-            for new_col, possible_names in header_mapping.items():
-                for old_col in df.columns:
-                    if old_col in possible_names:
-                        new_columns[old_col] = new_col
-                        found_columns.add(new_col)
-                        break
-
-            # 检查必填字段是否都找到了
-            missing_required = [col for col in required_columns if col not in found_columns]
-            if missing_required:
-                # 创建弹窗让用户选择匹配
-                dialog = ColumnMappingDialog(missing_required, df.columns.tolist())
-                if dialog.exec_() == QDialog.Accepted:
-                    user_mappings = dialog.get_mappings()
-                    # 添加用户选择的映射
-                    for new_col, old_col in user_mappings.items():
-                        if old_col != "请选择...":
-                            new_columns[old_col] = new_col
-                            found_columns.add(new_col)
-                else:
+            read_plan = None
+            if self.projection:
+                plan = self.SHEET_PLANS[sheet_name]
+                with self._recorder(sheet_name).measure('headers'):
+                    header = self._sheet_header(engine, sheet_name)
+                    if column_mapping is None:
+                        column_mapping = self._resolve_columns(plan, header)
+                if column_mapping is None:
+                    self._finish_metrics(sheet_name)
                     return "用户取消了必填字段匹配操作"
-
-            # 重命名列
-            df = df.rename(columns=new_columns)
-
-            # 创建缺失的列并设置默认值
-            for col in header_mapping.keys():
-                if col not in df.columns:
-                    df[col] = None
-
-            # 数据清理
-            df = df.copy()
-            
-            # 对字符串类型的列进行清理
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    # 将非字符串值转换为字符串
-                    df[col] = df[col].astype(str)
-                    # 清理字符串
-                    df[col] = df[col].str.strip()
-                    # 将空字符串和'nan'替换为空字符串
-                    df[col] = df[col].replace(['nan', 'None', 'NULL', ''], '')
-            
-            # 处理手机号和座机号
-            if '手机号' in df.columns:
-                # 转换为字符串并清理
-                df['手机号'] = df['手机号'].astype(str)
-                # 只保留数字
-                df['手机号'] = df['手机号'].str.extract('(\d+)', expand=False)
-                # 截断超过20位的手机号
-                df['手机号'] = df['手机号'].str[:20]
-                # 将无效值替换为空字符串
-                df['手机号'] = df['手机号'].replace(['nan', 'None', 'NULL', ''], '')
-                
-            if '座机号' in df.columns:
-                # 转换为字符串并清理
-                df['座机号'] = df['座机号'].astype(str)
-                # 只保留数字、-和()
-                df['座机号'] = df['座机号'].str.replace(r'[^\d\-\(\)]', '')
-                # 截断超过20位的座机号
-                df['座机号'] = df['座机号'].str[:20]
-                # 将无效值替换为空字符串
-                df['座机号'] = df['座机号'].replace(['nan', 'None', 'NULL', ''], '')
-            
-            # 处理性别
-            if '性别' in df.columns:
-                # 转换为字符串并清理
-                df['性别'] = df['性别'].astype(str).str.strip()
-                # 统一性别格式
-                gender_mapping = {
-                    '男': '男',
-                    'M': '男',
-                    'MALE': '男',
-                    '女': '女',
-                    'F': '女',
-                    'FEMALE': '女'
-                }
-                df['性别'] = df['性别'].map(gender_mapping)
-                # 将无效值替换为默认值"男"
-                df['性别'] = df['性别'].replace(['nan', 'None', 'NULL', ''], '男')
-            
-            # 处理身份证号
-            if '身份证号' in df.columns:
-                # 转换为字符串并清理
-                df['身份证号'] = df['身份证号'].astype(str)
-                # 只保留数字和X
-                df['身份证号'] = df['身份证号'].str.replace(r'[^\dXx]', '')
-                # 统一大写X
-                df['身份证号'] = df['身份证号'].str.upper()
-                # 将无效值替换为空字符串
-                df['身份证号'] = df['身份证号'].replace(['nan', 'None', 'NULL', ''], '')
-            
-            # 处理出生年月日
-            if '出生年月日' in df.columns:
-                df['出生年月日'] = pd.to_datetime(df['出生年月日'], errors='coerce')
-            
-            # 处理会员卡号
-            if '会员卡号' in df.columns:
-                # 转换为字符串并清理
-                df['会员卡号'] = df['会员卡号'].astype(str)
-                # 只保留数字和字母
-                df['会员卡号'] = df['会员卡号'].str.replace(r'[^\dA-Za-z]', '')
-                # 截断超过20位的卡号
-                df['会员卡号'] = df['会员卡号'].str[:20]
-                # 将无效值替换为空字符串
-                df['会员卡号'] = df['会员卡号'].replace(['nan', 'None', 'NULL', ''], '')
-            
-            # 处理剩余积分
-            if '剩余积分' in df.columns:
-                # 转换为数值类型，将无效值设为0
-                df['剩余积分'] = pd.to_numeric(df['剩余积分'], errors='coerce').fillna(0)
-                # 确保积分大于等于0
-                df['剩余积分'] = df['剩余积分'].clip(lower=0)
-                # 转换为整数
-                df['剩余积分'] = df['剩余积分'].astype(int)
-            
-            # 处理金额字段
-            if '剩余充值金额' in df.columns:
-                # 转换为数值类型，将无效值设为0
-                df['剩余充值金额'] = pd.to_numeric(df['剩余充值金额'], errors='coerce').fillna(0)
-                # 确保金额大于等于0
-                df['剩余充值金额'] = df['剩余充值金额'].clip(lower=0)
-            
-            if '剩余赠送金额' in df.columns:
-                # 转换为数值类型，将无效值设为0
-                df['剩余赠送金额'] = pd.to_numeric(df['剩余赠送金额'], errors='coerce').fillna(0)
-                # 确保金额大于等于0
-                df['剩余赠送金额'] = df['剩余赠送金额'].clip(lower=0)
-            
-            # 删除重复行
-            df = df.drop_duplicates()
-            
-            # 处理缺失值
-            fillna_dict = {
-                '会员姓名': '',
-                '手机号': '',
-                '座机号': '',
-                '性别': '男',  # 默认值设为男
-                '身份证号': '',
-                '出生年月日': pd.NaT,
-                '联系地址': '',
-                '会员卡号': '',
-                '剩余积分': 0,
-                '剩余充值金额': 0,
-                '剩余赠送金额': 0
+                read_plan = self._read_plan(plan, header, column_mapping)
+            with self._recorder(sheet_name).measure('read') as measurement:
+                data = self._read_sheet(engine, sheet_name, read_plan)
+                if isinstance(data, pd.DataFrame):
+                    measurement.rows = len(data)
+            return self.process_sheet(sheet_name, data, column_mapping)
+        finally:
+            if opened:
+                engine.close()
+
+    def cached_sheet_names(self) -> Optional[List[str]]:
+        """输入文件需要处理的工作表都已缓存时返回全部工作表名，不必再打开文件；否则返回None
+
+        工作表名和表头与读取方式、按列读取的列无关，只要求每个需要处理的工作表有缓存项；
+        映射变化导致按列读取的缓存项不匹配时，读取该工作表时再打开文件。
+        """
+        if not self._use_cache():
+            return None
+        file_key = file_hash(self.input_file_path)
+        sheet_names = self.sheet_cache.get_sheet_names(file_key)
+        if sheet_names is None:
+            return None
+        for sheet_name in self.SHEET_PLANS:
+            if sheet_name in sheet_names and self.sheet_cache.get_header(file_key, sheet_name) is None:
+                return None
+        return sheet_names
+
+    def _store_sheet_names(self, sheet_names: List[str]):
+        if self._use_cache():
+            self.sheet_cache.put_sheet_names(file_hash(self.input_file_path), sheet_names)
+
+    def get_options(self) -> dict:
+        """返回创建同配置处理器所需的参数，供工作进程使用"""
+        return {
+            'streaming': self.streaming,
+            'batch_size': self.batch_size,
+            'writer_backend': self.writer_backend,
+            'factorize': self.factorize,
+            'cache_dir': self.cache_dir,
+            'cache_max_bytes': self.cache_max_bytes,
+            'incremental': self.incremental,
+            'trace_memory': self.trace_memory,
+            'output_format': self.output_format,
+            'csv_encoding': self.csv_encoding,
+            'input_engine': self.input_engine,
+            'projection': self.projection,
+            'dedup_policy': self.dedup_policy,
+            'check_references': self.check_references,
+            'validate_fields': self.validate_fields,
+        }
+
+    def resolve_sheet_mapping(self, excel_file, sheet_name: str) -> Optional[Dict[str, str]]:
+        """只读取工作表的表头并事先确定列名映射，用户取消匹配时返回None
+
+        excel_file可以是读取器（见open_input）、pd.ExcelFile或文件路径；工作表已缓存时从缓存读取表头。
+        """
+        engine, opened = self._as_input(excel_file)
+        try:
+            columns = self._sheet_header(engine, sheet_name)
+        finally:
+            if opened:
+                engine.close()
+        return self._resolve_columns(self.SHEET_PLANS[sheet_name], columns)
+
+    def _sheet_header(self, engine, sheet_name: str) -> pd.Index:
+        """读取工作表的表头，已缓存时从缓存读取"""
+        if self._use_cache():
+            header = self.sheet_cache.get_header(file_hash(self.input_file_path), sheet_name)
+            if header is not None:
+                return pd.Index(header).astype(str)
+        return engine.read_header(sheet_name).astype(str)
+
+    def _process_all_parallel(self, excel_file, sheet_names: List[str]) -> Dict[str, str]:
+        """在进程池中并行处理各工作表，映射在主进程中事先确定，工作进程不会弹窗"""
+        results = {}
+        tasks = {}
+        for sheet_name in self.SHEET_PLANS:
+            if sheet_name not in sheet_names:
+                continue
+            try:
+                column_mapping = self.resolve_sheet_mapping(excel_file, sheet_name)
+            except Exception as e:
+                results[sheet_name] = f"处理{sheet_name}数据时出错: {str(e)}"
+                continue
+            if column_mapping is None:
+                results[sheet_name] = "用户取消了必填字段匹配操作"
+            else:
+                tasks[sheet_name] = column_mapping
+        if not tasks:
+            return results
+
+        max_workers = min(len(tasks), self.max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                sheet_name: executor.submit(_process_sheet_task, self.input_file_path, self.output_dir,
+                                            sheet_name, self.get_options(), column_mapping)
+                for sheet_name, column_mapping in tasks.items()
             }
-            
-            df = df.fillna(fillna_dict)
-            
-            # 只保留目标列
-            target_columns = list(header_mapping.keys())
-            df = df[target_columns]
-            
-            self.members_df = df
-            
-            # 保存处理后的数据
-            output_path = self.get_output_path('会员导入.xlsx')
-            df.to_excel(output_path, index=False)
-            
-            # 生成报告
-            self.report = [
-                f"会员数据处理完成",
-                f"总行数: {len(df)}",
-                f"已保存到: {output_path}"
-            ]
-            
-            return "\n".join(self.report)
-            
-        except Exception as e:
-            return f"处理会员数据时出错: {str(e)}"
-
-    def process_all_data(self, excel_file: pd.ExcelFile) -> Dict[str, str]:
-        """处理所有数据"""
+            for sheet_name, future in futures.items():
+                try:
+                    results[sheet_name], df, row_count, metrics = future.result()
+                    warnings = self.header_warnings.get(sheet_name)
+                    if warnings:
+                        results[sheet_name] += "".join(f"\n表头匹配提示: {warning}" for warning in warnings)
+                    self.frames[sheet_name] = df
+                    if row_count is not None:
+                        self.row_counts[sheet_name] = row_count
+                    if metrics is not None:
+                        self.metrics[sheet_name] = metrics
+                        self._log_metrics(sheet_name)
+                except Exception as e:
+                    results[sheet_name] = f"处理{sheet_name}数据时出错: {str(e)}"
+
+        # 按固定顺序返回结果
+        return {name: results[name] for name in self.SHEET_PLANS if name in results}
+
+    def process_all_data(self, excel_file,
+                         column_mappings: Optional[Dict[str, Optional[Dict[str, str]]]] = None) -> Dict[str, str]:
+        """处理所有数据
+
+        excel_file可以是读取器（见open_input）、pd.ExcelFile或文件路径；并行模式下工作进程从input_file_path读取。
+        column_mappings为事先确定的各工作表列名映射（见resolve_sheet_mapping），映射为None的工作表视为用户取消。
+        启用缓存且需要处理的工作表都已缓存时，不会打开输入文件。
+        """
         results = {}
+        column_mappings = column_mappings or {}
         
-        # 获取Excel文件中的所有表名
-        sheet_names = excel_file.sheet_names
-        
-        # 按顺序处理各个表
-        if '商品' in sheet_names:
-            df = pd.read_excel(excel_file, sheet_name='商品')
-            results['商品'] = self.process_products(df)
-            
-        if '供应商' in sheet_names:
-            df = pd.read_excel(excel_file, sheet_name='供应商')
-            results['供应商'] = self.process_suppliers(df)
-            
-        if '库存' in sheet_names:
-            df = pd.read_excel(excel_file, sheet_name='库存')
-            results['库存'] = self.process_inventory(df)
-            
-        if '会员' in sheet_names:
-            df = pd.read_excel(excel_file, sheet_name='会员')
-            results['会员'] = self.process_members(df)
-            
-        return results 
\ No newline at end of file
+        if isinstance(excel_file, str) and not self.input_file_path:
+            self.set_input_file_path(excel_file)
+
+        opened = False
+        try:
+            # 获取输入文件中的所有表名
+            sheet_names = self.cached_sheet_names()
+            if sheet_names is None:
+                excel_file, opened = self._as_input(excel_file)
+                sheet_names = excel_file.sheet_names
+                self._store_sheet_names(sheet_names)
+
+            if self.parallel:
+                results = self._process_all_parallel(excel_file, sheet_names)
+            else:
+                # 按顺序处理各个表
+                for sheet_name in self.SHEET_PLANS:
+                    if sheet_name not in sheet_names:
+                        continue
+                    self._check_cancelled()
+                    if sheet_name in column_mappings and column_mappings[sheet_name] is None:
+                        results[sheet_name] = "用户取消了必填字段匹配操作"
+                        continue
+                    results[sheet_name] = self._read_and_process(excel_file, sheet_name,
+                                                                 column_mappings.get(sheet_name))
+        finally:
+            if opened:
+                excel_file.close()
+
+        if self.check_references:
+            self._check_all_references(results)
+        return results
+
+    def _check_all_references(self, results: Dict[str, str]):
+        """检查转换成功的工作表引用的其他工作表记录是否存在，把结果附加到results中该工作表的说明"""
+        for sheet_name, plan in self.SHEET_PLANS.items():
+            if not plan.references or sheet_name not in self.row_counts:
+                continue
+            df = self.frames.get(sheet_name)
+            if df is None:
+                results[sheet_name] += "\n引用检查: 流式写出时不保留转换结果，未检查"
+                continue
+            check = integrity.check_references(df, plan.references, self.frames)
+            self.orphan_counts[sheet_name] = check.counts
+            lines = [f"{target}没有转换结果，未检查{col}" for col, target in check.skipped.items()]
+            if check.orphans is not None:
+                output_path = self.get_output_path(output_filename(plan.output_file, self.output_format))
+                writer = self._open_writer(integrity.report_path(output_path), plan.column_types)
+                try:
+                    writer.write(check.orphans)
+                    writer.close()
+                except BaseException:
+                    writer.abort()
+                    raise
+                counts = "，".join(f"{col}有{count}行在{plan.references[col][0]}中不存在"
+                                  for col, count in check.counts.items() if count)
+                lines.append(f"{counts}，已保存到: {integrity.report_path(output_path)}")
+            elif check.counts:
+                lines.append(f"{'、'.join(check.counts)}均能找到对应记录")
+            results[sheet_name] += "".join(f"\n引用检查: {line}" for line in lines)
+
+
+def _process_sheet_task(file_path: str, output_dir: Optional[str], sheet_name: str, options: dict,
+                        column_mapping: Dict[str, str]):
+    """工作进程入口：读取、清理并写出单个工作表，返回(结果说明, 处理后的DataFrame, 输出行数, 阶段统计)"""
+    processor = DataProcessor(**options)
+    processor.set_input_file_path(file_path)
+    processor.set_output_dir(output_dir)
+    result = processor._read_and_process(file_path, sheet_name, column_mapping)
+    return (result, processor.frames.get(sheet_name), processor.row_counts.get(sheet_name),
+            processor.metrics.get(sheet_name))
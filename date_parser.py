@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+# 统一分隔符后依次尝试的日期格式，实际使用顺序由样本的匹配情况决定
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m']
+# 检测格式时使用的样本数
+SAMPLE_SIZE = 200
+
+# Excel日期序列号：1900日期系统中1为1900-01-01（含1900-02-29的历史误差，按1899-12-30起算）
+EXCEL_EPOCH = np.datetime64('1899-12-30', 'us')
+EXCEL_SERIAL_RANGE = (1, 2958465)  # 1900-01-01 至 9999-12-31
+# 4位纯数字按年份解析的范围
+YEAR_RANGE = ('1900', '2100')
+
+_DATETIME_DTYPE = 'datetime64[us]'
+_US_PER_DAY = 86400 * 10 ** 6
+
+
+def _to_text(values: pd.Series) -> pd.Series:
+    """转为去除首尾空白的字符串，整数形式的浮点数（如20230105.0）去掉小数部分"""
+    text = values.astype(str).str.strip()
+    return text.str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+
+
+def _normalize_separators(text: pd.Series) -> pd.Series:
+    """把2023年1月5日、2023.01.05、2023/1/5等写法统一为2023-1-5"""
+    text = text.str.replace(r'\s*[年月./]\s*', '-', regex=True)
+    text = text.str.replace(r'\s*[日号]', '', regex=True)
+    return text.str.rstrip('-')
+
+
+def _parse_serials(text: pd.Series) -> pd.Series:
+    """按Excel日期序列号解析，超出范围的为NaT"""
+    days = pd.to_numeric(text, errors='coerce')
+    days = days.where(days.between(*EXCEL_SERIAL_RANGE))
+    micros = (days * _US_PER_DAY).round()
+    result = EXCEL_EPOCH + micros.fillna(0).astype('int64').to_numpy().astype('timedelta64[us]')
+    return pd.Series(result, index=text.index).where(days.notna())
+
+
+def _rank_formats(text: pd.Series) -> list:
+    """用样本检测格式，返回有匹配的格式（匹配数多的在前）"""
+    sample = text.iloc[:SAMPLE_SIZE]
+    hits = []
+    for order, fmt in enumerate(DATE_FORMATS):
+        count = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if count:
+            hits.append((-count, order, fmt))
+    return [fmt for _, _, fmt in sorted(hits)]
+
+
+def _parse_unique_text(text: pd.Series) -> pd.Series:
+    """解析不重复的日期文本"""
+    result = pd.Series(pd.NaT, index=text.index, dtype=_DATETIME_DTYPE)
+
+    # 纯数字：8位为年月日，6位为年月，1900-2100的4位数为年份（按1月1日）
+    digits = text.str.fullmatch(r'\d+')
+    length = text.str.len()
+    year = digits & (length == 4) & text.between(*YEAR_RANGE)
+    compact = [(digits & (length == 8), '%Y%m%d'), (digits & (length == 6), '%Y%m'), (year, '%Y')]
+    for mask, fmt in compact:
+        if mask.any():
+            result[mask] = pd.to_datetime(text[mask], format=fmt, errors='coerce')
+    # Excel序列号：带小数或4位以上的数字（其余短整数不当作序列号）
+    decimal = text.str.fullmatch(r'\d+\.\d+')
+    serial = decimal | (digits & (length > 4) & ~compact[0][0] & ~compact[1][0])
+    if serial.any():
+        result[serial] = _parse_serials(text[serial])
+
+    # 带分隔符的日期：按样本检测到的格式依次解析剩余的值
+    remaining = ~year & ~serial & ~compact[0][0] & ~compact[1][0] & (text != '')
+    if remaining.any():
+        normalized = _normalize_separators(text[remaining])
+        for fmt in _rank_formats(normalized):
+            parsed = pd.to_datetime(normalized, format=fmt, errors='coerce')
+            result[parsed.index] = result[parsed.index].fillna(parsed)
+            normalized = normalized[parsed.isna()]
+            if normalized.empty:
+                break
+        # 其余写法交给pandas逐个识别（只涉及少量不重复的取值）
+        if not normalized.empty:
+            result[normalized.index] = pd.to_datetime(normalized, format='mixed', errors='coerce')
+    return result
+
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """把一列日期解析为datetime，无法识别的值为NaT
+
+    支持日期单元格、YYYY-MM-DD、YYYY.MM.DD、YYYY/MM/DD、YYYY年MM月DD日、YYYYMMDD、YYYYMM（按当月1日）、
+    YYYY（按1月1日）和Excel日期序列号。只对不重复的取值解析一次，再按编码还原到每一行。
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    codes, uniques = pd.factorize(series)
+    parsed = _parse_unique_text(_to_text(pd.Series(uniques, dtype=object)))
+    # 编码-1为空值，对应追加在末尾的NaT
+    values = np.append(parsed.to_numpy(dtype=_DATETIME_DTYPE), np.datetime64('NaT', 'us'))
+    return pd.Series(values[codes], index=series.index, name=series.name)
@@ -0,0 +1,134 @@
+"""按业务主键去重
+
+主键列的取值规范化（转文本、去首尾空白、转大写）后计算64位哈希指纹，指纹相同的行视为重复，
+按策略保留其中一行：first保留第一行，last保留最后一行，most_complete保留非空字段最多的一行（相同时取第一行）。
+主键全为空的行无法按主键判断，仍按整行去重。被删除的行连同重复原因写入与输出同目录的"<输出文件名>_重复"文件。
+"""
+import os
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEDUP_POLICIES = ('first', 'last', 'most_complete')
+
+# 重复行报告中的说明列
+REASON_COLUMN = '重复原因'
+KEY_COLUMN = '重复键'
+KEY_DUPLICATE = '主键重复'
+ROW_DUPLICATE = '整行重复'
+
+# 合并多个主键列的哈希时使用的乘数（64位黄金分割常数）
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def report_path(output_path: str) -> str:
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_重复{ext}"
+
+
+def normalized_uniques(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """返回(各行取值的编码, 规范化后的不重复取值)：转为文本、去首尾空白并转大写，只处理不重复的取值。
+    不重复取值的末尾追加了''，空值的编码-1正好取到它"""
+    codes, uniques = pd.factorize(series)
+    text = np.array([str(value).strip().upper() for value in np.asarray(uniques, dtype=object).tolist()] + [''],
+                    dtype=object)
+    return codes, text
+
+
+def normalized_keys(df: pd.DataFrame, key_columns: List[str]) -> pd.DataFrame:
+    """规范化后的主键列，空值记为''"""
+    columns = {}
+    for col in key_columns:
+        codes, text = normalized_uniques(df[col])
+        columns[col] = text[codes]
+    return pd.DataFrame(columns, index=df.index)
+
+
+def key_text(keys: pd.DataFrame) -> pd.Series:
+    """把规范化后的主键列用'|'连接为一列文本，用于报告"""
+    columns = iter(keys.columns)
+    result = keys[next(columns)].astype(object)
+    for col in columns:
+        result = result + '|' + keys[col]
+    return result
+
+
+def fingerprints(df: pd.DataFrame, key_columns: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """每行的64位指纹和主键是否为空：主键不全为空的行按主键计算，全为空的行按整行计算
+
+    每个主键列只对不重复的取值计算哈希，多列时依次合并。指纹只取决于取值，流式处理时各批次的指纹可以直接比较。
+    """
+    result = np.zeros(len(df), dtype=np.uint64)
+    empty = np.ones(len(df), dtype=bool)
+    for col in key_columns:
+        codes, text = normalized_uniques(df[col])
+        result = result * np.uint64(_HASH_MULTIPLIER) ^ pd.util.hash_array(text, categorize=False)[codes]
+        empty &= (text == '')[codes]
+    if empty.any():
+        result[empty] = pd.util.hash_pandas_object(df[empty], index=False).to_numpy()
+    return result, empty
+
+
+def completeness(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """每行非空（不是空值也不是''）的字段数"""
+    score = np.zeros(len(df), dtype=np.int64)
+    for col in columns:
+        series = df[col]
+        filled = series.notna()
+        if series.dtype == object or pd.api.types.is_string_dtype(series):
+            filled &= series != ''
+        score += filled.to_numpy()
+    return score
+
+
+def keep_mask(prints: np.ndarray, policy: str, score: np.ndarray = None) -> np.ndarray:
+    """按策略在指纹相同的行中选出保留的一行，返回保留标记"""
+    if policy == 'first':
+        return ~pd.Series(prints).duplicated(keep='first').to_numpy()
+    if policy == 'last':
+        return ~pd.Series(prints).duplicated(keep='last').to_numpy()
+    if policy != 'most_complete':
+        raise ValueError(f"不支持的去重策略: {policy}")
+    positions = np.arange(len(prints))
+    # 按指纹分组，组内非空字段多的在前，相同时位置靠前的在前，每组取第一行
+    order = np.lexsort((positions, -score, prints))
+    sorted_prints = prints[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_prints[1:] != sorted_prints[:-1]
+    mask = np.zeros(len(prints), dtype=bool)
+    mask[order[first]] = True
+    return mask
+
+
+def deduplicate(df: pd.DataFrame, key_columns: List[str], policy: str,
+                columns: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """按主键去重，返回(保留的行, 带重复原因和重复键的被删除行)；columns为计算非空字段数的列"""
+    prints, empty = fingerprints(df, key_columns)
+    score = None
+    if policy == 'most_complete':
+        # 只有指纹重复的行才需要比较非空字段数
+        duplicated = pd.Series(prints).duplicated(keep=False).to_numpy()
+        score = np.zeros(len(df), dtype=np.int64)
+        score[duplicated] = completeness(df[duplicated], columns)
+    mask = keep_mask(prints, policy, score)
+    return df[mask], dropped_rows(df, ~mask, key_columns, empty)
+
+
+def dropped_rows(df: pd.DataFrame, dropped: np.ndarray, key_columns: List[str],
+                 empty: np.ndarray) -> pd.DataFrame:
+    """被删除的行，附带重复原因和重复键"""
+    rows = df[dropped]
+    return rows.assign(**{
+        REASON_COLUMN: np.where(empty[dropped], ROW_DUPLICATE, KEY_DUPLICATE),
+        KEY_COLUMN: key_text(normalized_keys(rows, key_columns)),
+    })
+
+
+def drop_seen(df: pd.DataFrame, key_columns: List[str], seen: set) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """流式处理时按first策略跨批次去重，seen中保存之前批次保留的行的指纹"""
+    prints, empty = fingerprints(df, key_columns)
+    mask = keep_mask(prints, 'first')
+    mask &= ~np.fromiter(map(seen.__contains__, prints.tolist()), dtype=bool, count=len(prints))
+    seen.update(prints[mask].tolist())
+    return df[mask], dropped_rows(df, ~mask, key_columns, empty)
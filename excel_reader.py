@@ -1,18 +1,48 @@
 import sys
+import os
+import time
+import multiprocessing
+from functools import partial
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QPushButton, QLabel, QTextEdit, QFileDialog, QMessageBox,
-                           QProgressBar, QTabWidget)
-from PyQt5.QtCore import Qt, pyqtSignal
-import pandas as pd
-from data_processor import DataProcessor
+                           QProgressBar, QTabWidget, QTableWidget, QTableWidgetItem,
+                           QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QThread, QTimer
+from batch_convert import collect_input_files
+from data_processor import DataProcessor, ConversionCancelled
+from input_engines import EXCEL_EXTENSIONS, TEXT_EXTENSIONS
+from mapping_dialog import DialogMappingResolver
+from mapping_memory import MappingMemory, RememberingResolver
+from parse_cache import DEFAULT_CACHE_DIR
+from table_preview import DataFramePreview
+
+# 选择文件对话框中的文件类型
+INPUT_FILE_FILTER = ";;".join([
+    f"Excel files ({' '.join('*' + ext for ext in EXCEL_EXTENSIONS)})",
+    f"CSV files ({' '.join('*' + ext for ext in TEXT_EXTENSIONS)})",
+    "All files (*.*)",
+])
+
+# 同时转换的文件数上限
+MAX_CONCURRENT_CONVERSIONS = max(1, min(4, os.cpu_count() or 1))
+
+# 文件队列中的状态
+QUEUED = '排队中'
+RUNNING = '转换中'
+DONE = '完成'
+FAILED = '失败'
+CANCELLED = '已取消'
+
+# 文件队列表格的列
+QUEUE_COLUMNS = ['文件', '状态', '行数', '耗时', '说明']
 
 class DropArea(QLabel):
-    fileDropped = pyqtSignal(str)
+    filesDropped = pyqtSignal(list)
 
     def __init__(self):
         super().__init__()
         self.setAlignment(Qt.AlignCenter)
-        self.setText("将Excel文件拖放到这里\n或者点击选择文件按钮")
+        self.setText("将Excel文件（可以多个）或文件夹拖放到这里\n或者点击选择文件按钮")
         self.setStyleSheet("""
             QLabel {
                 background-color: white;
@@ -37,7 +67,7 @@ class DropArea(QLabel):
                     color: #1976d2;
                 }
             """)
-            self.setText("松开鼠标即可读取文件")
+            self.setText("松开鼠标即可加入转换队列")
         else:
             event.ignore()
 
@@ -51,7 +81,7 @@ class DropArea(QLabel):
                 font-size: 14px;
             }
         """)
-        self.setText("将Excel文件拖放到这里\n或者点击选择文件按钮")
+        self.setText("将Excel文件（可以多个）或文件夹拖放到这里\n或者点击选择文件按钮")
 
     def dropEvent(self, event):
         self.setStyleSheet("""
@@ -63,22 +93,94 @@ class DropArea(QLabel):
                 font-size: 14px;
             }
         """)
-        self.setText("将Excel文件拖放到这里\n或者点击选择文件按钮")
+        self.setText("将Excel文件（可以多个）或文件夹拖放到这里\n或者点击选择文件按钮")
         
-        files = [u.toLocalFile() for u in event.mimeData().urls()]
+        # 文件夹展开为其中的Excel和CSV文件
+        files = collect_input_files([u.toLocalFile() for u in event.mimeData().urls() if u.isLocalFile()])
         if files:
-            self.fileDropped.emit(files[0])
+            self.filesDropped.emit(files)
         event.accept()
 
+class ConversionWorker(QObject):
+    """在后台线程中执行转换，通过信号报告进度和结果"""
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, processor, file_path, column_mappings):
+        super().__init__()
+        self.processor = processor
+        self.file_path = file_path
+        self.column_mappings = column_mappings
+        self.sheet_names = list(column_mappings)
+        self.processor.progress_callback = self.on_progress
+
+    def on_progress(self, sheet_name, rows_done, total_rows):
+        """把工作表内的批次进度换算为整体百分比（在工作线程中调用）
+
+        工作表没有记录数据范围、无法估算总行数时百分比为-1，进度条显示为不确定进度。
+        """
+        if total_rows is None:
+            self.progress.emit(-1, f"正在处理{sheet_name}表：{rows_done}行")
+            return
+        index = self.sheet_names.index(sheet_name) if sheet_name in self.sheet_names else 0
+        fraction = min(rows_done / total_rows, 1.0) if total_rows else 0.0
+        percent = int((index + fraction) * 100 / max(len(self.sheet_names), 1))
+        self.progress.emit(percent, f"正在处理{sheet_name}表：{rows_done}/{total_rows}行")
+
+    def run(self):
+        try:
+            results = self.processor.process_all_data(self.file_path, self.column_mappings)
+        except ConversionCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(results)
+
+    def cancel(self):
+        self.processor.cancel()
+
+class ConversionJob:
+    """转换队列中的一个文件"""
+
+    def __init__(self, file_path, output_dir):
+        self.file_path = file_path
+        self.output_dir = output_dir
+        self.status = QUEUED
+        self.message = ""
+        self.percent = 0
+        self.processor = None
+        self.column_mappings = None
+        self.results = None
+        self.rows = None
+        self.started = None
+        self.seconds = None
+        self.worker = None
+        self.thread = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+
 class ExcelReader(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.data_processor = DataProcessor()
+        self.data_processor = None  # 当前显示结果的处理器，预览显示它的结果
+        # 记住对话框中选择的匹配，表头相同的文件不再弹窗
+        self.mapping_memory = MappingMemory()
+        # 转换队列：加入的文件依次在界面线程中完成必填字段匹配，再由最多MAX_CONCURRENT_CONVERSIONS个后台线程同时转换
+        self.jobs = []
+        self.pending = []  # 已加入、尚未完成匹配的任务
+        self.run_start = 0  # 本轮第一个任务在jobs中的位置，队列全部结束后再加入文件时开始新的一轮
+        self.shown_job = None
         self.initUI()
 
     def initUI(self):
         self.setWindowTitle('Excel文件读取器')
-        self.setGeometry(100, 100, 800, 600)
+        self.setGeometry(100, 100, 900, 700)
 
         # 创建中央部件和布局
         central_widget = QWidget()
@@ -88,8 +190,8 @@ class ExcelReader(QMainWindow):
 
         # 创建拖放区域
         self.drop_area = DropArea()
-        self.drop_area.setMinimumHeight(150)
-        self.drop_area.fileDropped.connect(self.process_file)
+        self.drop_area.setMinimumHeight(120)
+        self.drop_area.filesDropped.connect(self.add_files)
         layout.addWidget(self.drop_area)
 
         # 创建选择文件按钮
@@ -110,11 +212,33 @@ class ExcelReader(QMainWindow):
         """)
         layout.addWidget(self.select_button)
 
+        # 创建文件队列，选中已完成的文件时显示它的结果
+        self.queue_table = QTableWidget(0, len(QUEUE_COLUMNS))
+        self.queue_table.setHorizontalHeaderLabels(QUEUE_COLUMNS)
+        self.queue_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.queue_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.queue_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.queue_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.queue_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.queue_table.setVisible(False)
+        self.queue_table.itemSelectionChanged.connect(self.on_job_selected)
+        layout.addWidget(self.queue_table)
+
         # 创建进度条
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
         layout.addWidget(self.progress_bar)
 
+        # 创建进度说明和取消按钮
+        self.status_label = QLabel()
+        self.status_label.setVisible(False)
+        layout.addWidget(self.status_label)
+
+        self.cancel_button = QPushButton('全部取消')
+        self.cancel_button.setVisible(False)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        layout.addWidget(self.cancel_button)
+
         # 创建结果显示区域
         self.result_text = QTextEdit()
         self.result_text.setReadOnly(True)
@@ -126,41 +250,252 @@ class ExcelReader(QMainWindow):
         layout.addWidget(self.tab_widget)
 
     def select_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
             "选择Excel文件",
             "",
-            "Excel files (*.xlsx);;All files (*.*)"
+            INPUT_FILE_FILTER
         )
-        if file_path:
-            self.process_file(file_path)
+        if file_paths:
+            self.add_files(file_paths)
 
     def process_file(self, file_path):
         """处理Excel文件"""
+        self.add_files([file_path])
+
+    def _output_dir(self, file_path):
+        """输出到输入文件所在目录；同一目录已有其他文件在排队或转换时，输出到以文件名命名的子目录，避免互相覆盖"""
+        directory = os.path.dirname(os.path.abspath(file_path))
+        used = {job.output_dir for job in self.jobs if job.active}
+        if directory not in used:
+            return directory
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        output_dir = os.path.join(directory, stem)
+        index = 1
+        while output_dir in used:
+            index += 1
+            output_dir = os.path.join(directory, f"{stem}_{index}")
+        return output_dir
+
+    def add_files(self, file_paths):
+        """把文件加入转换队列，转换进行中也可以继续加入"""
+        queued = {os.path.abspath(job.file_path) for job in self.jobs if job.active}
+        if not queued:
+            # 上一轮已经全部结束，整体进度从新加入的文件重新计算
+            self.run_start = len(self.jobs)
+        for file_path in file_paths:
+            if os.path.abspath(file_path) in queued:
+                continue
+            job = ConversionJob(file_path, self._output_dir(file_path))
+            self.jobs.append(job)
+            self.pending.append(job)
+            self.queue_table.insertRow(self.queue_table.rowCount())
+            self.update_job_row(job)
+        self.queue_table.setVisible(bool(self.jobs))
+        self.update_overall_progress()
+        # 逐个完成必填字段匹配，每个文件之间把控制权交还事件循环，界面保持响应
+        QTimer.singleShot(0, self.prepare_next)
+
+    def prepare_next(self):
+        """在界面线程中为下一个文件完成必填字段匹配（可能弹窗），然后开始转换"""
+        if not self.pending:
+            return
+        job = self.pending.pop(0)
+        if job.status == QUEUED:
+            self.prepare_job(job)
+            self.update_job_row(job)
+            self.start_queued()
+        if self.pending:
+            QTimer.singleShot(0, self.prepare_next)
+
+    def prepare_job(self, job):
         try:
-            # 读取Excel文件
-            excel_file = pd.ExcelFile(file_path)
-            
-            # 创建数据处理器实例
-            processor = DataProcessor()
-            processor.set_input_file_path(file_path)  # 设置输入文件路径
+            # 创建数据处理器实例，按批次读取以便报告进度和随时取消；只读取需要的列；同一文件再次转换时从缓存读取；
+            # 转换后检查库存引用的商品和供应商是否存在
+            processor = DataProcessor(streaming=True, factorize=True, projection=True, cache_dir=DEFAULT_CACHE_DIR,
+                                      check_references=True,
+                                      mapping_resolver=RememberingResolver(DialogMappingResolver(self),
+                                                                           self.mapping_memory))
+            processor.set_input_file_path(job.file_path)  # 设置输入文件路径
+            os.makedirs(job.output_dir, exist_ok=True)
+            processor.set_output_dir(job.output_dir)
             
-            # 处理每个工作表
-            results = processor.process_all_data(excel_file)
-            
-            # 显示处理结果
-            self.show_results(results)
+            # 打开输入文件（已缓存时不需要打开）
+            sheet_names = processor.cached_sheet_names()
+            input_file = processor.open_input() if sheet_names is None else job.file_path
+            try:
+                if sheet_names is None:
+                    sheet_names = input_file.sheet_names
+
+                # 在界面线程中事先完成必填字段匹配，后台线程不会弹窗
+                job.column_mappings = {
+                    sheet_name: processor.resolve_sheet_mapping(input_file, sheet_name)
+                    for sheet_name in processor.SHEET_PLANS
+                    if sheet_name in sheet_names
+                }
+            finally:
+                if not isinstance(input_file, str):
+                    input_file.close()
+            job.processor = processor
             
         except Exception as e:
-            QMessageBox.critical(self, "错误", f"处理文件时出错：{str(e)}")
+            job.status = FAILED
+            job.message = f"处理文件时出错：{str(e)}"
+
+    def start_queued(self):
+        """在并发上限内开始转换已完成匹配的文件"""
+        running = sum(1 for job in self.jobs if job.status == RUNNING)
+        for job in self.jobs:
+            if running >= MAX_CONCURRENT_CONVERSIONS:
+                break
+            if job.status == QUEUED and job.processor is not None:
+                self.start_job(job)
+                running += 1
+        self.update_controls()
+
+    def start_job(self, job):
+        """在后台线程中处理每个工作表"""
+        job.status = RUNNING
+        job.message = "正在读取文件..."
+        job.started = time.perf_counter()
+        job.thread = QThread(self)
+        job.worker = ConversionWorker(job.processor, job.file_path, job.column_mappings)
+        job.worker.moveToThread(job.thread)
+        job.thread.started.connect(job.worker.run)
+        job.worker.progress.connect(partial(self.update_progress, job))
+        job.worker.finished.connect(partial(self.on_job_finished, job))
+        job.worker.failed.connect(partial(self.on_job_failed, job))
+        job.worker.cancelled.connect(partial(self.on_job_cancelled, job))
+        for signal in (job.worker.finished, job.worker.failed, job.worker.cancelled):
+            signal.connect(job.thread.quit)
+        job.thread.finished.connect(partial(self.on_worker_stopped, job))
+        self.update_job_row(job)
+        job.thread.start()
+
+    def update_job_row(self, job):
+        row = self.jobs.index(job)
+        values = [
+            os.path.basename(job.file_path),
+            job.status if job.status != RUNNING or job.percent is None else f"{RUNNING} {job.percent}%",
+            "" if job.rows is None else str(job.rows),
+            "" if job.seconds is None else f"{job.seconds:.1f}秒",
+            job.message,
+        ]
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            item.setToolTip(job.file_path if column == 0 else value)
+            self.queue_table.setItem(row, column, item)
+
+    def update_controls(self):
+        """有文件在排队或转换时显示进度条和取消按钮"""
+        running = any(job.active for job in self.jobs)
+        self.cancel_button.setVisible(running)
+        self.cancel_button.setEnabled(running)
+        self.status_label.setVisible(running)
+        self.progress_bar.setVisible(running or self.progress_bar.isVisible())
+        if running:
+            counts = {status: sum(1 for job in self.jobs if job.status == status) for status in (RUNNING, QUEUED)}
+            self.status_label.setText(f"{RUNNING}{counts[RUNNING]}个，{QUEUED}{counts[QUEUED]}个")
+
+    def update_overall_progress(self):
+        """整体进度：本轮加入的文件中已完成的比例（转换中的文件按其进度计入）"""
+        jobs = [job for job in self.jobs[self.run_start:] if job.status != CANCELLED]
+        # 有转换中的文件无法估算进度时显示为不确定进度
+        if any(job.status == RUNNING and job.percent is None for job in jobs):
+            self.progress_bar.setRange(0, 0)
+        elif jobs:
+            self.progress_bar.setRange(0, 100)
+            done = sum(100 if not job.active else job.percent for job in jobs)
+            self.progress_bar.setValue(int(done / len(jobs)))
+
+    def update_progress(self, job, percent, message):
+        job.percent = percent if percent >= 0 else None
+        job.message = message
+        self.update_job_row(job)
+        self.update_overall_progress()
+
+    def _finish_job(self, job, status, message=""):
+        job.status = status
+        job.message = message
+        job.seconds = time.perf_counter() - job.started
+        self.update_job_row(job)
+
+    def on_job_finished(self, job, results):
+        job.results = results
+        job.rows = sum(job.processor.row_counts.values())
+        failed = [sheet for sheet in results if sheet not in job.processor.row_counts]
+        if not results:
+            self._finish_job(job, FAILED, "未找到商品、供应商、库存或会员工作表")
+        elif len(failed) == len(results):
+            self._finish_job(job, FAILED, "全部工作表处理失败")
+        else:
+            self._finish_job(job, DONE, f"{'、'.join(failed)}处理失败" if failed else
+                             f"已保存到: {job.output_dir}")
+        # 操作员没有选中其他文件时，显示刚完成的文件的结果；否则释放它的数据，选中时再从输出文件读回
+        selected = self.selected_job()
+        if selected is None or selected is job:
+            self.show_results(job)
+        else:
+            job.processor.release_frames()
+
+    def on_job_failed(self, job, message):
+        self._finish_job(job, FAILED, f"处理文件时出错：{message}")
+
+    def on_job_cancelled(self, job):
+        self._finish_job(job, CANCELLED)
+
+    def on_worker_stopped(self, job):
+        job.worker.deleteLater()
+        job.thread.deleteLater()
+        job.worker = None
+        job.thread = None
+        # 释放的名额给排队中的文件
+        self.start_queued()
+        self.update_overall_progress()
+
+    def cancel_processing(self):
+        """取消排队中和转换中的全部文件"""
+        self.cancel_button.setEnabled(False)
+        for job in self.jobs:
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                self.update_job_row(job)
+            elif job.status == RUNNING:
+                job.message = "正在取消..."
+                self.update_job_row(job)
+                job.worker.cancel()
+        self.update_controls()
+
+    def closeEvent(self, event):
+        # 关闭窗口时先停止后台转换
+        self.pending.clear()
+        for job in self.jobs:
+            if job.thread is not None:
+                job.worker.cancel()
+                job.thread.quit()
+                job.thread.wait()
+        super().closeEvent(event)
+
+    def selected_job(self):
+        rows = self.queue_table.selectionModel().selectedRows()
+        return self.jobs[rows[0].row()] if rows else None
+
+    def on_job_selected(self):
+        job = self.selected_job()
+        if job is not None and job.results is not None and job is not self.shown_job:
+            self.show_results(job)
 
-    def show_results(self, results):
-        # 更新进度条
-        self.progress_bar.setValue(100)
+    def show_results(self, job):
+        # 同一时间只在内存中保留正在预览的文件的转换结果
+        if self.shown_job is not None and self.shown_job is not job and self.shown_job.processor is not None:
+            self.shown_job.processor.release_frames()
+        self.shown_job = job
+        self.data_processor = job.processor
+        self.data_processor.load_frames()
         
         # 显示结果
-        result_text = "数据处理结果：\n\n"
-        for sheet, result in results.items():
+        result_text = f"数据处理结果（{os.path.basename(job.file_path)}）：\n\n"
+        for sheet, result in job.results.items():
             result_text += f"{sheet}表：{result}\n"
         
         self.result_text.setText(result_text)
@@ -169,39 +504,22 @@ class ExcelReader(QMainWindow):
         self.show_processed_data()
 
     def show_processed_data(self):
-        """显示处理后的数据"""
-        self.tab_widget.clear()
+        """显示处理后的数据，每个工作表一个可排序、筛选的表格"""
+        # 删除旧的预览表格，它们引用的数据才能释放
+        while self.tab_widget.count():
+            page = self.tab_widget.widget(0)
+            self.tab_widget.removeTab(0)
+            page.deleteLater()
         self.tab_widget.setVisible(True)
 
-        # 显示商品数据
-        if self.data_processor.products_df is not None:
-            products_text = QTextEdit()
-            products_text.setReadOnly(True)
-            products_text.setText(str(self.data_processor.products_df))
-            self.tab_widget.addTab(products_text, "商品数据")
-
-        # 显示供应商数据
-        if self.data_processor.suppliers_df is not None:
-            suppliers_text = QTextEdit()
-            suppliers_text.setReadOnly(True)
-            suppliers_text.setText(str(self.data_processor.suppliers_df))
-            self.tab_widget.addTab(suppliers_text, "供应商数据")
-
-        # 显示库存数据
-        if self.data_processor.inventory_df is not None:
-            inventory_text = QTextEdit()
-            inventory_text.setReadOnly(True)
-            inventory_text.setText(str(self.data_processor.inventory_df))
-            self.tab_widget.addTab(inventory_text, "库存数据")
-
-        # 显示会员数据
-        if self.data_processor.members_df is not None:
-            members_text = QTextEdit()
-            members_text.setReadOnly(True)
-            members_text.setText(str(self.data_processor.members_df))
-            self.tab_widget.addTab(members_text, "会员数据")
+        for sheet_name in self.data_processor.SHEET_PLANS:
+            frame = self.data_processor.frames.get(sheet_name)
+            if frame is not None:
+                self.tab_widget.addTab(DataFramePreview(frame), f"{sheet_name}数据")
 
 if __name__ == '__main__':
+    # 打包为exe后并行处理需要的进程池支持
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     ex = ExcelReader()
     ex.show()
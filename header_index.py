@@ -0,0 +1,70 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_header(name) -> str:
+    """规范化列名：全角转半角、去除所有空白、忽略大小写"""
+    text = unicodedata.normalize('NFKC', str(name))
+    return _WHITESPACE.sub('', text).casefold()
+
+
+class HeaderResolution:
+    """一次表头匹配的结果"""
+
+    def __init__(self):
+        self.mapping: Dict[str, str] = {}  # {源列名: 目标列名}
+        self.found: Dict[str, str] = {}  # {目标列名: 源列名}
+        self.ambiguities: List[str] = []  # 有歧义的匹配说明
+
+
+class HeaderIndex:
+    """别名到目标列的反向索引
+
+    目标列名本身优先级最高，其余别名按在列表中的先后排列优先级。
+    匹配时一次遍历表头收集候选，再按优先级分配：每个源列最多对应一个目标列，每个目标列最多使用一个源列。
+    """
+
+    def __init__(self, header_mapping: Dict[str, List[str]]):
+        # {规范化别名: [(优先级, 目标列顺序, 目标列名), ...]}
+        self._index: Dict[str, List[Tuple[int, int, str]]] = {}
+        for order, (target, aliases) in enumerate(header_mapping.items()):
+            seen = set()
+            for priority, alias in enumerate([target] + list(aliases)):
+                key = normalize_header(alias)
+                if key in seen:
+                    continue
+                seen.add(key)
+                self._index.setdefault(key, []).append((priority, order, target))
+
+        # 同一个别名属于多个目标列的情况，匹配到时需要提示
+        self.shared_aliases: Dict[str, List[str]] = {
+            key: [target for _, _, target in entries]
+            for key, entries in self._index.items() if len(entries) > 1
+        }
+
+    def resolve(self, columns: Iterable[str]) -> HeaderResolution:
+        """把表头行匹配到目标列"""
+        candidates = []
+        for position, column in enumerate(columns):
+            for priority, order, target in self._index.get(normalize_header(column), ()):
+                candidates.append((priority, order, position, column, target))
+        candidates.sort()
+
+        result = HeaderResolution()
+        for _, _, _, column, target in candidates:
+            if column in result.mapping:
+                if result.mapping[column] != target:
+                    result.ambiguities.append(
+                        f"列\"{column}\"同时可作为\"{result.mapping[column]}\"和\"{target}\"，已用作\"{result.mapping[column]}\""
+                    )
+            elif target in result.found:
+                result.ambiguities.append(
+                    f"\"{target}\"同时匹配到列\"{result.found[target]}\"和\"{column}\"，已使用\"{result.found[target]}\""
+                )
+            else:
+                result.mapping[column] = target
+                result.found[target] = column
+        return result
@@ -0,0 +1,154 @@
+"""增量转换：按业务主键与上次转换的结果比对，只清理和输出有变化的记录
+
+每个工作表的状态保存在输出目录的.incremental子目录中，包括各主键的原始数据指纹和清理后的数据。
+再次转换时，原始数据指纹没有变化的主键直接使用上次清理的结果，其余主键重新清理后与上次的结果比较，
+变化的记录写入与完整输出同目录、同格式的"<输出文件名>_增量"文件。
+"""
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pipeline import SheetPlan
+
+STATE_VERSION = 1
+STATE_DIR = '.incremental'
+
+# 增量文件中的变更类型列
+CHANGE_COLUMN = '变更类型'
+INSERTED = '新增'
+UPDATED = '修改'
+DELETED = '删除'
+
+# 状态中记录每行所属主键和主键内序号的列
+_KEY = '_key'
+_SEQ = '_seq'
+
+
+def state_path(output_path: str) -> str:
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, STATE_DIR, os.path.splitext(name)[0] + '.pkl')
+
+
+def delta_path(output_path: str) -> str:
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_增量{ext}"
+
+
+def load_state(path: str, plan: SheetPlan) -> Optional[dict]:
+    """读取上次转换的状态，不存在、无法读取或主键配置已变化时返回None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        state = pd.read_pickle(path)
+    except Exception:
+        return None
+    if state.get('version') != STATE_VERSION or state.get('business_key') != plan.business_key:
+        return None
+    return state
+
+
+def save_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    pd.to_pickle(state, temp_path)
+    os.replace(temp_path, path)
+
+
+def business_keys(plan: SheetPlan, df: pd.DataFrame, factorize: bool = False) -> pd.Series:
+    """按主键列的清理规则计算每行的业务主键，依次取第一个非空的列值，都为空时为''"""
+    keys = pd.Series('', index=df.index, dtype=object)
+    for col in reversed(plan.business_key):
+        if col not in df.columns:
+            continue
+        value = plan.clean_column(df[col], col, True, factorize).fillna('').astype(str)
+        keys = value.where(value != '', keys)
+    return keys
+
+
+def _row_hashes(df: pd.DataFrame) -> pd.Series:
+    # 按文本比较，避免同一取值在不同读取方式下类型不同（如1和1.0）
+    return pd.util.hash_pandas_object(df.astype(str), index=False)
+
+
+def group_fingerprints(df: pd.DataFrame, keys: pd.Series, seq: pd.Series) -> pd.Series:
+    """每个主键下所有行（含行的先后顺序）的指纹：{主键: 指纹}"""
+    if df.empty:
+        return pd.Series(dtype='uint64')
+    row_hashes = pd.DataFrame({'row': _row_hashes(df).to_numpy(), 'seq': seq.to_numpy()})
+    mixed = pd.util.hash_pandas_object(row_hashes, index=False)
+    return mixed.groupby(keys.to_numpy(), sort=False).sum()
+
+
+def apply_delta(plan: SheetPlan, df: pd.DataFrame, state: Optional[dict],
+                factorize: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """与上次的状态比对并清理有变化的主键
+
+    df为已重命名列的原始数据。返回(全部数据的清理结果, 带变更类型列的变更记录, 新的状态)，
+    前两者都是去重之前的数据，行顺序与df一致。
+    """
+    df = df.reset_index(drop=True)
+    keys = business_keys(plan, df, factorize)
+    seq = keys.groupby(keys, sort=False).cumcount()
+    fingerprints = group_fingerprints(df, keys, seq)
+    columns: List[str] = [str(col) for col in df.columns]
+
+    if state is not None:
+        old_fingerprints, old_rows = state['fingerprints'], state['rows']
+    else:
+        old_fingerprints, old_rows = pd.Series(dtype='uint64'), None
+
+    # 原始数据完全相同的主键沿用上次的清理结果
+    unchanged = pd.Index([])
+    if state is not None and state['columns'] == columns:
+        common = fingerprints.index.intersection(old_fingerprints.index)
+        same = fingerprints[common].to_numpy() == old_fingerprints[common].to_numpy()
+        unchanged = common[same]
+
+    dirty = ~keys.isin(unchanged)
+    prepared = plan.prepare(df[dirty], factorize)
+    prepared[_KEY] = keys[dirty]
+    prepared[_SEQ] = seq[dirty]
+
+    parts = [prepared]
+    if old_rows is not None and len(unchanged):
+        reused = old_rows[old_rows[_KEY].isin(unchanged)].copy()
+        positions = pd.Series(np.arange(len(df)), index=pd.MultiIndex.from_arrays([keys, seq]))
+        reused.index = positions.reindex(pd.MultiIndex.from_arrays([reused[_KEY], reused[_SEQ]])).to_numpy()
+        parts.append(reused)
+    full = pd.concat(parts).sort_index() if len(parts) > 1 else prepared
+
+    # 重新清理的主键：上次没有的为新增，清理结果与上次不同的为修改
+    dirty_keys = fingerprints.index.difference(unchanged)
+    inserted = dirty_keys.difference(old_fingerprints.index)
+    candidates = dirty_keys.intersection(old_fingerprints.index)
+    updated = pd.Index([])
+    if len(candidates):
+        targets = plan.target_columns
+        new_rows = prepared[prepared[_KEY].isin(candidates)]
+        before = old_rows[old_rows[_KEY].isin(candidates)]
+        new_clean = group_fingerprints(new_rows[targets], new_rows[_KEY], new_rows[_SEQ])
+        old_clean = group_fingerprints(before[targets], before[_KEY], before[_SEQ])
+        common = new_clean.index.intersection(old_clean.index)
+        same = new_clean[common].to_numpy() == old_clean[common].to_numpy()
+        updated = new_clean.index.difference(common[same])
+    deleted = old_fingerprints.index.difference(fingerprints.index)
+
+    delta_parts = [
+        prepared[prepared[_KEY].isin(inserted)].assign(**{CHANGE_COLUMN: INSERTED}),
+        prepared[prepared[_KEY].isin(updated)].assign(**{CHANGE_COLUMN: UPDATED}),
+    ]
+    if old_rows is not None and len(deleted):
+        delta_parts.append(old_rows[old_rows[_KEY].isin(deleted)].assign(**{CHANGE_COLUMN: DELETED}))
+    delta = pd.concat(delta_parts, ignore_index=True)
+
+    new_state = {
+        'version': STATE_VERSION,
+        'business_key': plan.business_key,
+        'columns': columns,
+        'fingerprints': fingerprints,
+        'rows': full,
+    }
+    return (full.drop(columns=[_KEY, _SEQ]).reset_index(drop=True),
+            delta.drop(columns=[_KEY, _SEQ]), new_state)
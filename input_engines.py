@@ -0,0 +1,352 @@
+import codecs
+import csv
+import importlib.util
+import os
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sheet_reader import (DEFAULT_BATCH_SIZE, cell_text, iter_worksheet_batches, make_header, text_cells,
+                          worksheet_row_count)
+
+# 各扩展名默认使用的读取方式（按顺序取第一个可用的）
+EXTENSION_ENGINES = {
+    '.xlsx': ['calamine', 'openpyxl'],
+    '.xlsm': ['calamine', 'openpyxl'],
+    '.xls': ['calamine', 'pandas'],
+    '.xlsb': ['calamine', 'pandas'],
+    '.ods': ['calamine', 'pandas'],
+    '.csv': ['csv'],
+    '.tsv': ['csv'],
+    '.txt': ['csv'],
+}
+# 选择文件和扫描目录时识别的输入文件类型
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.xlsb', '.ods')
+TEXT_EXTENSIONS = ('.csv', '.tsv')
+
+# 识别CSV编码和分隔符时读取的字节数
+SNIFF_BYTES = 64 * 1024
+# 依次尝试的编码：国内系统导出的CSV通常不是UTF-8就是GBK（GB18030兼容GBK）
+FALLBACK_ENCODINGS = ('utf-8', 'gb18030')
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def as_text(series: pd.Series) -> pd.Series:
+    """把一列转为文本，空值保持为空；数值列直接按列转换，已经全是文本的列原样返回"""
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype(str).astype(object)
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy(dtype=float)
+        result = np.full(len(values), None, dtype=object)
+        present = ~np.isnan(values)
+        integral = present & (values == np.floor(values)) & (np.abs(values) < 2 ** 63)
+        result[integral] = values[integral].astype(np.int64).astype(str)
+        result[present & ~integral] = values[present & ~integral].astype(str)
+        return pd.Series(result, index=series.index, name=series.name)
+    if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series
+    return series.astype(object).map(cell_text, na_action='ignore')
+
+
+class ReadPlan:
+    """两阶段读取的第二阶段：根据已确定的列名映射，只读取usecols位置上的列
+
+    text_columns中的列（编码、条码等）按文本读取：读取时直接把单元格转为文本，不经过数值推断，
+    否则含空单元格的编码列会先被推断为float64，超过15位的编码（如统一社会信用代码）在转为文本前就已失真。
+    """
+
+    def __init__(self, header: List[str], usecols: List[int], text_columns: Iterable[str] = ()):
+        self.header = list(header)
+        self.usecols = list(usecols)
+        self.columns = [self.header[i] for i in self.usecols]
+        text_columns = set(text_columns)
+        self.text_columns = [col for col in self.columns if col in text_columns]
+
+    @property
+    def text_positions(self) -> List[int]:
+        """文本列在columns中的位置"""
+        text_columns = set(self.text_columns)
+        return [i for i, col in enumerate(self.columns) if col in text_columns]
+
+    @property
+    def dtype(self) -> dict:
+        """传给pandas.read_excel的dtype：文本列读为str"""
+        return {col: str for col in self.text_columns}
+
+    def whole_sheet(self) -> 'ReadPlan':
+        """读取全部列、文本列不变的计划，用于缓存整张表"""
+        return ReadPlan(self.header, range(len(self.header)), self.text_columns)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """选出计划中的列并把文本列转为文本；df可以是整张表，也可以是已按usecols读取的数据"""
+        df = df.set_axis(df.columns.astype(str), axis=1)
+        if list(df.columns) != self.columns:
+            df = df[self.columns]
+        converted = {col: as_text(df[col]) for col in self.text_columns}
+        return df.assign(**converted) if converted else df
+
+    def apply_positional(self, df: pd.DataFrame) -> pd.DataFrame:
+        """处理按usecols读取的数据：列名按位置换成表头中的列名（表头有重名列时两者可能不同）"""
+        return self.apply(df.set_axis(self.columns, axis=1))
+
+
+def calamine_available() -> bool:
+    """是否安装了python-calamine（基于Rust的Excel解析库）"""
+    return importlib.util.find_spec('python_calamine') is not None
+
+
+def resolve_engine(file_path: str, engine: str = 'auto') -> str:
+    """确定文件使用的读取方式：engine为'auto'时按扩展名选择，否则使用指定的方式"""
+    if engine != 'auto':
+        if engine not in INPUT_ENGINES:
+            raise ValueError(f"不支持的读取方式: {engine}")
+        if engine == 'calamine' and not calamine_available():
+            raise ImportError("使用calamine读取需要先安装python-calamine: pip install python-calamine")
+        return engine
+    candidates = EXTENSION_ENGINES.get(os.path.splitext(file_path)[1].lower(), ['openpyxl'])
+    for name in candidates:
+        if name != 'calamine' or calamine_available():
+            return name
+    return candidates[-1]
+
+
+class PandasExcelEngine:
+    """通过pandas.ExcelFile读取，pandas_engine为None时由pandas按扩展名选择（xls使用xlrd，ods使用odf）
+
+    没有逐行读取能力，流式读取时先读入整张表再按批次切分。
+    """
+
+    name = 'pandas'
+    pandas_engine: Optional[str] = None
+
+    def __init__(self, file_path: str, excel_file: Optional[pd.ExcelFile] = None):
+        self.file_path = file_path
+        self._excel_file = excel_file
+
+    @property
+    def excel_file(self) -> pd.ExcelFile:
+        if self._excel_file is None:
+            self._excel_file = pd.ExcelFile(self.file_path, engine=self.pandas_engine)
+        return self._excel_file
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return list(self.excel_file.sheet_names)
+
+    def read_header(self, sheet_name: str) -> pd.Index:
+        return pd.read_excel(self.excel_file, sheet_name=sheet_name, nrows=0).columns
+
+    def read_sheet(self, sheet_name: str, read_plan: Optional[ReadPlan] = None) -> pd.DataFrame:
+        if read_plan is None:
+            return pd.read_excel(self.excel_file, sheet_name=sheet_name)
+        df = pd.read_excel(self.excel_file, sheet_name=sheet_name, usecols=read_plan.usecols,
+                           dtype=read_plan.dtype or None)
+        return read_plan.apply_positional(df)
+
+    def iter_batches(self, sheet_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                     read_plan: Optional[ReadPlan] = None) -> Iterator[pd.DataFrame]:
+        df = self.read_sheet(sheet_name, read_plan)
+        for start in range(0, max(len(df), 1), batch_size):
+            yield df.iloc[start:start + batch_size]
+
+    def row_count(self, sheet_name: str) -> Optional[int]:
+        return None
+
+    def close(self):
+        if self._excel_file is not None:
+            self._excel_file.close()
+            self._excel_file = None
+
+
+class OpenpyxlEngine(PandasExcelEngine):
+    """默认读取方式：一次性读取用pandas的openpyxl引擎，流式读取用只读模式逐行读取
+
+    流式读取、估算行数和读取表头共用pandas.ExcelFile已经以只读模式打开的工作簿，每个文件只加载一次。
+    """
+
+    name = 'openpyxl'
+    pandas_engine = 'openpyxl'
+
+    def iter_batches(self, sheet_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                     read_plan: Optional[ReadPlan] = None) -> Iterator[pd.DataFrame]:
+        worksheet = self.excel_file.book[sheet_name]
+        if read_plan is None:
+            return iter_worksheet_batches(worksheet, batch_size)
+        batches = iter_worksheet_batches(worksheet, batch_size, read_plan.usecols, read_plan.text_positions)
+        return (read_plan.apply_positional(batch) for batch in batches)
+
+    def row_count(self, sheet_name: str) -> Optional[int]:
+        return worksheet_row_count(self.excel_file.book[sheet_name])
+
+
+class CalamineEngine(PandasExcelEngine):
+    """基于python-calamine的读取方式，支持xlsx、xls、xlsb和ods，解析速度比openpyxl快数倍"""
+
+    name = 'calamine'
+    pandas_engine = 'calamine'
+
+    def __init__(self, file_path: str, excel_file: Optional[pd.ExcelFile] = None):
+        super().__init__(file_path, excel_file)
+        self._workbook = None
+
+    @property
+    def workbook(self):
+        if self._workbook is None:
+            from python_calamine import CalamineWorkbook
+            self._workbook = CalamineWorkbook.from_path(self.file_path)
+        return self._workbook
+
+    def iter_batches(self, sheet_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                     read_plan: Optional[ReadPlan] = None) -> Iterator[pd.DataFrame]:
+        """逐行读取工作表，空单元格和空行的处理与pandas.read_excel一致"""
+        rows = self.workbook.get_sheet_by_name(sheet_name).iter_rows()
+        header = make_header([None if value == '' else value for value in next(rows, [])])
+        usecols = read_plan.usecols if read_plan is not None else range(len(header))
+        header = [header[i] for i in usecols]
+        text_positions = read_plan.text_positions if read_plan is not None else []
+
+        batch = []
+        emitted = False
+        for row in rows:
+            row = tuple(None if i >= len(row) or row[i] == '' else row[i] for i in usecols)
+            if all(value is None for value in row):
+                continue
+            if text_positions:
+                row = text_cells(row, text_positions)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield self._to_frame(batch, header, read_plan)
+                batch = []
+                emitted = True
+
+        if batch or not emitted:
+            yield self._to_frame(batch, header, read_plan)
+
+    @staticmethod
+    def _to_frame(batch: list, header: List[str], read_plan: Optional[ReadPlan]) -> pd.DataFrame:
+        df = pd.DataFrame.from_records(batch, columns=header)
+        return read_plan.apply_positional(df) if read_plan is not None else df
+
+    def row_count(self, sheet_name: str) -> Optional[int]:
+        height = self.workbook.get_sheet_by_name(sheet_name).total_height
+        return max(height - 1, 0) if height else None
+
+    def close(self):
+        super().close()
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+
+def sniff_encoding(sample: bytes) -> str:
+    """根据BOM或能否解码识别文本编码"""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            # 样本末尾可能截断了多字节字符，按增量方式解码
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return FALLBACK_ENCODINGS[-1]
+
+
+def sniff_delimiter(file_path: str, text: str) -> str:
+    """tsv固定为制表符，其他文件根据首行内容判断分隔符"""
+    if os.path.splitext(file_path)[1].lower() == '.tsv':
+        return '\t'
+    first_line = text.split('\n', 1)[0]
+    try:
+        return csv.Sniffer().sniff(first_line, delimiters=',\t;|').delimiter
+    except csv.Error:
+        return ','
+
+
+class CsvEngine:
+    """读取CSV/TSV文本文件，自动识别编码和分隔符
+
+    文本文件只有一张表，表名由detect_sheet(文件路径, 表头)确定（如根据文件名或表头判断是商品还是会员），
+    未指定或无法确定时使用文件名。所有列按文本读取，保留编码、条码中的前导0，由清理步骤转换类型。
+    """
+
+    name = 'csv'
+
+    def __init__(self, file_path: str, detect_sheet: Optional[Callable[[str, List[str]], Optional[str]]] = None):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            sample = f.read(SNIFF_BYTES)
+        self.encoding = sniff_encoding(sample)
+        text = codecs.getincrementaldecoder(self.encoding)(errors='replace').decode(sample, final=False)
+        self.delimiter = sniff_delimiter(file_path, text)
+        header = self.read_header()
+        sheet_name = detect_sheet(file_path, list(header)) if detect_sheet else None
+        self.sheet_name = sheet_name or os.path.splitext(os.path.basename(file_path))[0]
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [self.sheet_name]
+
+    def _read_csv(self, read_plan: Optional[ReadPlan] = None, **kwargs):
+        usecols = read_plan.usecols if read_plan is not None else None
+        return pd.read_csv(self.file_path, encoding=self.encoding, sep=self.delimiter, dtype=str,
+                           skip_blank_lines=True, usecols=usecols, **kwargs)
+
+    @staticmethod
+    def _finish(df: pd.DataFrame, read_plan: Optional[ReadPlan]) -> pd.DataFrame:
+        return read_plan.apply_positional(df) if read_plan is not None else df
+
+    def read_header(self, sheet_name: Optional[str] = None) -> pd.Index:
+        return self._read_csv(nrows=0).columns
+
+    def read_sheet(self, sheet_name: Optional[str] = None, read_plan: Optional[ReadPlan] = None) -> pd.DataFrame:
+        return self._finish(self._read_csv(read_plan), read_plan)
+
+    def iter_batches(self, sheet_name: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                     read_plan: Optional[ReadPlan] = None) -> Iterator[pd.DataFrame]:
+        emitted = False
+        with self._read_csv(read_plan, chunksize=batch_size) as reader:
+            for batch in reader:
+                emitted = True
+                yield self._finish(batch, read_plan)
+        if not emitted:
+            yield self._finish(self._read_csv(read_plan, nrows=0), read_plan)
+
+    def row_count(self, sheet_name: Optional[str] = None) -> Optional[int]:
+        """按换行符估算数据行数（字段内含换行时偏大）"""
+        lines = 0
+        last = b'\n'
+        with open(self.file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                lines += chunk.count(b'\n')
+                last = chunk[-1:]
+        if last != b'\n':
+            lines += 1
+        return max(lines - 1, 0)
+
+    def close(self):
+        pass
+
+
+# 可选的读取方式
+INPUT_ENGINES = {
+    'openpyxl': OpenpyxlEngine,
+    'calamine': CalamineEngine,
+    'pandas': PandasExcelEngine,
+    'csv': CsvEngine,
+}
+
+
+def open_input(file_path: str, engine: str = 'auto',
+               detect_sheet: Optional[Callable[[str, List[str]], Optional[str]]] = None):
+    """按读取方式打开输入文件；detect_sheet只用于文本文件，见CsvEngine"""
+    name = resolve_engine(file_path, engine)
+    if name == 'csv':
+        return CsvEngine(file_path, detect_sheet)
+    return INPUT_ENGINES[name](file_path)
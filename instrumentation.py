@@ -0,0 +1,115 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+# 处理阶段及其在报告中的名称（按处理顺序）
+STAGE_LABELS = {
+    'read': '读取',
+    'headers': '表头匹配',
+    'clean': '清理',
+    'row_rules': '跨列规则',
+    'incremental': '增量比对',
+    'dedup': '去重',
+    'finish': '收尾',
+    'validate': '校验',
+    'write': '写出',
+}
+
+
+class StageStats:
+    """一个阶段的累计耗时、处理行数和内存峰值（流式模式下为所有批次之和）"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.rows = 0
+        self.peak_bytes: Optional[int] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'seconds': round(self.seconds, 4),
+            'rows': self.rows,
+            'rows_per_second': int(self.rows / self.seconds) if self.seconds and self.rows else None,
+            'peak_mb': round(self.peak_bytes / 1024 / 1024, 1) if self.peak_bytes is not None else None,
+        }
+
+
+class Measurement:
+    """measure产出的对象，阶段结束前可以更新处理行数"""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+
+
+class StageRecorder:
+    """记录一个工作表各处理阶段的统计
+
+    trace_memory为True时用tracemalloc记录各阶段的内存峰值，需要调用方事先启动tracemalloc。
+    """
+
+    def __init__(self, sheet_name: str, trace_memory: bool = False):
+        self.sheet_name = sheet_name
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, StageStats] = {}
+
+    @contextmanager
+    def measure(self, stage: str, rows: int = 0) -> Iterator[Measurement]:
+        stats = self.stages.setdefault(stage, StageStats())
+        measurement = Measurement(rows)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield measurement
+        finally:
+            stats.seconds += time.perf_counter() - started
+            stats.rows += measurement.rows
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                stats.peak_bytes = max(stats.peak_bytes or 0, peak)
+
+    def timed_batches(self, batches: Iterator) -> Iterator:
+        """逐批产出batches，把取下一批的时间计入读取阶段"""
+        while True:
+            with self.measure('read') as measurement:
+                batch = next(batches, None)
+                if batch is not None:
+                    measurement.rows = len(batch)
+            if batch is None:
+                return
+            yield batch
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(stats.seconds for stats in self.stages.values())
+
+    def to_dict(self) -> dict:
+        ordered = [stage for stage in STAGE_LABELS if stage in self.stages]
+        ordered += [stage for stage in self.stages if stage not in STAGE_LABELS]
+        return {
+            'total_seconds': round(self.total_seconds, 4),
+            'stages': {stage: self.stages[stage].to_dict() for stage in ordered},
+        }
+
+
+def format_summary(metrics: dict) -> str:
+    """把StageRecorder.to_dict的结果转为报告中的一行耗时说明"""
+    parts = [
+        f"{STAGE_LABELS.get(stage, stage)}{stats['seconds']:.2f}秒"
+        for stage, stats in metrics['stages'].items()
+    ]
+    return f"耗时: 共{metrics['total_seconds']:.2f}秒（{'，'.join(parts)}）"
+
+
+def append_json_line(path: str, record: dict):
+    """把一条统计记录追加到JSON Lines日志"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    record = {'time': datetime.now().isoformat(timespec='seconds'), **record}
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
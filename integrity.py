@@ -0,0 +1,80 @@
+"""跨工作表引用检查
+
+各工作表转换完成后，检查引用其他工作表的列（例如库存的原系统商品编码、供应商）取值是否都能在被引用的工作表中找到。
+被引用列的取值按与去重相同的方式规范化（转文本、去首尾空白、转大写）后建立哈希索引，
+引用列只查找不重复的取值再还原到各行，百万行的库存表也只需要一次向量化查找。空值不算缺失引用。
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dedup import normalized_uniques
+
+# 引用缺失报告中的说明列
+ORPHAN_COLUMN = '缺失引用'
+
+
+def report_path(output_path: str) -> str:
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_引用缺失{ext}"
+
+
+class ReferenceIndex:
+    """被引用工作表中若干列的规范化取值组成的哈希索引，任一列中出现的取值都视为存在"""
+
+    def __init__(self, df: pd.DataFrame, columns: List[str]):
+        values = [normalized_uniques(df[col])[1] for col in columns if col in df.columns]
+        self.index = pd.Index(np.concatenate(values) if values else np.array([], dtype=object)).unique()
+
+    def missing(self, series: pd.Series) -> np.ndarray:
+        """每行的取值是否不为空且不在索引中"""
+        codes, text = normalized_uniques(series)
+        found = (self.index.get_indexer(text) >= 0) | (text == '')
+        return ~found[codes]
+
+
+class ReferenceCheck:
+    """一个工作表的检查结果"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}  # {引用列: 缺失引用的行数}
+        self.skipped: Dict[str, str] = {}  # {引用列: 被引用的工作表}，被引用的工作表没有转换结果时不检查
+        self.orphans: Optional[pd.DataFrame] = None  # 有缺失引用的行，第一列为缺失引用的说明
+
+
+def check_references(df: pd.DataFrame, references: Dict[str, Tuple[str, List[str]]],
+                     frames: Dict[str, Optional[pd.DataFrame]]) -> ReferenceCheck:
+    """检查df中各引用列的取值是否都存在于被引用工作表的对应列中
+
+    references为{引用列: (被引用的工作表, [被引用的列])}，frames为各工作表的转换结果。
+    """
+    result = ReferenceCheck()
+    labels = []
+    # 每行缺失的引用列按位记录，第i位对应labels[i]
+    flags = np.zeros(len(df), dtype=np.int64)
+    indexes: Dict[Tuple[str, tuple], ReferenceIndex] = {}
+    for col, (sheet_name, columns) in references.items():
+        target = frames.get(sheet_name)
+        if target is None or col not in df.columns:
+            result.skipped[col] = sheet_name
+            continue
+        key = (sheet_name, tuple(columns))
+        if key not in indexes:
+            indexes[key] = ReferenceIndex(target, columns)
+        missing = indexes[key].missing(df[col])
+        result.counts[col] = int(missing.sum())
+        flags |= missing.astype(np.int64) << len(labels)
+        labels.append(f"{col}在{sheet_name}中不存在")
+
+    orphaned = flags != 0
+    if orphaned.any():
+        reasons = np.array([
+            '；'.join(label for bit, label in enumerate(labels) if flag >> bit & 1)
+            for flag in range(1 << len(labels))
+        ], dtype=object)
+        orphans = df[orphaned].copy()
+        orphans.insert(0, ORPHAN_COLUMN, reasons[flags[orphaned]])
+        result.orphans = orphans
+    return result
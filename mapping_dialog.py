@@ -0,0 +1,64 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QPushButton, QApplication
+from PyQt5.QtCore import Qt
+
+from mapping_resolver import MappingResolver
+
+# 下拉框中表示未选择的占位项
+PLACEHOLDER = "请选择..."
+
+class ColumnMappingDialog(QDialog):
+    def __init__(self, missing_columns, original_columns, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("选择必填字段匹配")
+        self.setModal(True)
+        # 设置窗口标志，使其始终显示在最前面
+        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.WindowCloseButtonHint | Qt.WindowTitleHint)
+        self.mappings = {}
+        
+        layout = QVBoxLayout()
+        
+        # 添加说明标签
+        info_label = QLabel("请为以下必填字段选择对应的列名：")
+        layout.addWidget(info_label)
+        
+        # 为每个缺失的必填字段创建下拉框
+        for col in missing_columns:
+            label = QLabel(f"{col}:")
+            combo = QComboBox()
+            combo.addItem(PLACEHOLDER)
+            combo.addItems(original_columns)
+            layout.addWidget(label)
+            layout.addWidget(combo)
+            self.mappings[col] = combo
+        
+        # 添加确认按钮
+        confirm_button = QPushButton("确认")
+        confirm_button.clicked.connect(self.accept)
+        layout.addWidget(confirm_button)
+        
+        self.setLayout(layout)
+        
+        # 设置窗口大小和位置
+        self.resize(400, 300)
+        # 将窗口移动到屏幕中央
+        screen = QApplication.primaryScreen().geometry()
+        x = (screen.width() - self.width()) // 2
+        y = (screen.height() - self.height()) // 2
+        self.move(x, y)
+
+    def get_mappings(self):
+        return {col: combo.currentText() for col, combo in self.mappings.items()}
+
+
+class DialogMappingResolver(MappingResolver):
+    """图形界面使用的匹配方式：弹出对话框让用户选择必填字段对应的列"""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+
+    def resolve(self, sheet_name, missing_columns, columns):
+        dialog = ColumnMappingDialog(missing_columns, list(columns), self.parent)
+        dialog.setWindowTitle(f"选择必填字段匹配 - {sheet_name}")
+        if dialog.exec_() != QDialog.Accepted:
+            return None
+        return {col: old_col for col, old_col in dialog.get_mappings().items() if old_col != PLACEHOLDER}
@@ -0,0 +1,183 @@
+"""记住必填字段的匹配结果
+
+同一来源系统导出的文件表头相同。按工作表名和表头计算签名，保存用户（或规则）为缺失的必填字段选择的列，
+之后遇到签名相同的表头时直接使用，不再弹窗。匹配记录保存在一个JSON文件中，加载后在内存中按签名查找。
+
+    python mapping_memory.py list
+    python mapping_memory.py forget 3f2a9c
+    python mapping_memory.py clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from mapping_resolver import MappingResolver
+
+DEFAULT_MEMORY_PATH = os.path.join(os.path.expanduser('~'), '.excel_convertor', 'mappings.json')
+MEMORY_VERSION = 1
+
+
+def header_signature(sheet_name: str, columns: List[str]) -> str:
+    """工作表名和表头（按顺序，去掉首尾空白）的SHA-256"""
+    text = json.dumps([sheet_name, [str(col).strip() for col in columns]], ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class MappingMemory:
+    """按表头签名保存的必填字段匹配记录：{签名: {工作表, 表头, 匹配, 使用次数, 时间}}
+
+    记录在创建时一次性载入内存，查找不读文件；修改时重新读取文件，只改动这一条记录后保存。
+    """
+
+    def __init__(self, path: str = DEFAULT_MEMORY_PATH):
+        self.path = path
+        self.entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != MEMORY_VERSION:
+            return {}
+        return data.get('entries', {})
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MEMORY_VERSION, 'entries': self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def _update(self, signature: str, entry: Optional[dict]):
+        """修改一条记录并保存；以文件中的记录为准（其他进程可能已修改或删除记录）"""
+        self.entries = self._load()
+        if entry is None:
+            self.entries.pop(signature, None)
+        else:
+            self.entries[signature] = entry
+        self._save()
+
+    def get(self, sheet_name: str, columns: List[str]) -> Optional[Dict[str, str]]:
+        """返回表头签名相同时记住的{必填字段: 源列名}，没有记录时返回None"""
+        entry = self.entries.get(header_signature(sheet_name, columns))
+        return dict(entry['mapping']) if entry else None
+
+    def put(self, sheet_name: str, columns: List[str], mapping: Dict[str, str]):
+        signature = header_signature(sheet_name, columns)
+        now = datetime.now().isoformat(timespec='seconds')
+        previous = self.entries.get(signature, {})
+        self._update(signature, {
+            'sheet': sheet_name,
+            'columns': [str(col) for col in columns],
+            'mapping': dict(mapping),
+            'created': previous.get('created', now),
+            'last_used': now,
+            'uses': previous.get('uses', 0),
+        })
+
+    def touch(self, sheet_name: str, columns: List[str]):
+        """记录一次使用"""
+        signature = header_signature(sheet_name, columns)
+        entry = self.entries.get(signature)
+        if entry is not None:
+            entry = {**entry, 'uses': entry.get('uses', 0) + 1,
+                     'last_used': datetime.now().isoformat(timespec='seconds')}
+            self._update(signature, entry)
+
+    def find(self, prefix: str) -> List[str]:
+        """按签名前缀查找记录"""
+        return [signature for signature in self.entries if signature.startswith(prefix)]
+
+    def forget(self, signature: str) -> bool:
+        """删除一条记录，记录不存在时返回False"""
+        if signature not in self.entries:
+            return False
+        self._update(signature, None)
+        return True
+
+    def clear(self):
+        self.entries = {}
+        self._save()
+
+
+class RememberingResolver(MappingResolver):
+    """先查找记住的匹配，缺少的字段再交给resolver（对话框或规则），并记住得到的结果
+
+    用户没有选择的字段记为None（表示该字段确实没有对应的列），之后同样不再询问。
+    remember为False时只使用已有的记录，不保存新的结果（例如规则匹配的结果，规则修改后应当重新生效）。
+    """
+
+    def __init__(self, resolver: MappingResolver, memory: MappingMemory, remember: bool = True):
+        self.resolver = resolver
+        self.memory = memory
+        self.remember = remember
+
+    def resolve(self, sheet_name, missing_columns, columns):
+        remembered = self.memory.get(sheet_name, columns) or {}
+        mappings = {
+            col: remembered[col] for col in missing_columns
+            if remembered.get(col) is not None and remembered[col] in columns
+        }
+        unresolved = [col for col in missing_columns if col not in remembered]
+        if not unresolved:
+            if self.remember:
+                self.memory.touch(sheet_name, columns)
+            return mappings
+
+        answered = self.resolver.resolve(sheet_name, unresolved, columns)
+        if answered is None:
+            return None
+        mappings.update(answered)
+        if self.remember:
+            self.memory.put(sheet_name, columns, {**remembered, **{col: answered.get(col) for col in unresolved}})
+        return mappings
+
+
+def _print_entries(memory: MappingMemory):
+    if not memory.entries:
+        print("没有记住的匹配")
+        return
+    for signature, entry in sorted(memory.entries.items(), key=lambda item: item[1].get('last_used', '')):
+        mapping = "，".join(f"{col} <- {source if source is not None else '（无）'}"
+                           for col, source in entry['mapping'].items())
+        print(f"{signature[:12]}  {entry['sheet']}  共{len(entry['columns'])}列  "
+              f"使用{entry.get('uses', 0)}次  最近使用: {entry.get('last_used', '')}")
+        print(f"    {mapping}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="查看或删除记住的必填字段匹配")
+    parser.add_argument('--path', default=DEFAULT_MEMORY_PATH, help="匹配记录文件")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="列出全部记录")
+    forget = commands.add_parser('forget', help="按签名（或签名前缀）删除记录")
+    forget.add_argument('signature')
+    commands.add_parser('clear', help="删除全部记录")
+    args = parser.parse_args(argv)
+
+    memory = MappingMemory(args.path)
+    if args.command == 'list':
+        _print_entries(memory)
+    elif args.command == 'forget':
+        matches = memory.find(args.signature)
+        if len(matches) != 1:
+            print("没有找到该记录" if not matches else "签名前缀对应多条记录，请输入更长的前缀", file=sys.stderr)
+            return 1
+        memory.forget(matches[0])
+        print(f"已删除: {matches[0][:12]}")
+    else:
+        memory.clear()
+        print("已删除全部记录")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
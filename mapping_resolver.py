@@ -0,0 +1,48 @@
+import json
+from typing import Dict, List, Optional
+
+
+class MappingResolver:
+    """必填字段匹配接口：为表头映射中找不到的必填字段指定对应的源列
+
+    resolve返回{必填字段: 源列名}，未指定的字段按缺失处理；返回None表示取消匹配，该工作表不再处理。
+    无法匹配且不应继续处理时抛出ValueError。
+    """
+
+    def resolve(self, sheet_name: str, missing_columns: List[str],
+                columns: List[str]) -> Optional[Dict[str, str]]:
+        raise NotImplementedError
+
+
+class RuleBasedResolver(MappingResolver):
+    """无界面运行时使用的匹配方式：按配置的候选列名匹配必填字段
+
+    rules的格式为{工作表名: {必填字段: [候选列名, ...]}}，工作表名为'*'的规则对所有工作表生效。
+    仍有必填字段无法匹配时抛出ValueError，不会弹出对话框。
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self.rules = rules or {}
+
+    @classmethod
+    def from_file(cls, path: str) -> 'RuleBasedResolver':
+        """从JSON文件加载匹配规则"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def resolve(self, sheet_name, missing_columns, columns):
+        sheet_rules = {**self.rules.get('*', {}), **self.rules.get(sheet_name, {})}
+        mappings = {}
+        for col in missing_columns:
+            candidates = sheet_rules.get(col, [])
+            if isinstance(candidates, str):
+                candidates = [candidates]
+            for candidate in candidates:
+                if candidate in columns:
+                    mappings[col] = candidate
+                    break
+
+        unresolved = [col for col in missing_columns if col not in mappings]
+        if unresolved:
+            raise ValueError(f"缺少必填字段: {', '.join(unresolved)}")
+        return mappings
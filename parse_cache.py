@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+# 默认缓存目录和容量上限
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.excel_convertor', 'cache')
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+_SHEETS_FILE = 'sheets.json'
+_META_FILE = 'meta.json'
+_CHUNK_SIZE = 1024 * 1024
+
+# 进程内记住已计算过的文件哈希：{(路径, 大小, 修改时间): 哈希}
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_hash(file_path: str) -> str:
+    """计算文件内容的SHA-256，文件未修改时直接使用上次的结果"""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _hash_memo:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        _hash_memo[memo_key] = digest.hexdigest()
+    return _hash_memo[memo_key]
+
+
+class SheetCache:
+    """以文件内容哈希和工作表名为键，在磁盘上缓存读取到的原始工作表数据
+
+    每个缓存项是一个目录，按读取时的批次保存为若干pickle文件，meta.json最后写入表示缓存完整。
+    pickle能原样保存Excel读到的混合类型列，但读取pickle可以执行任意代码，所以缓存目录创建为只有当前用户
+    可以访问（0700）；在POSIX系统上，缓存目录不属于当前用户或其他用户可以写入时不读也不写缓存。
+    variant区分读取方式（一次性读取或按批次流式读取），两种方式读到的原始数据类型不完全相同，分别缓存。
+    总大小超过max_bytes时按最近使用时间淘汰最久未使用的缓存项。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _trusted(self) -> bool:
+        """缓存目录只有当前用户可以写入时才可信（Windows上默认目录位于用户目录，由系统权限保护）"""
+        if os.name != 'posix':
+            return True
+        try:
+            stat = os.stat(self.cache_dir)
+        except OSError:
+            return False
+        return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+    def _prepare_dir(self) -> bool:
+        """创建只有当前用户可以访问的缓存目录，返回缓存目录是否可信"""
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        if os.name == 'posix':
+            stat = os.stat(self.cache_dir)
+            if stat.st_uid != os.getuid():
+                return False
+            if stat.st_mode & 0o022:
+                # 其他用户曾经可以写入，已有的缓存项不可信，清空后再使用
+                shutil.rmtree(self.cache_dir, ignore_errors=True)
+                os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            os.chmod(self.cache_dir, 0o700)
+        return self._trusted()
+
+    def _file_dir(self, file_key: str) -> str:
+        return os.path.join(self.cache_dir, file_key)
+
+    @staticmethod
+    def _sheet_key(sheet_name: str) -> str:
+        return hashlib.sha1(sheet_name.encode('utf-8')).hexdigest()[:16]
+
+    def _entry_dir(self, file_key: str, sheet_name: str, variant: str) -> str:
+        return os.path.join(self._file_dir(file_key), f"{self._sheet_key(sheet_name)}-{variant}")
+
+    def get_sheet_names(self, file_key: str) -> Optional[List[str]]:
+        if not self._trusted():
+            return None
+        try:
+            with open(os.path.join(self._file_dir(file_key), _SHEETS_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_sheet_names(self, file_key: str, sheet_names: List[str]):
+        if not self._prepare_dir():
+            return
+        os.makedirs(self._file_dir(file_key), mode=0o700, exist_ok=True)
+        with open(os.path.join(self._file_dir(file_key), _SHEETS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(list(sheet_names), f, ensure_ascii=False)
+
+    def _read_meta(self, entry_dir: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(entry_dir, _META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_rows(self, file_key: str, sheet_name: str, variant: str) -> Optional[int]:
+        """缓存的数据行数，未缓存时返回None"""
+        meta = self._read_meta(self._entry_dir(file_key, sheet_name, variant))
+        return meta['rows'] if meta else None
+
+    def get_header(self, file_key: str, sheet_name: str) -> Optional[List[str]]:
+        """工作表的表头：表头与读取方式无关，任一variant的缓存项中记录的都可以使用，未缓存时返回None"""
+        if not self._trusted():
+            return None
+        prefix = f"{self._sheet_key(sheet_name)}-"
+        try:
+            names = sorted(os.listdir(self._file_dir(file_key)))
+        except OSError:
+            return None
+        for name in names:
+            if name.startswith(prefix) and not name.endswith('.tmp'):
+                meta = self._read_meta(os.path.join(self._file_dir(file_key), name))
+                if meta and 'columns' in meta:
+                    return meta['columns']
+        return None
+
+    def get(self, file_key: str, sheet_name: str, variant: str) -> Optional[Iterator[pd.DataFrame]]:
+        """按写入时的批次依次读出缓存的数据，未缓存时返回None"""
+        if not self._trusted():
+            return None
+        entry_dir = self._entry_dir(file_key, sheet_name, variant)
+        meta = self._read_meta(entry_dir)
+        if meta is None:
+            return None
+        # 更新使用时间，供淘汰时判断
+        os.utime(entry_dir)
+        return (pd.read_pickle(os.path.join(entry_dir, f"part-{i:05d}.pkl")) for i in range(meta['parts']))
+
+    def put(self, file_key: str, sheet_name: str, variant: str,
+            batches: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """边产出batches边写入缓存，全部产出后缓存才生效；中途停止时丢弃已写入的部分"""
+        if not self._prepare_dir():
+            yield from batches
+            return
+        entry_dir = self._entry_dir(file_key, sheet_name, variant)
+        temp_dir = f"{entry_dir}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(temp_dir, mode=0o700)
+        try:
+            parts = rows = 0
+            columns = None
+            for batch in batches:
+                if columns is None:
+                    columns = [str(col) for col in batch.columns]
+                batch.to_pickle(os.path.join(temp_dir, f"part-{parts:05d}.pkl"))
+                parts += 1
+                rows += len(batch)
+                yield batch
+            with open(os.path.join(temp_dir, _META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'sheet_name': sheet_name, 'parts': parts, 'rows': rows, 'columns': columns}, f,
+                          ensure_ascii=False)
+            try:
+                os.rename(temp_dir, entry_dir)
+            except OSError:
+                # 其他进程已写入同一缓存项
+                pass
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """列出全部完整的缓存项：(最近使用时间, 大小, 目录)"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for file_key in os.listdir(self.cache_dir):
+            file_dir = self._file_dir(file_key)
+            if not os.path.isdir(file_dir):
+                continue
+            for name in os.listdir(file_dir):
+                entry_dir = os.path.join(file_dir, name)
+                if name.endswith('.tmp') or not os.path.isdir(entry_dir):
+                    continue
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                    entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+                except OSError:
+                    continue
+        return entries
+
+    def evict(self):
+        """总大小超过上限时，删除最久未使用的缓存项"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            # 文件的缓存项都被删除后，连同工作表名一起删除
+            file_dir = os.path.dirname(entry_dir)
+            try:
+                if os.listdir(file_dir) == [_SHEETS_FILE]:
+                    shutil.rmtree(file_dir, ignore_errors=True)
+            except OSError:
+                pass
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
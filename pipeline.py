@@ -0,0 +1,316 @@
+from functools import partial
+from numbers import Number
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from date_parser import parse_dates
+from header_index import HeaderIndex
+from input_engines import as_text
+
+# 通用文本清理时视为空值的字符串
+NULL_TOKENS = ['nan', 'None', 'NULL', '']
+
+
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == 'object' or isinstance(series.dtype, pd.StringDtype)
+
+
+def clean_text(series: pd.Series) -> pd.Series:
+    """转换为字符串并去除首尾空白"""
+    return series.astype(str).str.strip()
+
+
+def blank_nulls(series: pd.Series) -> pd.Series:
+    """把'nan'、'None'、'NULL'等空值字符串替换为空字符串"""
+    return series.replace(NULL_TOKENS, '')
+
+
+def to_upper(series: pd.Series) -> pd.Series:
+    return series.str.upper()
+
+
+def first_digits(series: pd.Series) -> pd.Series:
+    """只保留第一段连续数字，没有数字时为空值"""
+    return series.str.extract(r'(\d+)', expand=False)
+
+
+def remove_pattern(series: pd.Series, pattern: str) -> pd.Series:
+    """删除匹配正则表达式的字符"""
+    return series.str.replace(pattern, '', regex=True)
+
+
+def to_numeric(series: pd.Series) -> pd.Series:
+    return pd.to_numeric(series, errors='coerce')
+
+
+def fill_missing(series: pd.Series, value) -> pd.Series:
+    return series.fillna(value)
+
+
+def clip_min(series: pd.Series, lower) -> pd.Series:
+    return series.clip(lower=lower)
+
+
+def to_int(series: pd.Series) -> pd.Series:
+    return series.astype(int)
+
+
+def map_values(series: pd.Series, mapping: dict, default=None) -> pd.Series:
+    """按映射表转换取值，未匹配项为空值或default"""
+    result = series.map(mapping)
+    return result if default is None else result.fillna(default)
+
+
+def yes_no(series: pd.Series, yes_values: List[str]) -> pd.Series:
+    """属于yes_values的取值记为"是"，其余记为"否\""""
+    return series.isin(yes_values).map({True: '是', False: '否'})
+
+
+def to_date(series: pd.Series) -> pd.Series:
+    """解析日期，无法识别的值为NaT；支持的写法见date_parser.parse_dates"""
+    return parse_dates(series)
+
+
+def truncate(series: pd.Series, length: int) -> pd.Series:
+    return series.str[:length]
+
+
+# 可在配置中使用的清理步骤：名称或(名称, 参数...)
+CLEANERS: Dict[str, Callable] = {
+    'text': clean_text,
+    'blank_nulls': blank_nulls,
+    'upper': to_upper,
+    'digits': first_digits,
+    'remove': remove_pattern,
+    'numeric': to_numeric,
+    'fillna': fill_missing,
+    'clip_min': clip_min,
+    'int': to_int,
+    'map': map_values,
+    'yes_no': yes_no,
+    'date': to_date,
+    'truncate': truncate,
+}
+
+
+def fix_date_order(df: pd.DataFrame, start_col: str, end_col: str) -> pd.DataFrame:
+    """结束日期早于开始日期时，把开始日期改为结束日期前一年的当月1日"""
+    invalid = df[end_col].notna() & df[start_col].notna() & (df[end_col] < df[start_col])
+    if invalid.any():
+        end = df.loc[invalid, end_col]
+        df.loc[invalid, start_col] = pd.to_datetime(
+            pd.DataFrame({'year': end.dt.year - 1, 'month': end.dt.month, 'day': 1})
+        )
+    return df
+
+
+def fill_when_empty(df: pd.DataFrame, column: str, value, other_columns: List[str]) -> pd.DataFrame:
+    """column为空字符串且other_columns都为空值时，填入value"""
+    mask = df[column] == ''
+    for other in other_columns:
+        mask &= df[other].isna()
+    if mask.any():
+        df.loc[mask, column] = value
+    return df
+
+
+# 可在配置中使用的跨列规则：(名称, 参数...)
+ROW_RULES: Dict[str, Callable] = {
+    'fix_date_order': fix_date_order,
+    'fill_when_empty': fill_when_empty,
+}
+
+
+def _apply_steps(series: pd.Series, steps: List[Callable]) -> pd.Series:
+    for step in steps:
+        series = step(series)
+    return series
+
+
+# 取值都是同一类型时，去重不会合并转为文本后不同的取值
+_SINGLE_TYPE_KINDS = {'empty', 'string', 'integer', 'floating', 'boolean', 'datetime', 'datetime64', 'date'}
+
+
+def _has_colliding_values(series: pd.Series) -> bool:
+    """列中同时有不同类型的数字（如1和1.0）时，去重会把它们合并，但转为文本后并不相同"""
+    if pd.api.types.infer_dtype(series, skipna=True) in _SINGLE_TYPE_KINDS:
+        return False
+    number_types = {type(value) for value in series.to_numpy() if isinstance(value, Number) and value == value}
+    return len(number_types) > 1
+
+
+def apply_on_uniques(series: pd.Series, steps: List[Callable]) -> pd.Series:
+    """只对列中的不重复取值执行清理步骤，再按编码还原到每一行
+
+    所有清理步骤都是逐个取值独立计算的，结果与逐行清理相同；重复取值多的列（厂家、单位、性别等）
+    清理次数从行数降为不重复取值数。
+    """
+    if series.dtype == 'object' and _has_colliding_values(series):
+        return _apply_steps(series, steps)
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    if len(uniques) == len(series):
+        return _apply_steps(series, steps)
+    cleaned = _apply_steps(pd.Series(uniques, name=series.name), steps).take(codes)
+    cleaned.index = series.index
+    return cleaned
+
+
+def _call_with_args(func: Callable, args: tuple, data):
+    return func(data, *args)
+
+
+def _bind(registry: Dict[str, Callable], step) -> Callable:
+    """把配置中的步骤（名称或(名称, 参数...)）绑定为只接收数据的函数"""
+    name, args = (step, ()) if isinstance(step, str) else (step[0], tuple(step[1:]))
+    if name not in registry:
+        raise ValueError(f"未知的处理步骤: {name}")
+    return partial(_call_with_args, registry[name], args)
+
+
+def _column_type(spec: dict) -> str:
+    """按清理步骤确定列的输出类型：int、float、datetime或string"""
+    names = [step if isinstance(step, str) else step[0] for step in spec.get('cleaners', [])]
+    if 'int' in names:
+        return 'int'
+    if names and names[0] == 'numeric':
+        return 'float'
+    if 'date' in names:
+        return 'datetime'
+    return 'string'
+
+
+class SheetPlan:
+    """由工作表配置编译得到的处理计划
+
+    prepare完成列名之外的全部清理（去重之前），finish填充默认值并按输出顺序选出目标列（去重之后）。
+    factorize为True时各列只清理不重复的取值，见apply_on_uniques。
+    """
+
+    def __init__(self, config: dict):
+        columns = config['columns']
+        self.sheet_name: str = config['sheet_name']
+        self.output_file: str = config['output_file']
+        self.target_columns: List[str] = list(columns)
+        self.header_mapping: Dict[str, List[str]] = {
+            col: spec.get('aliases', [col]) for col, spec in columns.items()
+        }
+        self.required_columns: List[str] = [col for col, spec in columns.items() if spec.get('required')]
+        self.header_index = HeaderIndex(self.header_mapping)
+        self.defaults: Dict[str, object] = {
+            col: spec['default'] for col, spec in columns.items() if spec.get('default') is not None
+        }
+        self.fill_before_dedup = config.get('fill_stage', 'after_dedup') == 'before_dedup'
+        # 各目标列的输出类型，列类型固定的输出格式（Parquet）按它建立表结构
+        self.column_types: Dict[str, str] = {col: _column_type(spec) for col, spec in columns.items()}
+        # 以category类型保存的列，写出时由输出器还原
+        self.category_columns: List[str] = [col for col, spec in columns.items() if spec.get('category')]
+        # 增量转换使用的业务主键，依次取第一个非空的列
+        self.business_key: List[str] = list(config.get('business_key', []))
+        # 按主键去重时组成主键的列
+        self.dedup_key: List[str] = list(config.get('dedup_key', []))
+        # 引用其他工作表的列：{列名: (被引用的工作表, [被引用的列])}
+        self.references: Dict[str, Tuple[str, List[str]]] = {
+            col: (sheet_name, list(columns)) for col, (sheet_name, columns) in config.get('references', {}).items()
+        }
+        # 按列读取时以文本读取的列
+        self.read_as_text: List[str] = [col for col, spec in columns.items() if spec.get('read_as_text')]
+        # 需要格式校验的列：{列名: 校验名称}
+        self.validations: Dict[str, str] = {
+            col: spec['validate'] for col, spec in columns.items() if spec.get('validate')
+        }
+
+        # 通用文本清理的范围；'all'模式下跳过数值列
+        self.text_mode = config.get('text_columns', 'object')
+        self.numeric_columns = {
+            col for col, spec in columns.items()
+            if spec.get('cleaners') and spec['cleaners'][0] == 'numeric'
+        }
+
+        # 各列的清理步骤，截断放在最后
+        self.column_steps: Dict[str, List[Callable]] = {}
+        for col, spec in columns.items():
+            steps = [_bind(CLEANERS, step) for step in spec.get('cleaners', [])]
+            if spec.get('max_length'):
+                steps.append(_bind(CLEANERS, ('truncate', spec['max_length'])))
+            if steps:
+                self.column_steps[col] = steps
+
+        self.row_rules = [_bind(ROW_RULES, rule) for rule in config.get('row_rules', [])]
+
+    def _text_columns(self, df: pd.DataFrame) -> List[str]:
+        if self.text_mode == 'all':
+            return [col for col in df.columns if col not in self.numeric_columns]
+        return [col for col in df.columns if _is_text(df[col])]
+
+    def clean_column(self, series: pd.Series, col: str, text: bool, factorize: bool = False) -> pd.Series:
+        """对一列执行通用文本清理（text为True时）和该列的专用清理"""
+        steps = [clean_text, blank_nulls] if text else []
+        steps += self.column_steps.get(col, [])
+        if not steps:
+            return series
+        return apply_on_uniques(series, steps) if factorize else _apply_steps(series, steps)
+
+    def clean(self, df: pd.DataFrame, factorize: bool = False) -> pd.DataFrame:
+        """创建缺失的目标列，并对每列依次执行通用文本清理和专用清理"""
+        for col in self.target_columns:
+            if col not in df.columns:
+                df[col] = None
+
+        df = df.copy()
+
+        # 编码、证件号等列总是按文本输出：整列为整数时不会保持int64，一次性读取和按批次读取的结果一致
+        for col in self.read_as_text:
+            df[col] = as_text(df[col])
+
+        text_columns = set(self._text_columns(df)) | set(self.read_as_text)
+        for col in df.columns:
+            df[col] = self.clean_column(df[col], col, col in text_columns, factorize)
+        return df
+
+    def apply_row_rules(self, df: pd.DataFrame) -> pd.DataFrame:
+        """执行跨列规则"""
+        for rule in self.row_rules:
+            df = rule(df)
+        return df
+
+    def prepare(self, df: pd.DataFrame, factorize: bool = False) -> pd.DataFrame:
+        """清理已重命名的数据（去重之前的步骤）"""
+        df = self.apply_row_rules(self.clean(df, factorize))
+        if self.fill_before_dedup:
+            df = df.fillna(self.defaults)
+        return df
+
+    def finish(self, df: pd.DataFrame) -> pd.DataFrame:
+        """填充默认值、只保留目标列并压缩取值种类少的列（去重之后的步骤）"""
+        if not self.fill_before_dedup:
+            df = df.fillna(self.defaults)
+        df = df[self.target_columns]
+        if self.category_columns:
+            df = df.astype({col: 'category' for col in self.category_columns})
+        return df
+
+    def concat(self, parts: List[pd.DataFrame]) -> pd.DataFrame:
+        """合并finish产出的各批数据，category列合并类别后保持category类型"""
+        if len(parts) == 1:
+            return parts[0]
+        categories = {
+            col: union_categoricals([part[col] for part in parts]).categories
+            for col in self.category_columns
+        }
+        parts = [
+            part.assign(**{col: part[col].cat.set_categories(cats) for col, cats in categories.items()})
+            for part in parts
+        ]
+        return pd.concat(parts, ignore_index=True)
+
+
+def compile_sheet(config: dict) -> SheetPlan:
+    """把工作表配置编译为处理计划"""
+    return SheetPlan(config)
+
+
+def compile_sheets(configs: List[dict]) -> Dict[str, SheetPlan]:
+    """编译全部工作表配置，按处理顺序返回{工作表名: 处理计划}"""
+    return {config['sheet_name']: compile_sheet(config) for config in configs}
@@ -0,0 +1,98 @@
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+# 流式读取时每批的默认行数
+DEFAULT_BATCH_SIZE = 10000
+
+
+def make_header(values) -> List[str]:
+    """按pandas的规则生成列名：空表头记为Unnamed: n，重复表头追加.1、.2后缀"""
+    header = []
+    counts = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in counts:
+            counts[name] += 1
+            name = f"{name}.{counts[name]}"
+        else:
+            counts[name] = 0
+        header.append(name)
+    return header
+
+
+def cell_text(value):
+    """把单元格的值转为文本，整数值的浮点数去掉小数部分（与pandas.read_excel的dtype=str一致）"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        if np.isnan(value):
+            return None
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def text_cells(row: tuple, text_positions: List[int]) -> tuple:
+    """把一行中text_positions位置上的单元格转为文本
+
+    必须在组成DataFrame之前转换：整数单元格和空单元格组成的列会被推断为float64，超过15位的编码在转换前就已失真。
+    """
+    row = list(row)
+    for i in text_positions:
+        row[i] = cell_text(row[i])
+    return tuple(row)
+
+
+def iter_worksheet_batches(worksheet, batch_size: int = DEFAULT_BATCH_SIZE,
+                           usecols: Optional[List[int]] = None,
+                           text_positions: Optional[List[int]] = None) -> Iterator[pd.DataFrame]:
+    """逐行读取只读模式打开的工作表，每次产出最多batch_size行的DataFrame
+
+    整张表不会一次性载入内存；即使表中没有数据行，也至少产出一个只含表头的空DataFrame。
+    usecols为需要读取的列的位置，其余列不会放入DataFrame；text_positions为产出的列中按文本读取的列的位置。
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = make_header(next(rows, ()))
+    if usecols is not None:
+        header = [header[i] for i in usecols]
+    width = len(header)
+
+    batch = []
+    emitted = False
+    for row in rows:
+        if usecols is not None:
+            row = tuple(row[i] if i < len(row) else None for i in usecols)
+        # 跳过空行，与pandas.read_excel保持一致
+        if all(value is None for value in row):
+            continue
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        if text_positions:
+            row = text_cells(row, text_positions)
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield pd.DataFrame.from_records(batch, columns=header)
+            batch = []
+            emitted = True
+
+    if batch or not emitted:
+        yield pd.DataFrame.from_records(batch, columns=header)
+
+
+def iter_sheet_batches(file_path: str, sheet_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                       usecols: Optional[List[int]] = None,
+                       text_positions: Optional[List[int]] = None) -> Iterator[pd.DataFrame]:
+    """以只读模式打开文件并逐批读取工作表，参数见iter_worksheet_batches"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield from iter_worksheet_batches(workbook[sheet_name], batch_size, usecols, text_positions)
+    finally:
+        workbook.close()
+
+
+def worksheet_row_count(worksheet) -> Optional[int]:
+    """根据工作表记录的数据范围估算数据行数（不含表头），文件中没有记录范围时返回None"""
+    max_row = worksheet.max_row
+    return max(max_row - 1, 0) if max_row else None
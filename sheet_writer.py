@@ -0,0 +1,313 @@
+import os
+from typing import Dict, Optional
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+from input_engines import as_text
+
+# 与pandas.to_excel一致的工作表名和单元格格式
+SHEET_NAME = 'Sheet1'
+DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'
+_THIN = Side(style='thin')
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+# 输出格式及对应的扩展名；CSV默认带BOM，Excel打开时能正确识别中文
+OUTPUT_FORMATS = {
+    'xlsx': '.xlsx',
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'jsonl': '.jsonl',
+}
+DEFAULT_CSV_ENCODING = 'utf-8-sig'
+# CSV每次写入磁盘的行数
+CSV_CHUNK_SIZE = 50000
+
+
+def to_plain_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """把category列还原为类别本身的类型，输出文件中的单元格与普通列一致"""
+    categorical = {
+        col: df[col].cat.categories.dtype
+        for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+    return df.astype(categorical) if categorical else df
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# 各输出器的abort在出错或取消时调用：关闭打开的文件并删除写了一部分的输出，不留下不完整的文件
+
+
+class ExcelFrameWriter:
+    """默认输出方式：缓存所有批次，关闭时用pandas.to_excel一次性写出"""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.rows = 0
+        self._parts = []
+        self._saving = False
+
+    def write(self, df: pd.DataFrame):
+        self._parts.append(df)
+        self.rows += len(df)
+
+    def close(self):
+        df = self._parts[0] if len(self._parts) == 1 else pd.concat(self._parts, ignore_index=True)
+        self._saving = True
+        to_plain_dtypes(df).to_excel(self.output_path, index=False)
+        self._parts = []
+
+    def abort(self):
+        self._parts = []
+        if self._saving:
+            _remove(self.output_path)
+
+
+class StreamingExcelWriter:
+    """恒定内存输出方式：基于openpyxl的write_only模式，每批数据直接追加到磁盘
+
+    列顺序、表头样式和单元格类型（数字、文本、日期、空值）与pandas.to_excel保持一致。
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.rows = 0
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(SHEET_NAME)
+        self._header_written = False
+        # 先保存到临时文件，完整写出后再替换为输出文件
+        self._part_path = f"{output_path}.part"
+        self._saved = False
+
+    def _write_header(self, columns):
+        header = []
+        for name in columns:
+            cell = WriteOnlyCell(self._sheet, value=str(name))
+            cell.font = HEADER_FONT
+            cell.border = HEADER_BORDER
+            cell.alignment = HEADER_ALIGNMENT
+            header.append(cell)
+        self._sheet.append(header)
+        self._header_written = True
+
+    def _column_values(self, series: pd.Series) -> list:
+        """把一列转换为可直接写入单元格的Python值，空值写为空单元格"""
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = []
+            for value in series.tolist():
+                if pd.isna(value):
+                    values.append(None)
+                else:
+                    cell = WriteOnlyCell(self._sheet, value=value.to_pydatetime())
+                    cell.number_format = DATETIME_FORMAT
+                    values.append(cell)
+            return values
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    def write(self, df: pd.DataFrame):
+        if not self._header_written:
+            self._write_header(df.columns)
+        df = to_plain_dtypes(df)
+        columns = [self._column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+        for row in zip(*columns):
+            self._sheet.append(row)
+        self.rows += len(df)
+
+    def close(self):
+        if not self._header_written:
+            self._write_header([])
+        self._saved = True
+        self._workbook.save(self._part_path)
+        os.replace(self._part_path, self.output_path)
+
+    def abort(self):
+        # 已追加的行缓存在openpyxl的临时文件中，保存工作簿时openpyxl才会删除它，所以保存到临时路径后再删除
+        if not self._saved:
+            self._saved = True
+            try:
+                self._workbook.save(self._part_path)
+            except Exception:
+                pass
+        _remove(self._part_path)
+        _remove(self.output_path)
+
+
+class CsvWriter:
+    """CSV输出：每批数据按CSV_CHUNK_SIZE行分块直接追加到文件"""
+
+    def __init__(self, output_path: str, encoding: str = DEFAULT_CSV_ENCODING):
+        self.output_path = output_path
+        self.rows = 0
+        self._file = open(output_path, 'w', encoding=encoding, newline='')
+        self._header_written = False
+
+    def write(self, df: pd.DataFrame):
+        to_plain_dtypes(df).to_csv(self._file, index=False, header=not self._header_written,
+                                   chunksize=CSV_CHUNK_SIZE)
+        self._header_written = True
+        self.rows += len(df)
+
+    def close(self):
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+        _remove(self.output_path)
+
+
+class JsonLinesWriter:
+    """JSON Lines输出：每行一条记录，空值写为null，日期写为ISO格式"""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.rows = 0
+        self._file = open(output_path, 'w', encoding='utf-8')
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        text = to_plain_dtypes(df).to_json(orient='records', lines=True, force_ascii=False, date_format='iso')
+        self._file.write(text if text.endswith('\n') else text + '\n')
+        self.rows += len(df)
+
+    def close(self):
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+        _remove(self.output_path)
+
+
+class ParquetWriter:
+    """Parquet输出（需要安装pyarrow）：每批数据写为一个row group
+
+    列类型在写入第一批之前确定：column_types中声明的列（见SheetPlan.column_types）按声明的类型，
+    其余列按第一批推断，整数列放宽为double。之后每批都先转换为这些类型，
+    前面的批次全为整数、后面出现小数，或某一批全为空值时，各row group的类型仍然一致。
+    数值和日期列中的''写为空值，文本列中的数值写为文本。
+    """
+
+    def __init__(self, output_path: str, column_types: Optional[Dict[str, str]] = None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("输出Parquet格式需要先安装pyarrow: pip install pyarrow") from None
+        self._pa = pa
+        self._pq = pq
+        self.output_path = output_path
+        self.rows = 0
+        self.column_types = dict(column_types or {})
+        self._types = None
+        self._schema = None
+        self._writer = None
+
+    @staticmethod
+    def _infer_type(series: pd.Series) -> str:
+        if pd.api.types.is_bool_dtype(series):
+            return 'bool'
+        if pd.api.types.is_numeric_dtype(series):
+            return 'float'
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return 'datetime'
+        return 'string'
+
+    def _arrow_type(self, column_type: str):
+        pa = self._pa
+        return {
+            'int': pa.int64(),
+            'float': pa.float64(),
+            'datetime': pa.timestamp('ns'),
+            'bool': pa.bool_(),
+            'string': pa.string(),
+        }[column_type]
+
+    @staticmethod
+    def _convert(series: pd.Series, column_type: str) -> pd.Series:
+        if column_type == 'string':
+            return as_text(series).astype(object)
+        values = series.mask(series.astype(object) == '') if series.dtype == object else series
+        if column_type == 'int':
+            return pd.to_numeric(values).astype('Int64')
+        if column_type == 'float':
+            return pd.to_numeric(values).astype('float64')
+        if column_type == 'datetime':
+            return pd.to_datetime(values)
+        return values.astype('boolean')
+
+    def write(self, df: pd.DataFrame):
+        df = to_plain_dtypes(df)
+        if self._schema is None:
+            self._types = {col: self.column_types.get(col) or self._infer_type(df[col]) for col in df.columns}
+            self._schema = self._pa.schema([
+                self._pa.field(str(col), self._arrow_type(column_type)) for col, column_type in self._types.items()
+            ])
+            self._writer = self._pq.ParquetWriter(self.output_path, self._schema)
+        df = pd.DataFrame({col: self._convert(df[col], column_type) for col, column_type in self._types.items()})
+        table = self._pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.output_path, self._pa.schema([]))
+        self._writer.close()
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        _remove(self.output_path)
+
+
+# 可选的Excel输出方式
+WRITER_BACKENDS = {
+    'pandas': ExcelFrameWriter,
+    'streaming': StreamingExcelWriter,
+}
+
+
+def output_filename(filename: str, output_format: str = 'xlsx') -> str:
+    """把配置中的输出文件名换成输出格式对应的扩展名"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}")
+    return os.path.splitext(filename)[0] + OUTPUT_FORMATS[output_format]
+
+
+def open_writer(output_path: str, backend: str = 'pandas', output_format: str = 'xlsx',
+                csv_encoding: str = DEFAULT_CSV_ENCODING, column_types: Optional[Dict[str, str]] = None):
+    """按输出格式创建输出器；backend只对xlsx格式有效，column_types只对parquet格式有效（见ParquetWriter）"""
+    if output_format == 'csv':
+        return CsvWriter(output_path, csv_encoding)
+    if output_format == 'jsonl':
+        return JsonLinesWriter(output_path)
+    if output_format == 'parquet':
+        return ParquetWriter(output_path, column_types)
+    if output_format != 'xlsx':
+        raise ValueError(f"不支持的输出格式: {output_format}")
+    if backend not in WRITER_BACKENDS:
+        raise ValueError(f"不支持的输出方式: {backend}")
+    return WRITER_BACKENDS[backend](output_path)
+
+
+def read_output(output_path: str, output_format: str = 'xlsx',
+                csv_encoding: str = DEFAULT_CSV_ENCODING) -> pd.DataFrame:
+    """读回已写出的输出文件（用于重新显示已释放的转换结果）"""
+    if output_format == 'csv':
+        return pd.read_csv(output_path, encoding=csv_encoding, dtype=str)
+    if output_format == 'jsonl':
+        return pd.read_json(output_path, lines=True, dtype=False)
+    if output_format == 'parquet':
+        return pd.read_parquet(output_path)
+    if output_format != 'xlsx':
+        raise ValueError(f"不支持的输出格式: {output_format}")
+    return pd.read_excel(output_path)
@@ -0,0 +1,174 @@
+"""转换结果的表格预览
+
+DataFrameModel直接引用处理后的DataFrame，不复制数据、不预先生成文本：
+表格只对屏幕上可见的单元格取值并格式化，行随滚动按页载入。排序和筛选在模型中按整列计算
+（筛选只匹配不重复的取值），只改变显示的行位置数组，百万行的结果也能即时滚动。
+"""
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QLineEdit, QTableView, QVBoxLayout, QWidget
+
+# 每次滚动到底部时载入的行数
+PAGE_SIZE = 1000
+# 筛选列下拉框中表示全部列的选项
+ALL_COLUMNS = "全部列"
+
+
+def format_value(value) -> str:
+    """单元格的显示文本：空值显示为空，没有时间部分的日期只显示日期"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d') if value == value.normalize() else str(value)
+    return str(value)
+
+
+class DataFrameModel(QAbstractTableModel):
+    """以DataFrame为数据源的只读表格模型
+
+    rows为当前显示的行在DataFrame中的位置（排序、筛选后的顺序），loaded为已载入视图的行数。
+    """
+
+    def __init__(self, frame: pd.DataFrame, parent=None):
+        super().__init__(parent)
+        self.frame = frame
+        self.rows = np.arange(len(frame))
+        self.loaded = min(PAGE_SIZE, len(self.rows))
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.frame.shape[1]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(PAGE_SIZE, len(self.rows) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        return format_value(self.frame.iat[self.rows[index.row()], index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self.frame.columns[section])
+        # 行号为结果中的原始行号，排序、筛选后不变
+        return str(self.rows[section] + 1)
+
+    @property
+    def total_rows(self) -> int:
+        """排序、筛选后的行数（包括尚未载入的行）"""
+        return len(self.rows)
+
+    def _reset_rows(self, rows: np.ndarray):
+        self.beginResetModel()
+        self.rows = rows
+        self.loaded = min(PAGE_SIZE, len(rows))
+        self.endResetModel()
+
+    def _sorted(self, rows: np.ndarray) -> np.ndarray:
+        """按当前的排序列对rows稳定排序，空值总在最后"""
+        if self.sort_column is None:
+            return rows
+        values = self.frame.iloc[rows, self.sort_column].reset_index(drop=True)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # category列的类别顺序是合并批次时的顺序，按取值本身排序
+            values = values.astype(object)
+        ascending = self.sort_order == Qt.AscendingOrder
+        try:
+            order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index
+        except TypeError:
+            # 同一列中混有文本和数字时按文本排序
+            text = values.astype(object).where(values.notna()).astype(str).where(values.notna())
+            order = text.sort_values(ascending=ascending, kind='stable', na_position='last').index
+        return rows[order.to_numpy()]
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.sort_column = column
+        self.sort_order = order
+        self.rows = self._sorted(self.rows)
+        self.layoutChanged.emit()
+
+    def set_filter(self, text: str, column=None):
+        """只显示包含text（不区分大小写）的行；column为列序号，None时任一列包含即可，text为空时显示全部"""
+        if not text:
+            self._reset_rows(self._sorted(np.arange(len(self.frame))))
+            return
+        columns = range(self.frame.shape[1]) if column is None else [column]
+        matched = np.zeros(len(self.frame), dtype=bool)
+        for i in columns:
+            series = self.frame.iloc[:, i]
+            # 只对不重复的取值做文本匹配，再还原到各行
+            codes, uniques = pd.factorize(series)
+            found = np.array([text.lower() in format_value(value).lower() for value in uniques] + [False])
+            matched |= found[codes]
+        self._reset_rows(self._sorted(np.flatnonzero(matched)))
+
+
+class DataFramePreview(QWidget):
+    """带筛选框的结果预览：点击表头排序，输入文字后回车筛选"""
+
+    def __init__(self, frame: pd.DataFrame, parent=None):
+        super().__init__(parent)
+        self.model = DataFrameModel(frame, self)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("输入要筛选的内容后回车")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.returnPressed.connect(self.apply_filter)
+        self.filter_edit.textChanged.connect(self.on_text_changed)
+        self.column_combo = QComboBox()
+        self.column_combo.addItem(ALL_COLUMNS)
+        self.column_combo.addItems([str(col) for col in frame.columns])
+        self.column_combo.currentIndexChanged.connect(self.apply_filter)
+        self.count_label = QLabel()
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        # 先清除排序标记，启用排序时不会立即按第一列排序
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("筛选:"))
+        filter_layout.addWidget(self.filter_edit, 1)
+        filter_layout.addWidget(self.column_combo)
+        filter_layout.addWidget(self.count_label)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.table)
+        self.update_count()
+
+    def apply_filter(self):
+        index = self.column_combo.currentIndex()
+        self.model.set_filter(self.filter_edit.text().strip(), None if index <= 0 else index - 1)
+        self.update_count()
+
+    def on_text_changed(self, text):
+        # 清空筛选框时恢复显示全部行
+        if not text:
+            self.apply_filter()
+
+    def update_count(self):
+        total = len(self.model.frame)
+        shown = self.model.total_rows
+        self.count_label.setText(f"共{total}行" if shown == total else f"{shown}/{total}行")
@@ -0,0 +1,11 @@
+import pandas as pd
+
+from date_parser import parse_dates
+
+
+def test_digit_strings_by_length():
+    values = pd.Series(['2023', 2023, '20230105', '202301', '45000', '45000.25', 45000.0, '123', ''], dtype=object)
+    parsed = parse_dates(values)
+    expected = pd.to_datetime(['2023-01-01', '2023-01-01', '2023-01-05', '2023-01-01', '2023-03-15',
+                               '2023-03-15 06:00', '2023-03-15', None, None], format='mixed')
+    assert parsed.tolist() == expected.tolist()
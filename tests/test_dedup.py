@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dedup
+
+
+def _frame():
+    # 主键去掉首尾空白、不区分大小写：0、1、3是同一主键；2、4主键全为空，按整行比较
+    return pd.DataFrame({
+        '编码': [' a', 'A', np.nan, 'a ', None],
+        '名称': ['甲', '', '丙', '甲', '丙'],
+        '规格': [None, '10g', '', '10g', ''],
+    })
+
+
+@pytest.mark.parametrize('policy, kept', [
+    ('first', [0, 2]),
+    ('last', [3, 4]),
+    # 3的非空字段最多
+    ('most_complete', [2, 3]),
+])
+def test_keep_mask_by_policy(policy, kept):
+    df = _frame()
+    result, dropped = dedup.deduplicate(df, ['编码'], policy, list(df.columns))
+
+    assert result.index.tolist() == kept
+    assert sorted(dropped.index.tolist()) == sorted(set(range(5)) - set(kept))
+
+
+def test_most_complete_ties_keep_first():
+    prints = np.array([7, 7, 9, 7], dtype=np.uint64)
+    score = np.array([2, 3, 1, 3])
+    assert dedup.keep_mask(prints, 'most_complete', score).tolist() == [False, True, True, False]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        dedup.keep_mask(np.zeros(1, dtype=np.uint64), 'newest')
+
+
+def test_composite_key_with_missing_parts():
+    df = pd.DataFrame({
+        '编码': ['1', '1', '1', np.nan, None, '2'],
+        '批号': [np.nan, '', 'B1', 'B1', 'B1', 'B1'],
+        '数量': [1, 2, 3, 4, 5, 6],
+    })
+    prints, empty = dedup.fingerprints(df, ['编码', '批号'])
+
+    # 空值和''规范化后相同；部分为空的主键仍按主键比较
+    assert prints[0] == prints[1]
+    assert len({prints[0], prints[2], prints[3], prints[5]}) == 4
+    assert prints[3] == prints[4]
+    assert not empty.any()
+    # 主键列的顺序不同时指纹不同
+    swapped = pd.DataFrame({'编码': ['B1'], '批号': ['1']})
+    assert dedup.fingerprints(swapped, ['编码', '批号'])[0][0] != prints[2]
+
+
+def test_dropped_rows_report():
+    df = _frame()
+    result, dropped = dedup.deduplicate(df, ['编码'], 'first', list(df.columns))
+
+    assert dropped[dedup.REASON_COLUMN].tolist() == [dedup.KEY_DUPLICATE, dedup.KEY_DUPLICATE, dedup.ROW_DUPLICATE]
+    assert dropped[dedup.KEY_COLUMN].tolist() == ['A', 'A', '']
+    assert dedup.report_path('out/商品导入.xlsx') == 'out/商品导入_重复.xlsx'
+
+
+def test_drop_seen_across_batches():
+    seen = set()
+    first, _ = dedup.drop_seen(pd.DataFrame({'编码': ['a', 'b', 'A']}), ['编码'], seen)
+    second, dropped = dedup.drop_seen(pd.DataFrame({'编码': ['B ', 'c']}), ['编码'], seen)
+
+    assert first['编码'].tolist() == ['a', 'b']
+    assert second['编码'].tolist() == ['c']
+    assert dropped[dedup.KEY_COLUMN].tolist() == ['B']
@@ -0,0 +1,39 @@
+from header_index import HeaderIndex, normalize_header
+
+MAPPING = {
+    '商品名称': ['药品名称', '名称'],
+    '通用名': ['通用名称', '名称'],
+    'email': ['E-mail', '邮箱'],
+}
+
+
+def test_normalize_full_width_case_and_spaces():
+    assert normalize_header('Ｅ－ＭＡＩＬ') == normalize_header('e-mail')
+    assert normalize_header(' 商品 名称　') == '商品名称'
+    assert normalize_header('STRASSE') == normalize_header('straße')
+
+
+def test_resolve_variants():
+    result = HeaderIndex(MAPPING).resolve(['ＥＭＡＩＬ', ' 药品名称 '])
+    assert result.mapping == {'ＥＭＡＩＬ': 'email', ' 药品名称 ': '商品名称'}
+    assert result.ambiguities == []
+
+
+def test_target_name_has_priority_over_alias():
+    # 目标列名本身优先于别名，先出现的列不一定被使用
+    result = HeaderIndex(MAPPING).resolve(['药品名称', '商品名称'])
+    assert result.found == {'商品名称': '商品名称'}
+    assert result.ambiguities == ['"商品名称"同时匹配到列"商品名称"和"药品名称"，已使用"商品名称"']
+
+
+def test_shared_alias_goes_to_first_target():
+    index = HeaderIndex(MAPPING)
+    assert index.shared_aliases == {'名称': ['商品名称', '通用名']}
+
+    result = index.resolve(['名称'])
+    assert result.mapping == {'名称': '商品名称'}
+    assert result.ambiguities == ['列"名称"同时可作为"商品名称"和"通用名"，已用作"商品名称"']
+
+    # 商品名称已有更优先的列时，共用的别名留给通用名
+    result = index.resolve(['名称', '商品名称'])
+    assert result.mapping == {'商品名称': '商品名称', '名称': '通用名'}
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import incremental
+from data_processor import DataProcessor
+from sheet_writer import to_plain_dtypes
+
+HEADER = ['商品编码', '商品名称', '规格', '零售价', '单位']
+FIRST = [
+    ['P1', '阿莫西林', '0.25g', 12.5, '盒'],
+    ['P2', '布洛芬', '0.3g', 18, '盒'],
+    ['P2', '布洛芬', '0.3g', 18, '盒'],
+    ['P3', '维生素C', '100片', 6, '瓶'],
+    ['P4', '板蓝根', '10袋', 15, '盒'],
+]
+SECOND = [
+    ['P1', '阿莫西林', '0.25g', 12.5, '盒'],
+    ['P2', '布洛芬', '0.3g', 19.5, '盒'],       # 修改
+    ['P3', ' 维生素C ', '100片', 6, '瓶'],      # 原始数据变了，清理后相同
+    ['P5', '感冒灵', '10袋', 22, '盒'],          # 新增；P4删除
+    ['P1', '阿莫西林', '0.25g', 12.5, '盒'],     # 已有主键下多了一行
+]
+
+
+def _write_products(path, rows):
+    workbook = Workbook()
+    workbook.active.title = '商品'
+    for row in [HEADER] + rows:
+        workbook.active.append(row)
+    workbook.save(path)
+
+
+def _convert(tmp_path, rows, output_dir, **options):
+    input_path = str(tmp_path / 'products.xlsx')
+    _write_products(input_path, rows)
+    output_dir.mkdir(exist_ok=True)
+    processor = DataProcessor(**options)
+    processor.set_input_file_path(input_path)
+    processor.set_output_dir(str(output_dir))
+    results = processor.process_all_data(input_path)
+    assert '商品' in processor.row_counts, results
+    return processor
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_incremental_run_matches_full_conversion(tmp_path, streaming):
+    options = {'streaming': streaming, 'batch_size': 2}
+    _convert(tmp_path, FIRST, tmp_path / 'incremental', incremental=True, **options)
+    second = _convert(tmp_path, SECOND, tmp_path / 'incremental', incremental=True, **options)
+    full = _convert(tmp_path, SECOND, tmp_path / 'full', **options)
+
+    # 流式处理时category列的类别顺序可能不同，按输出的取值比较
+    pd.testing.assert_frame_equal(to_plain_dtypes(second.frames['商品']).reset_index(drop=True),
+                                  to_plain_dtypes(full.frames['商品']).reset_index(drop=True))
+    assert second.delta_counts['商品'] == {incremental.INSERTED: 1, incremental.UPDATED: 2, incremental.DELETED: 1}
+
+    delta = pd.read_excel(tmp_path / 'incremental' / '商品导入_增量.xlsx', dtype=str)
+    changes = dict(zip(delta['原系统商品编码'], delta[incremental.CHANGE_COLUMN]))
+    assert changes == {'P5': incremental.INSERTED, 'P2': incremental.UPDATED, 'P1': incremental.UPDATED,
+                       'P4': incremental.DELETED}
+
+
+def test_state_round_trip(tmp_path):
+    plan = DataProcessor.SHEET_PLANS['商品']
+    df = pd.DataFrame([row[:3] for row in FIRST], columns=['原系统商品编码', '商品名称', '商品规格'])
+    _, delta, state = incremental.apply_delta(plan, df, None)
+    assert set(delta[incremental.CHANGE_COLUMN]) == {incremental.INSERTED}
+
+    path = incremental.state_path(str(tmp_path / '商品导入.xlsx'))
+    incremental.save_state(path, state)
+    loaded = incremental.load_state(path, plan)
+    pd.testing.assert_series_equal(loaded['fingerprints'], state['fingerprints'])
+
+    # 原始数据没有变化时全部沿用上次的结果，没有变更记录
+    full, delta, _ = incremental.apply_delta(plan, df, loaded)
+    assert delta.empty
+    assert full['原系统商品编码'].tolist() == ['P1', 'P2', 'P2', 'P3', 'P4']
+
+    # 主键配置变化后不再使用旧状态
+    other = DataProcessor.SHEET_PLANS['会员']
+    assert incremental.load_state(path, other) is None
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+import integrity
+
+PRODUCTS = pd.DataFrame({'原系统商品编码': ['P1', 'p2 ', None]})
+SUPPLIERS = pd.DataFrame({'单位名称': ['甲公司', '乙公司'], '原系统供应商编码': ['S1', 'S2']})
+REFERENCES = {
+    '原系统商品编码': ('商品', ['原系统商品编码']),
+    '供应商': ('供应商', ['单位名称', '原系统供应商编码']),
+}
+
+
+def test_reference_index_lookup():
+    index = integrity.ReferenceIndex(SUPPLIERS, ['单位名称', '原系统供应商编码', '不存在的列'])
+    values = pd.Series(['甲公司', ' s2', 'S3', '', np.nan, '丙公司'])
+    assert index.missing(values).tolist() == [False, False, True, False, False, True]
+
+
+def test_check_references_flags_each_column():
+    inventory = pd.DataFrame({
+        '原系统商品编码': ['P1', 'P2', 'P9', 'P8', None],
+        '供应商': ['甲公司', 'S9', 'S2', '丁公司', ''],
+        '数量': [1, 2, 3, 4, 5],
+    })
+    check = integrity.check_references(inventory, REFERENCES, {'商品': PRODUCTS, '供应商': SUPPLIERS})
+
+    assert check.counts == {'原系统商品编码': 2, '供应商': 2}
+    assert check.skipped == {}
+    assert check.orphans.index.tolist() == [1, 2, 3]
+    assert check.orphans[integrity.ORPHAN_COLUMN].tolist() == [
+        '供应商在供应商中不存在',
+        '原系统商品编码在商品中不存在',
+        '原系统商品编码在商品中不存在；供应商在供应商中不存在',
+    ]
+    assert check.orphans.columns[0] == integrity.ORPHAN_COLUMN
+
+
+def test_check_references_all_found_or_skipped():
+    inventory = pd.DataFrame({'原系统商品编码': ['P1', 'P2'], '供应商': ['甲公司', 'S1']})
+    check = integrity.check_references(inventory, REFERENCES, {'商品': PRODUCTS, '供应商': None})
+
+    assert check.counts == {'原系统商品编码': 0}
+    assert check.skipped == {'供应商': '供应商'}
+    assert check.orphans is None
@@ -0,0 +1,60 @@
+from mapping_memory import MappingMemory, RememberingResolver, header_signature, main
+from mapping_resolver import MappingResolver
+
+COLUMNS = ['编号', '品名', '规格说明']
+
+
+class AskingResolver(MappingResolver):
+    """代替对话框：记录被询问的字段，按answers回答"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.asked = []
+
+    def resolve(self, sheet_name, missing_columns, columns):
+        self.asked.append(list(missing_columns))
+        return {col: self.answers[col] for col in missing_columns if col in self.answers}
+
+
+def test_remembered_mapping_is_reused(tmp_path):
+    path = str(tmp_path / 'mappings.json')
+    asking = AskingResolver({'商品规格': '规格说明'})
+    resolver = RememberingResolver(asking, MappingMemory(path))
+    assert resolver.resolve('商品', ['商品规格', '通用名'], COLUMNS) == {'商品规格': '规格说明'}
+
+    # 新的进程载入同一文件：表头签名相同时不再询问，没有选择的字段也不再询问
+    asking = AskingResolver({})
+    resolver = RememberingResolver(asking, MappingMemory(path))
+    assert resolver.resolve('商品', ['商品规格', '通用名'], list(COLUMNS)) == {'商品规格': '规格说明'}
+    assert asking.asked == []
+    assert MappingMemory(path).entries[header_signature('商品', COLUMNS)]['uses'] == 1
+
+    # 签名忽略列名的首尾空白；表头或工作表不同时签名不同，需要重新询问
+    assert header_signature('商品', [' 编号', '品名', '规格说明 ']) == header_signature('商品', COLUMNS)
+    resolver.resolve('商品', ['商品规格'], COLUMNS + ['备注'])
+    resolver.resolve('库存', ['商品规格'], COLUMNS)
+    assert asking.asked == [['商品规格'], ['商品规格']]
+
+
+def test_forget_and_clear(tmp_path, capsys):
+    path = str(tmp_path / 'mappings.json')
+    memory = MappingMemory(path)
+    memory.put('商品', COLUMNS, {'商品规格': '规格说明'})
+    memory.put('会员', COLUMNS, {'会员卡号': '编号'})
+    signature = header_signature('商品', COLUMNS)
+
+    assert memory.forget(signature)
+    assert not memory.forget(signature)
+    assert MappingMemory(path).get('商品', COLUMNS) is None
+    assert MappingMemory(path).get('会员', COLUMNS) == {'会员卡号': '编号'}
+
+    asking = AskingResolver({'商品规格': '规格说明'})
+    RememberingResolver(asking, MappingMemory(path)).resolve('商品', ['商品规格'], COLUMNS)
+    assert asking.asked == [['商品规格']]
+
+    # 命令行按签名前缀删除，clear删除全部
+    assert main(['--path', path, 'forget', signature[:8]]) == 0
+    assert MappingMemory(path).get('商品', COLUMNS) is None
+    assert main(['--path', path, 'clear']) == 0
+    assert MappingMemory(path).entries == {}
+    capsys.readouterr()
@@ -0,0 +1,69 @@
+import os
+import stat
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from openpyxl.reader.excel import ExcelReader
+
+from data_processor import DataProcessor
+from parse_cache import SheetCache
+
+
+def _convert(input_path, tmp_path, streaming):
+    """按图形界面的流程转换：先确定映射（已缓存时不打开文件），再转换"""
+    processor = DataProcessor(streaming=streaming, projection=True, cache_dir=str(tmp_path / 'cache'))
+    processor.set_input_file_path(input_path)
+    processor.set_output_dir(str(tmp_path))
+    sheet_names = processor.cached_sheet_names()
+    if sheet_names is None:
+        engine = processor.open_input()
+        sheet_names = engine.sheet_names
+    else:
+        engine = input_path
+    mappings = {
+        sheet_name: processor.resolve_sheet_mapping(engine, sheet_name)
+        for sheet_name in processor.SHEET_PLANS if sheet_name in sheet_names
+    }
+    if not isinstance(engine, str):
+        engine.close()
+    processor.process_all_data(input_path, mappings)
+    return processor
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_projection_second_run_reads_only_cache(tmp_path, monkeypatch, streaming):
+    input_path = str(tmp_path / 'suppliers.xlsx')
+    workbook = Workbook()
+    workbook.active.title = '供应商'
+    for row in [['供应商编码', '单位名称', '备注'], ['S1', '甲公司', 'x'], ['S2', '乙公司', 'y']]:
+        workbook.active.append(row)
+    workbook.save(input_path)
+    first = _convert(input_path, tmp_path, streaming)
+
+    def fail(reader):
+        raise AssertionError("工作表已缓存，不应再打开输入文件")
+    monkeypatch.setattr(ExcelReader, 'read', fail)
+    second = _convert(input_path, tmp_path, streaming)
+
+    assert second.row_counts == {'供应商': 2}
+    assert second.frames['供应商'].equals(first.frames['供应商'])
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="按POSIX权限判断缓存目录是否可信")
+def test_cache_ignores_directory_writable_by_others(tmp_path):
+    cache = SheetCache(str(tmp_path / 'cache'))
+    frame = pd.DataFrame({'a': [1, 2]})
+    list(cache.put('file', 'sheet', 'frame', [frame]))
+    assert stat.S_IMODE(os.stat(cache.cache_dir).st_mode) == 0o700
+    assert next(cache.get('file', 'sheet', 'frame')).equals(frame)
+
+    # 其他用户可以写入时，缓存中的pickle文件可能被替换，不再读取
+    os.chmod(cache.cache_dir, 0o777)
+    assert cache.get('file', 'sheet', 'frame') is None
+    assert cache.get_header('file', 'sheet') is None
+
+    # 再次写入时恢复为只有当前用户可以访问，并丢弃之前的缓存项
+    list(cache.put('file', 'other', 'frame', [frame]))
+    assert stat.S_IMODE(os.stat(cache.cache_dir).st_mode) == 0o700
+    assert cache.get('file', 'sheet', 'frame') is None
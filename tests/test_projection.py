@@ -0,0 +1,49 @@
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+from data_processor import DataProcessor
+
+# 超过15位的统一社会信用代码，转为float64后会失真
+LONG_IDS = ['91140574164023255', '91140574164023257']
+
+
+def _write_supplier_workbook(path):
+    """供应商表的信用代码列中间有空单元格，代码以整数写入（与ERP导出的文件一致）"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = '供应商'
+    sheet.append(['供应商编码', '单位名称', '统一社会信用代码'])
+    # openpyxl把大整数写成科学计数法，先写入占位数字再替换为完整的整数
+    sheet.append(['S1', '甲公司', 111111])
+    sheet.append(['S2', '乙公司', None])
+    sheet.append(['S3', '丙公司', 222222])
+    workbook.save(path)
+
+    with zipfile.ZipFile(path) as source:
+        entries = {name: source.read(name) for name in source.namelist()}
+    sheet_xml = 'xl/worksheets/sheet1.xml'
+    entries[sheet_xml] = (entries[sheet_xml]
+                          .replace(b'<v>111111</v>', f'<v>{LONG_IDS[0]}</v>'.encode())
+                          .replace(b'<v>222222</v>', f'<v>{LONG_IDS[1]}</v>'.encode()))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, data in entries.items():
+            target.writestr(name, data)
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('cached', [False, True])
+def test_projection_keeps_long_ids_with_gaps(tmp_path, streaming, cached):
+    input_path = str(tmp_path / 'suppliers.xlsx')
+    _write_supplier_workbook(input_path)
+
+    processor = DataProcessor(streaming=streaming, projection=True,
+                              cache_dir=str(tmp_path / 'cache') if cached else None)
+    processor.set_input_file_path(input_path)
+    processor.set_output_dir(str(tmp_path))
+    processor.process_all_data(input_path)
+
+    codes = processor.frames['供应商']['税务登记/信用代码/营业执照号'].tolist()
+    assert [codes[0], codes[2]] == LONG_IDS
+    assert codes[1] in ('', None)
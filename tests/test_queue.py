@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+from openpyxl import Workbook  # noqa: E402
+
+from data_processor import DataProcessor  # noqa: E402
+from excel_reader import DONE, ConversionJob, ExcelReader  # noqa: E402
+
+
+@pytest.fixture
+def window():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = ExcelReader()
+    yield window
+    window.pending.clear()
+    window.deleteLater()
+    app.processEvents()
+
+
+def test_overall_progress_restarts_for_new_run(window, tmp_path):
+    # 只检查进度计算，不进入事件循环，加入的文件不会真正开始转换
+    window.add_files([str(tmp_path / 'a.xlsx'), str(tmp_path / 'b.xlsx')])
+    for job in window.jobs:
+        job.status = DONE
+    window.update_overall_progress()
+    assert window.progress_bar.value() == 100
+
+    window.add_files([str(tmp_path / 'c.xlsx')])
+    assert window.progress_bar.value() == 0
+
+    window.jobs[-1].status = DONE
+    window.update_overall_progress()
+    assert window.progress_bar.value() == 100
+
+
+def _converted_job(tmp_path, name, codes):
+    input_path = str(tmp_path / f'{name}.xlsx')
+    workbook = Workbook()
+    workbook.active.title = '供应商'
+    for row in [['供应商编码', '单位名称']] + [[code, f'{code}公司'] for code in codes]:
+        workbook.active.append(row)
+    workbook.save(input_path)
+    job = ConversionJob(input_path, str(tmp_path / name))
+    os.makedirs(job.output_dir)
+    job.processor = DataProcessor()
+    job.processor.set_input_file_path(input_path)
+    job.processor.set_output_dir(job.output_dir)
+    job.results = job.processor.process_all_data(input_path)
+    job.status = DONE
+    return job
+
+
+def test_only_previewed_job_keeps_frames(window, tmp_path):
+    first = _converted_job(tmp_path, 'a', ['A1', 'A2'])
+    second = _converted_job(tmp_path, 'b', ['B1'])
+
+    window.show_results(first)
+    window.show_results(second)
+    assert first.processor.frames == {}
+    assert second.processor.frames['供应商']['原系统供应商编码'].tolist() == ['B1']
+
+    # 再次选中时从输出文件读回
+    window.show_results(first)
+    assert second.processor.frames == {}
+    assert first.processor.frames['供应商']['原系统供应商编码'].tolist() == ['A1', 'A2']
+    assert window.tab_widget.count() == 1
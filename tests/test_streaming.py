@@ -0,0 +1,76 @@
+from openpyxl import Workbook
+
+from data_processor import DataProcessor
+
+
+def _write_workbook(path, sheet_name, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = sheet_name
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def _process(tmp_path, input_path, **options):
+    processor = DataProcessor(**options)
+    processor.set_input_file_path(input_path)
+    processor.set_output_dir(str(tmp_path))
+    return processor, processor.process_all_data(input_path)
+
+
+def test_streaming_header_only_sheet(tmp_path):
+    input_path = str(tmp_path / 'empty.xlsx')
+    _write_workbook(input_path, '供应商', [['供应商编码', '单位名称']])
+
+    processor, results = _process(tmp_path, input_path, streaming=True)
+
+    assert processor.row_counts == {'供应商': 0}, results
+    assert list(processor.frames['供应商'].columns)[:2] == ['原系统供应商编码', '单位名称']
+
+
+def test_streaming_drops_duplicates_across_batches(tmp_path):
+    input_path = str(tmp_path / 'suppliers.xlsx')
+    rows = [['S1', '甲公司'], ['S2', '乙公司'], ['S1', '甲公司'], ['S3', '丙公司'], ['S2', '乙公司'], ['S2', '乙公司']]
+    _write_workbook(input_path, '供应商', [['供应商编码', '单位名称']] + rows)
+
+    processor, results = _process(tmp_path, input_path, streaming=True, batch_size=2)
+
+    assert processor.frames['供应商']['原系统供应商编码'].tolist() == ['S1', 'S2', 'S3'], results
+
+
+def test_streaming_loads_workbook_once(tmp_path, monkeypatch):
+    from openpyxl.reader.excel import ExcelReader
+
+    input_path = str(tmp_path / 'suppliers.xlsx')
+    rows = [[f'S{i}', f'单位{i}'] for i in range(5)]
+    _write_workbook(input_path, '供应商', [['供应商编码', '单位名称']] + rows)
+    loads = []
+    read = ExcelReader.read
+    monkeypatch.setattr(ExcelReader, 'read', lambda reader: loads.append(reader) or read(reader))
+    progress = []
+
+    processor = DataProcessor(streaming=True, batch_size=2, input_engine='openpyxl')
+    processor.progress_callback = lambda sheet_name, rows_done, total: progress.append((rows_done, total))
+    processor.set_input_file_path(input_path)
+    processor.set_output_dir(str(tmp_path))
+    results = processor.process_all_data(input_path)
+
+    assert processor.row_counts == {'供应商': 5}, results
+    assert len(loads) == 1
+    assert progress[-1] == (5, 5)
+
+
+def test_streaming_code_columns_match_whole_sheet(tmp_path):
+    input_path = str(tmp_path / 'suppliers.xlsx')
+    rows = [[f'S{i}', f'单位{i}', 91110000 + i] for i in range(5)]
+    _write_workbook(input_path, '供应商', [['供应商编码', '单位名称', '统一社会信用代码']] + rows)
+
+    codes = []
+    for options in ({}, {'streaming': True, 'batch_size': 2}):
+        output_dir = tmp_path / str(len(codes))
+        output_dir.mkdir()
+        processor, results = _process(output_dir, input_path, **options)
+        codes.append(processor.frames['供应商']['税务登记/信用代码/营业执照号'].tolist())
+
+    assert codes[0] == codes[1] == [str(91110000 + i) for i in range(5)]
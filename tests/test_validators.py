@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+import validators
+
+
+def _reasons(check, values):
+    return check(pd.Series(values, dtype=object)).tolist()
+
+
+def test_id_card():
+    values = [
+        '11010519491231002X',   # 校验码为X
+        '11010519491231002x',   # 小写x同样有效
+        '110101199003074477',
+        '110101200002290018',   # 闰年2月29日
+        '',
+        None,
+        '1101051949123100',     # 长度不是18位
+        '11010519491231A02X',   # 含有非数字字符
+        '110101190002290013',   # 1900年不是闰年
+        '110101199013010019',   # 13月
+        '110105194912310021',   # 校验码错误
+    ]
+    assert _reasons(validators.check_id_card, values) == [0, 0, 0, 0, 0, 0, 1, 2, 3, 3, 4]
+
+
+def test_mobile():
+    values = ['13800138000', '19912345678', '', '1380013800', '1380013800a', '12800138000', '23800138000']
+    assert _reasons(validators.check_mobile, values) == [0, 0, 0, 1, 2, 3, 3]
+
+
+def test_ean():
+    values = ['4006381333931', '6901234567892', '96385074', '73513537', None,
+              '400638133393', '400638133393A', '4006381333932', '96385075']
+    assert _reasons(validators.check_ean, values) == [0, 0, 0, 0, 0, 1, 2, 3, 3]
+
+
+def test_validate_combines_reasons():
+    df = pd.DataFrame({
+        '手机号': ['13800138000', '12800138000', '', '1380013800'],
+        '身份证号': ['11010519491231002X', '11010519491231002X', '110105194912310021', None],
+    })
+    result, counts = validators.validate(df, {'手机号': 'mobile', '身份证号': 'id_card', '不存在的列': 'ean'})
+
+    assert counts == {'手机号': 2, '身份证号': 1}
+    assert result[validators.VALID_COLUMN].tolist() == [validators.VALID] + [validators.INVALID] * 3
+    assert result[validators.REASON_COLUMN].tolist() == ['', '手机号号段错误', '身份证号校验码错误', '手机号长度不是11位']
+    assert np.array_equal(result.columns[:2], df.columns)
@@ -0,0 +1,32 @@
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from watch_folder import FolderWatcher, output_dir_for, read_status
+
+
+def _broken_future():
+    future = Future()
+    future.set_exception(BrokenProcessPool("子进程异常退出"))
+    return future
+
+
+def test_broken_pool_fails_only_first_file(tmp_path, capsys):
+    inbox, output_root = tmp_path / 'inbox', tmp_path / 'out'
+    inbox.mkdir()
+    watcher = FolderWatcher(str(inbox), str(output_root), {}, workers=3)
+    paths = [str(inbox / f'{name}.xlsx') for name in 'abc']
+    for i, path in enumerate(paths):
+        # 进程池异常退出时，所有正在转换的文件都会收到BrokenProcessPool
+        watcher.running[_broken_future()] = (path, (i + 1, 0), output_dir_for(watcher.output_root, path))
+
+    watcher.collect_finished()
+
+    assert watcher.failed == 1
+    assert watcher.handled == {paths[0]: (1, 0)}
+    assert read_status(output_dir_for(watcher.output_root, paths[0]))['status'] == 'failed'
+    assert not os.path.exists(output_dir_for(watcher.output_root, paths[1]))
+    # 其他文件按原来的顺序重新排队
+    assert list(watcher.queue) == [(paths[1], (2, 0)), (paths[2], (3, 0))]
+    assert watcher.running == {}
+    capsys.readouterr()
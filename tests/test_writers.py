@@ -0,0 +1,85 @@
+import glob
+import os
+import tempfile
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from data_processor import ConversionCancelled, DataProcessor
+
+INVENTORY_HEADER = ['商品编码', '批号', '生产日期', '数量', '单价']
+
+
+def _write_inventory(path, quantities):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = '库存'
+    sheet.append(INVENTORY_HEADER)
+    for i, quantity in enumerate(quantities):
+        sheet.append([f'P{i}', f'B{i}', '2024-01-01', quantity, 10])
+    workbook.save(path)
+
+
+def _processor(tmp_path, input_path, **options):
+    processor = DataProcessor(**options)
+    processor.set_input_file_path(input_path)
+    processor.set_output_dir(str(tmp_path))
+    return processor
+
+
+def test_parquet_streaming_widens_quantities(tmp_path):
+    pytest.importorskip('pyarrow')
+    input_path = str(tmp_path / 'inventory.xlsx')
+    # 第一批全为整数，之后的批次出现小数
+    _write_inventory(input_path, [1, 2, 3, 4, 5, 1.5, 2])
+
+    processor = _processor(tmp_path, input_path, streaming=True, batch_size=5, output_format='parquet')
+    results = processor.process_all_data(input_path)
+
+    assert processor.row_counts == {'库存': 7}, results
+    df = pd.read_parquet(tmp_path / '库存导入.parquet')
+    assert df['数量'].tolist() == [1, 2, 3, 4, 5, 1.5, 2]
+    assert df['原系统商品编码'].tolist() == [f'P{i}' for i in range(7)]
+
+
+@pytest.mark.parametrize('output_format', ['xlsx', 'csv', 'jsonl'])
+def test_cancel_leaves_no_partial_output(tmp_path, output_format):
+    input_path = str(tmp_path / 'inventory.xlsx')
+    _write_inventory(input_path, range(20))
+
+    processor = _processor(tmp_path, input_path, streaming=True, batch_size=5, output_format=output_format,
+                           writer_backend='streaming')
+
+    def cancel_after_first_batch(sheet_name, rows_done, total_rows):
+        processor.cancel()
+
+    processor.progress_callback = cancel_after_first_batch
+    # openpyxl逐行写出时把已追加的行缓存在系统临时目录中，取消后也不应留下
+    openpyxl_temp_files = set(glob.glob(os.path.join(tempfile.gettempdir(), 'openpyxl.*')))
+    with pytest.raises(ConversionCancelled):
+        processor.process_all_data(input_path)
+
+    assert sorted(os.listdir(tmp_path)) == ['inventory.xlsx']
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(), 'openpyxl.*'))) <= openpyxl_temp_files
+
+
+def test_error_leaves_no_partial_output(tmp_path, monkeypatch):
+    input_path = str(tmp_path / 'inventory.xlsx')
+    _write_inventory(input_path, range(20))
+
+    processor = _processor(tmp_path, input_path, streaming=True, batch_size=5, output_format='csv')
+    finish = processor.SHEET_PLANS['库存'].finish
+    calls = []
+
+    def failing_finish(df):
+        calls.append(len(df))
+        if len(calls) == 2:
+            raise ValueError("模拟的处理错误")
+        return finish(df)
+
+    monkeypatch.setattr(processor.SHEET_PLANS['库存'], 'finish', failing_finish)
+    results = processor.process_all_data(input_path)
+
+    assert '模拟的处理错误' in results['库存']
+    assert sorted(os.listdir(tmp_path)) == ['inventory.xlsx']
@@ -0,0 +1,148 @@
+"""身份证号、手机号和条码的格式校验
+
+每个校验函数对整列取值一次性计算：取值转为定长的Unicode数组后按字符码点视为二维整数矩阵，
+长度、数字、号段和校验码都用NumPy数组运算检查，不逐行调用Python。
+校验函数返回每行的原因编码（0表示通过），编码对应的说明见各函数的*_REASONS。空值不校验，视为通过。
+"""
+import itertools
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 输出中的校验结果列
+VALID_COLUMN = '校验结果'
+REASON_COLUMN = '校验原因'
+VALID = '有效'
+INVALID = '无效'
+
+# 身份证号前17位的加权系数和校验码（GB 11643）
+ID_WEIGHTS = np.array([7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2])
+ID_CHECK_CODES = np.array([ord(c) for c in '10X98765432'])
+ID_REASONS = ('', '长度不是18位', '含有非数字字符', '出生日期错误', '校验码错误')
+
+# 手机号第二位允许的数字
+MOBILE_SECOND_DIGITS = np.array([3, 4, 5, 6, 7, 8, 9])
+MOBILE_REASONS = ('', '长度不是11位', '含有非数字字符', '号段错误')
+
+# 各长度条码每一位的加权系数：校验码为0，从它左边一位起依次为3、1、3……
+EAN_WEIGHTS = np.array([
+    [(3 if (length - 1 - i) % 2 else 1) if i < length - 1 else 0 for i in range(13)]
+    for length in range(14)
+])
+EAN_REASONS = ('', '长度不是8位或13位', '含有非数字字符', '校验码错误')
+
+
+def _char_codes(series: pd.Series, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """返回(每行前width个字符的码点矩阵, 每行的长度)，不足width的部分为0，空值视为''"""
+    text = np.asarray(series.to_numpy(dtype=object, na_value=''), dtype=str)
+    lengths = np.char.str_len(text)
+    if text.dtype.itemsize // 4 < width:
+        text = text.astype(f'U{width}')
+    codes = text.view(np.uint32).reshape(len(text), text.dtype.itemsize // 4)[:, :width].astype(np.int32)
+    return codes, lengths
+
+
+def _is_digit(codes: np.ndarray) -> np.ndarray:
+    return (codes >= ord('0')) & (codes <= ord('9'))
+
+
+def _first_reason(checks: List[np.ndarray], size: int) -> np.ndarray:
+    """checks依次为编码1、2……的不通过条件，每行取第一个不通过的编码"""
+    reasons = np.zeros(size, dtype=np.int64)
+    for code in range(len(checks), 0, -1):
+        reasons[checks[code - 1]] = code
+    return reasons
+
+
+def check_id_card(series: pd.Series) -> np.ndarray:
+    """18位身份证号：前17位为数字，第7~14位为有效的出生日期，末位为按加权系数计算的校验码（X不区分大小写）"""
+    codes, lengths = _char_codes(series, 18)
+    filled = lengths > 0
+    length_ok = lengths == 18
+    body = codes[:, :17] - ord('0')
+    last = np.where(codes[:, 17] == ord('x'), ord('X'), codes[:, 17])
+    digits_ok = _is_digit(codes[:, :17]).all(axis=1) & (_is_digit(last) | (last == ord('X')))
+
+    birth = np.where(digits_ok[:, None], body[:, 6:14], 0)
+    year = birth[:, :4] @ np.array([1000, 100, 10, 1])
+    month = birth[:, 4:6] @ np.array([10, 1])
+    day = birth[:, 6:8] @ np.array([10, 1])
+    days_in_month = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[np.clip(month, 0, 12)]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days_in_month = np.where((month == 2) & ~leap, 28, days_in_month)
+    date_ok = (year >= 1900) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= days_in_month)
+
+    expected = ID_CHECK_CODES[(np.where(digits_ok[:, None], body, 0) @ ID_WEIGHTS) % 11]
+    return _first_reason([
+        filled & ~length_ok,
+        filled & length_ok & ~digits_ok,
+        filled & length_ok & digits_ok & ~date_ok,
+        filled & length_ok & digits_ok & date_ok & (last != expected),
+    ], len(series))
+
+
+def check_mobile(series: pd.Series) -> np.ndarray:
+    """11位手机号：全为数字，以1开头，第二位为3~9"""
+    codes, lengths = _char_codes(series, 11)
+    filled = lengths > 0
+    length_ok = lengths == 11
+    digits_ok = _is_digit(codes).all(axis=1)
+    prefix_ok = (codes[:, 0] == ord('1')) & np.isin(codes[:, 1] - ord('0'), MOBILE_SECOND_DIGITS)
+    return _first_reason([
+        filled & ~length_ok,
+        filled & length_ok & ~digits_ok,
+        filled & length_ok & digits_ok & ~prefix_ok,
+    ], len(series))
+
+
+def check_ean(series: pd.Series) -> np.ndarray:
+    """EAN-8或EAN-13条码：全为数字，末位为校验码（从右往左第二位起，奇数位乘3、偶数位乘1，补足10的倍数）"""
+    codes, lengths = _char_codes(series, 13)
+    filled = lengths > 0
+    length_ok = (lengths == 8) | (lengths == 13)
+    in_code = np.arange(13)[None, :] < lengths[:, None]
+    digits_ok = (_is_digit(codes) | ~in_code).all(axis=1)
+
+    digits = np.where(in_code, codes - ord('0'), 0)
+    lengths = np.clip(lengths, 0, 13)
+    expected = (10 - (digits * EAN_WEIGHTS[lengths]).sum(axis=1) % 10) % 10
+    check_digit = digits[np.arange(len(digits)), np.clip(lengths - 1, 0, 12)]
+    return _first_reason([
+        filled & ~length_ok,
+        filled & length_ok & ~digits_ok,
+        filled & length_ok & digits_ok & (check_digit != expected),
+    ], len(series))
+
+
+# 可在配置中使用的校验：名称 -> (校验函数, 各原因编码的说明)
+VALIDATORS = {
+    'id_card': (check_id_card, ID_REASONS),
+    'mobile': (check_mobile, MOBILE_REASONS),
+    'ean': (check_ean, EAN_REASONS),
+}
+
+
+def validate(df: pd.DataFrame, validations: Dict[str, str]) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """按{列名: 校验名称}校验df，返回(末尾加上校验结果和校验原因列的df, {列名: 未通过的行数})
+
+    各列的原因编码合并为一个组合编码，每种组合的说明文字只生成一次，再按组合编码取出。
+    """
+    columns = [col for col in validations if col in df.columns]
+    reason_labels = [VALIDATORS[validations[col]][1] for col in columns]
+    combined = np.zeros(len(df), dtype=np.int64)
+    counts = {}
+    for col, labels in zip(columns, reason_labels):
+        reasons = VALIDATORS[validations[col]][0](df[col])
+        counts[col] = int((reasons != 0).sum())
+        combined = combined * len(labels) + reasons
+
+    descriptions = np.array([
+        '；'.join(f"{col}{labels[code]}" for col, labels, code in zip(columns, reason_labels, combination) if code)
+        for combination in itertools.product(*(range(len(labels)) for labels in reason_labels))
+    ], dtype=object)
+    df = df.assign(**{
+        VALID_COLUMN: np.where(combined != 0, INVALID, VALID),
+        REASON_COLUMN: descriptions[combined],
+    })
+    return df, counts
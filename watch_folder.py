@@ -0,0 +1,482 @@
+"""监视收件目录，自动转换放入或修改过的文件
+
+门店导出同步到收件目录后不需要再打开界面拖放，例如：
+
+    python watch_folder.py 门店收件箱 -o 转换结果 -j 2
+
+- 只监视收件目录本身（不含子目录）中的Excel和CSV文件。文件的大小和修改时间连续--settle秒不变后才转换，
+  避免读取仍在写入的文件；转换过程中文件又被修改时，本次完成后再转换一次
+- 每个文件的输出保存在输出目录下以文件名命名的子目录中，子目录中的status.json记录转换状态
+  （running/ok/failed）、各工作表的结果和转换时源文件的大小与修改时间；重新启动后源文件没有变化的文件不再转换
+- Linux上通过inotify（ctypes调用libc）接收目录变化，并定时全量扫描一次以防漏掉事件；
+  其他系统、inotify不可用或指定--poll时定时扫描目录
+- 转换在进程池中进行，每个子进程转换--max-tasks-per-child个文件后退出并由新进程接替，
+  长时间运行时pandas、openpyxl残留的内存随子进程释放；主进程只保存收件目录中现有文件的状态
+"""
+import argparse
+import collections
+import ctypes
+import ctypes.util
+import datetime
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Set, Tuple
+
+from batch_convert import add_conversion_arguments, conversion_options, convert_workbook, print_record
+from input_engines import EXCEL_EXTENSIONS, TEXT_EXTENSIONS
+
+# 会被转换的文件类型
+INPUT_EXTENSIONS = frozenset(ext.lower() for ext in EXCEL_EXTENSIONS + TEXT_EXTENSIONS)
+# 每个文件输出子目录中的状态记录
+STATUS_FILE = 'status.json'
+
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 2.0
+# 使用inotify时全量扫描目录的间隔（秒）
+DEFAULT_RESCAN_INTERVAL = 60.0
+DEFAULT_MAX_TASKS_PER_CHILD = 20
+# 有文件等待稳定或正在转换时检查的间隔（秒）
+BUSY_INTERVAL = 0.5
+# 空闲时最长的等待时间（秒），收到停止信号后最多这么久退出
+IDLE_INTERVAL = 1.0
+
+# Python 3.11起ProcessPoolExecutor支持max_tasks_per_child，之前的版本由FolderWatcher定期重建进程池
+POOL_RECYCLES_WORKERS = sys.version_info >= (3, 11)
+
+# inotify事件（见inotify(7)）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+# 事件丢失或收件目录本身被删除、移走时需要全量扫描
+RESCAN_EVENTS = IN_Q_OVERFLOW | IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF
+# struct inotify_event的定长部分：wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct('iIII')
+
+Signature = Tuple[int, int]  # (文件大小, 修改时间纳秒)
+
+
+def is_input_file(name: str) -> bool:
+    """是否为需要转换的文件，跳过Excel的临时文件和隐藏文件"""
+    if name.startswith('~$') or name.startswith('.'):
+        return False
+    return os.path.splitext(name)[1].lower() in INPUT_EXTENSIONS
+
+
+def file_signature(path: str) -> Optional[Signature]:
+    """文件的大小和修改时间，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def scan_inbox(inbox: str) -> Dict[str, Signature]:
+    """收件目录中需要转换的文件及其大小和修改时间"""
+    files = {}
+    try:
+        with os.scandir(inbox) as entries:
+            for entry in entries:
+                if not is_input_file(entry.name):
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return files
+
+
+def output_dir_for(output_root: str, path: str) -> str:
+    """文件的输出子目录，以完整文件名命名，同一文件每次转换都输出到同一目录"""
+    return os.path.join(output_root, os.path.basename(path))
+
+
+def read_status(output_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(output_dir, STATUS_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_status(output_dir: str, record: dict):
+    """先写临时文件再替换，读取状态的程序不会读到写了一半的记录"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, STATUS_FILE)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def _ignore_interrupt():
+    """转换进程忽略Ctrl+C，由主进程等待正在转换的文件完成后再退出"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+class InotifyWatcher:
+    """通过inotify接收收件目录的变化"""
+
+    name = 'inotify'
+
+    def __init__(self, inbox: str):
+        self.inbox = inbox
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        if libc.inotify_add_watch(self.fd, os.fsencode(inbox), WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, os.strerror(error), inbox)
+
+    def wait(self, timeout: float) -> Tuple[Set[str], bool]:
+        """等待最多timeout秒，返回(有变化的文件, 是否需要全量扫描)"""
+        changed = set()
+        rescan = False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed, rescan
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += _EVENT_HEADER.size + length
+                if mask & RESCAN_EVENTS:
+                    rescan = True
+                elif name and not mask & IN_ISDIR:
+                    name = os.fsdecode(name)
+                    if is_input_file(name):
+                        changed.add(os.path.join(self.inbox, name))
+        return changed, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """每隔interval秒全量扫描一次收件目录"""
+
+    name = '定时扫描'
+
+    def __init__(self, inbox: str, interval: float):
+        self.inbox = inbox
+        self.interval = interval
+        self.next_scan = time.monotonic() + interval
+
+    def wait(self, timeout: float) -> Tuple[Set[str], bool]:
+        time.sleep(max(0.0, min(timeout, self.next_scan - time.monotonic())))
+        if time.monotonic() < self.next_scan:
+            return set(), False
+        self.next_scan = time.monotonic() + self.interval
+        return set(), True
+
+    def close(self):
+        pass
+
+
+def create_watcher(inbox: str, poll: bool = False, poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """Linux上优先使用inotify，不可用时改为定时扫描"""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(inbox)
+        except (OSError, AttributeError) as e:
+            print(f"无法使用inotify（{e}），改为定时扫描", file=sys.stderr)
+    return PollingWatcher(inbox, poll_interval)
+
+
+class FolderWatcher:
+    """监视收件目录并在进程池中转换稳定下来的文件
+
+    handled记录每个文件最近一次转换时的大小和修改时间，settling为等待稳定的文件及其最近一次变化的时间，
+    queue为已稳定、等待进程池空闲的文件。
+    """
+
+    def __init__(self, inbox: str, output_root: str, options: dict, workers: int = 1,
+                 settle: float = DEFAULT_SETTLE_SECONDS, poll: bool = False,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, rescan_interval: float = DEFAULT_RESCAN_INTERVAL,
+                 max_tasks_per_child: int = DEFAULT_MAX_TASKS_PER_CHILD,
+                 mapping_rules: Optional[str] = None, mapping_memory: Optional[str] = None):
+        self.inbox = os.path.abspath(inbox)
+        self.output_root = os.path.abspath(output_root)
+        self.options = options
+        self.workers = max(1, workers)
+        self.settle = settle
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.max_tasks_per_child = max(1, max_tasks_per_child)
+        self.mapping_rules = mapping_rules
+        self.mapping_memory = mapping_memory
+
+        self.handled: Dict[str, Signature] = {}
+        self.settling: Dict[str, Tuple[Signature, float]] = {}
+        self.queue = collections.deque()
+        self.running = {}  # future -> (文件, 转换时的大小和修改时间, 输出目录)
+        self.executor = None
+        self.pool_tasks = 0  # 当前进程池已接收的文件数，用于不支持max_tasks_per_child时重建进程池
+        self.stopping = False
+        self.converted = 0
+        self.failed = 0
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def load_statuses(self):
+        """读取输出目录中已完成的状态记录，源文件没有变化的不再转换；状态为running的是上次中断的转换，需要重新转换"""
+        try:
+            names = os.listdir(self.output_root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            record = read_status(os.path.join(self.output_root, name))
+            if record and record.get('status') in ('ok', 'failed') and record.get('source'):
+                source = record['source']
+                self.handled[record['file']] = (source['size'], source['mtime_ns'])
+
+    def touch(self, path: str, signature: Optional[Signature] = None):
+        """文件有变化：没有转换过或与上次转换时不同的文件开始等待稳定"""
+        signature = signature or file_signature(path)
+        if signature is None:
+            # 文件已删除或移走
+            self.settling.pop(path, None)
+            if not self._is_running(path):
+                self.handled.pop(path, None)
+            return
+        if signature[0] == 0:
+            # 刚创建、还没有写入内容的文件，写入后会再次收到变化
+            self.settling.pop(path, None)
+            return
+        if self.handled.get(path) == signature and not self._is_running(path):
+            self.settling.pop(path, None)
+            return
+        current = self.settling.get(path)
+        if current is None or current[0] != signature:
+            self.settling[path] = (signature, time.monotonic())
+
+    def rescan(self):
+        """全量扫描收件目录，同时清理已不在目录中的文件的记录"""
+        files = scan_inbox(self.inbox)
+        for path, signature in files.items():
+            self.touch(path, signature)
+        running = {path for path, _, _ in self.running.values()}
+        for path in list(self.handled):
+            if path not in files and path not in running:
+                del self.handled[path]
+        for path in list(self.settling):
+            if path not in files:
+                del self.settling[path]
+
+    def check_settled(self):
+        """大小和修改时间连续settle秒不变的文件进入转换队列"""
+        now = time.monotonic()
+        queued = {path for path, _ in self.queue}
+        for path, (signature, since) in list(self.settling.items()):
+            current = file_signature(path)
+            if current is None or current[0] == 0:
+                del self.settling[path]
+            elif current != signature:
+                self.settling[path] = (current, now)
+            elif now - since >= self.settle and path not in queued and not self._is_running(path):
+                del self.settling[path]
+                self.queue.append((path, signature))
+
+    def _is_running(self, path: str) -> bool:
+        return any(running_path == path for running_path, _, _ in self.running.values())
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        """可以接收新文件的进程池；需要重建进程池而仍有文件在转换时返回None"""
+        if (self.executor is not None and not POOL_RECYCLES_WORKERS
+                and self.pool_tasks >= self.max_tasks_per_child * self.workers):
+            if self.running:
+                return None
+            self.executor.shutdown()
+            self.executor = None
+        if self.executor is None:
+            if POOL_RECYCLES_WORKERS:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_interrupt,
+                                                    max_tasks_per_child=self.max_tasks_per_child)
+            else:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_interrupt)
+            self.pool_tasks = 0
+        return self.executor
+
+    def submit_ready(self):
+        """在进程池有空闲时提交队列中的文件，同时最多workers个，其余留在队列中"""
+        while self.queue and len(self.running) < self.workers:
+            executor = self._pool()
+            if executor is None:
+                return
+            path, signature = self.queue.popleft()
+            if file_signature(path) != signature:
+                # 排队期间又有变化，重新等待稳定
+                self.touch(path)
+                continue
+            output_dir = output_dir_for(self.output_root, path)
+            write_status(output_dir, {
+                'file': path,
+                'output_dir': output_dir,
+                'status': 'running',
+                'source': {'size': signature[0], 'mtime_ns': signature[1]},
+                'started_at': _now(),
+            })
+            future = executor.submit(convert_workbook, path, output_dir, self.options,
+                                     self.mapping_rules, self.mapping_memory)
+            self.running[future] = (path, signature, output_dir)
+            self.pool_tasks += 1
+
+    def collect_finished(self):
+        """写出已完成文件的状态记录"""
+        for future in [future for future in self.running if future.done()]:
+            if future not in self.running:
+                # 进程池异常退出时已重新排队
+                continue
+            path, signature, output_dir = self.running.pop(future)
+            try:
+                record = future.result()
+            except BrokenProcessPool:
+                # 子进程异常退出（例如内存不足被终止），进程池需要重建
+                if self.executor is not None:
+                    self.executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = None
+                if self.stopping:
+                    # 停止时被中断的转换保留running状态，下次启动时重新转换
+                    continue
+                # 其余正在转换的文件也会收到BrokenProcessPool，但无法确定是哪个文件导致的：
+                # 只把最早提交的这个文件记为失败，其他文件重新排队，在重建的进程池中转换
+                self._requeue_running()
+                record = {'file': path, 'output_dir': output_dir, 'status': 'failed', 'sheets': {},
+                          'error': "转换进程异常退出", 'seconds': None}
+            except Exception as e:
+                record = {'file': path, 'output_dir': output_dir, 'status': 'failed', 'sheets': {},
+                          'error': str(e), 'seconds': None}
+            record['source'] = {'size': signature[0], 'mtime_ns': signature[1]}
+            record['finished_at'] = _now()
+            write_status(output_dir, record)
+            self.handled[path] = signature
+            if record['status'] == 'ok':
+                self.converted += 1
+            else:
+                self.failed += 1
+            print_record(record)
+            sys.stdout.flush()
+
+    def _requeue_running(self):
+        """把正在转换的文件按提交顺序放回队列最前面"""
+        for future, (path, signature, _) in reversed(list(self.running.items())):
+            del self.running[future]
+            self.queue.appendleft((path, signature))
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.settling or self.queue or self.running)
+
+    def run(self, once: bool = False):
+        """监视收件目录直到收到停止信号；once为True时转换完目录中现有的文件后退出"""
+        os.makedirs(self.output_root, exist_ok=True)
+        watcher = create_watcher(self.inbox, self.poll, self.poll_interval)
+        if not once:
+            print(f"正在监视 {self.inbox}（{watcher.name}），输出到 {self.output_root}，按Ctrl+C停止")
+            sys.stdout.flush()
+        self.load_statuses()
+        self.rescan()
+        next_rescan = time.monotonic() + self.rescan_interval
+        try:
+            while not self.stopping:
+                self.check_settled()
+                self.submit_ready()
+                self.collect_finished()
+                if once and not self.busy:
+                    break
+                timeout = BUSY_INTERVAL if self.busy else IDLE_INTERVAL
+                try:
+                    changed, rescan = watcher.wait(timeout)
+                except InterruptedError:
+                    continue
+                for path in changed:
+                    self.touch(path)
+                if rescan or time.monotonic() >= next_rescan:
+                    self.rescan()
+                    next_rescan = time.monotonic() + self.rescan_interval
+        finally:
+            watcher.close()
+            if self.executor is not None:
+                # 等待正在转换的文件完成并写出状态，排队的文件下次启动时转换
+                self.executor.shutdown(wait=True)
+                self.collect_finished()
+                self.executor = None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="监视收件目录，自动转换放入的商品、供应商、库存和会员数据")
+    parser.add_argument('inbox', help="收件目录")
+    parser.add_argument('-o', '--output-dir', default='output', help="输出目录（默认: output）")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="同时转换的文件数（默认: 1）")
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="文件大小和修改时间连续多少秒不变后才转换（默认: %(default)s）")
+    parser.add_argument('--poll', action='store_true',
+                        help="不使用inotify，定时扫描目录（收件目录是网络共享目录时，inotify收不到其他机器写入的变化）")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="定时扫描的间隔秒数（默认: %(default)s）")
+    parser.add_argument('--max-tasks-per-child', type=int, default=DEFAULT_MAX_TASKS_PER_CHILD,
+                        help="每个转换进程转换多少个文件后换新进程，释放内存（默认: %(default)s）")
+    parser.add_argument('--once', action='store_true', help="转换完收件目录中现有的文件后退出")
+    add_conversion_arguments(parser)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    options = conversion_options(parser, args)
+    if not os.path.isdir(args.inbox):
+        print(f"收件目录不存在: {args.inbox}", file=sys.stderr)
+        return 2
+
+    watcher = FolderWatcher(
+        args.inbox, args.output_dir, options, args.workers, args.settle, args.poll, args.poll_interval,
+        max_tasks_per_child=args.max_tasks_per_child, mapping_rules=args.mapping_rules,
+        mapping_memory=None if args.no_mapping_memory else args.mapping_memory,
+    )
+    signal.signal(signal.SIGINT, watcher.stop)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, watcher.stop)
+    watcher.run(once=args.once)
+    print(f"已停止，本次转换成功{watcher.converted}个，失败{watcher.failed}个")
+    return 0 if watcher.failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())